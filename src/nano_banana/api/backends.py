@@ -0,0 +1,194 @@
+"""Image generation backends behind NanoBananaClient."""
+
+import asyncio
+import hashlib
+import io
+import random
+from typing import Protocol
+
+import numpy as np
+from google import genai
+from google.genai import errors, types
+from PIL import Image
+
+from nano_banana.core.cache import LRUCache
+from nano_banana.core.imagehash import content_key
+
+SERVER_ERROR = 500
+SERVICE_UNAVAILABLE = 503
+RENDER_CACHE_SIZE = 64
+
+
+class ImageBackend(Protocol):
+    """Something that answers Gemini ``generate_content`` calls."""
+
+    async def generate_content(
+        self,
+        *,
+        model: str,
+        contents: list,
+        config: types.GenerateContentConfig | None = None,
+    ) -> types.GenerateContentResponse: ...
+
+
+class GeminiBackend:
+    """The Gemini API, through one key's genai client."""
+
+    def __init__(self, client: genai.Client) -> None:
+        self.client = client
+
+    async def generate_content(
+        self,
+        *,
+        model: str,
+        contents: list,
+        config: types.GenerateContentConfig | None = None,
+    ) -> types.GenerateContentResponse:
+        return await self.client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
+        )
+
+
+def api_error(code: int, response_json: dict | None = None) -> errors.APIError:
+    """The genai error the API would raise for an HTTP ``code``."""
+    error_type = (
+        errors.ServerError if code >= SERVER_ERROR else errors.ClientError
+    )
+    return error_type(code, response_json or {})
+
+
+def _prompt_of(contents: list) -> str:
+    """Text of the latest turn in ``contents``."""
+    texts = [item for item in contents if isinstance(item, str)]
+    turns = [item for item in contents if isinstance(item, types.Content)]
+    if turns and turns[-1].parts:
+        texts.extend(part.text for part in turns[-1].parts if part.text)
+    return ' '.join(texts)
+
+
+def render(
+    prompt: str,
+    size: int,
+    source: Image.Image | None = None,
+) -> bytes:
+    """Draw a deterministic PNG for ``prompt`` from interfering waves.
+
+    The same prompt always gives the same picture. With a ``source``
+    image, the pattern is blended over it, like a transformation would.
+    """
+    seed = int.from_bytes(hashlib.sha256(prompt.encode()).digest()[:8])
+    rng = np.random.default_rng(seed)
+    freq = rng.uniform(1.0, 8.0, (3, 2))
+    phase = rng.uniform(0.0, 2 * np.pi, 3)
+    y, x = np.mgrid[0:size, 0:size] / size
+    waves = np.sin(
+        2 * np.pi * (freq[:, :1, None] * x + freq[:, 1:, None] * y)
+        + phase[:, None, None],
+    )
+    pixels = ((waves.transpose(1, 2, 0) + 1) * 127.5).astype(np.uint8)
+    if source is not None:
+        base = np.asarray(
+            source.convert('RGB').resize((size, size)),
+            dtype=np.uint16,
+        )
+        pixels = ((base + pixels) // 2).astype(np.uint8)
+    with io.BytesIO() as bio:
+        Image.fromarray(pixels).save(bio, format='PNG')
+        return bio.getvalue()
+
+
+class LocalBackend:
+    """Procedural images made on this machine, for offline load tests.
+
+    Answers after a normally distributed delay of ``latency`` +/- ``jitter``
+    seconds with a ``size`` pixel square image drawn from the prompt, one
+    per requested candidate, and fails with ``error_code`` at
+    ``error_rate``. Drawing overlaps the delay and the last
+    ``RENDER_CACHE_SIZE`` images drawn are reused, so callers measure the
+    configured latency rather than the time spent drawing.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.1,
+        size: int = 1024,
+        error_rate: float = 0.0,
+        error_code: int = SERVICE_UNAVAILABLE,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.size = size
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self._random = random.Random(seed)  # noqa: S311
+        self._rendered: LRUCache[tuple[str, int, str | None], bytes] = LRUCache(
+            RENDER_CACHE_SIZE
+        )
+
+    async def generate_content(
+        self,
+        *,
+        model: str,
+        contents: list,
+        config: types.GenerateContentConfig | None = None,
+    ) -> types.GenerateContentResponse:
+        loop = asyncio.get_running_loop()
+        delay = max(self._random.gauss(self.latency, self.jitter), 0)
+        due = loop.time() + delay
+        if self._random.random() < self.error_rate:
+            await asyncio.sleep(delay)
+            raise api_error(
+                self.error_code,
+                {'error': {'message': f'{model} failed (injected)'}},
+            )
+
+        prompt = _prompt_of(contents)
+        source = next(
+            (item for item in contents if isinstance(item, Image.Image)),
+            None,
+        )
+        count = (config and config.candidate_count) or 1
+        seeds = [prompt, *(f'{prompt} #{i}' for i in range(1, count))]
+        source_key = (
+            None
+            if source is None
+            else await asyncio.to_thread(content_key, source)
+        )
+        images = await asyncio.gather(
+            *(self._render(seed, source, source_key) for seed in seeds),
+        )
+        await asyncio.sleep(max(due - loop.time(), 0))
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    index=i,
+                    content=types.Content(
+                        role='model',
+                        parts=[
+                            types.Part.from_text(text=f'[{model}] {prompt}'),
+                            types.Part.from_bytes(
+                                data=data,
+                                mime_type='image/png',
+                            ),
+                        ],
+                    ),
+                )
+                for i, data in enumerate(images)
+            ],
+        )
+
+    async def _render(
+        self,
+        prompt: str,
+        source: Image.Image | None,
+        source_key: str | None,
+    ) -> bytes:
+        key = (prompt, self.size, source_key)
+        if (data := self._rendered.get(key)) is None:
+            data = await asyncio.to_thread(render, prompt, self.size, source)
+            self._rendered.put(key, data)
+        return data
@@ -0,0 +1,223 @@
+"""Circuit breaker that fails fast while the Gemini backend is down."""
+
+import contextlib
+import contextvars
+import enum
+import logging
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from google.genai import errors
+
+from nano_banana.core.metrics import metrics
+
+RATE_LIMIT_CODE = 429
+
+
+class BreakerState(enum.StrEnum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+_STATE_GAUGE = {
+    BreakerState.CLOSED: 0,
+    BreakerState.HALF_OPEN: 1,
+    BreakerState.OPEN: 2,
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend that is known to be failing."""
+
+
+@dataclass(frozen=True, slots=True)
+class BreakerPolicy:
+    """When to open the circuit and how to probe for recovery."""
+
+    window_seconds: float = 60.0
+    min_calls: int = 5
+    max_error_rate: float = 0.5
+    slow_call_seconds: float = 90.0
+    max_slow_rate: float = 0.8
+    open_seconds: float = 30.0
+    half_open_probes: int = 1
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Whether an error says something about the backend's health.
+
+    Bad requests are the caller's fault and do not count; rate limits,
+    server errors, timeouts and network errors do.
+    """
+    if isinstance(error, errors.ClientError):
+        return error.code == RATE_LIMIT_CODE
+    return not isinstance(error, (ValueError, CircuitOpenError))
+
+
+@dataclass(slots=True)
+class _Claim:
+    """A half-open probe held for the work that leads up to a call."""
+
+    breaker: 'CircuitBreaker'
+    used: bool = False
+
+
+_claim: contextvars.ContextVar[_Claim | None] = contextvars.ContextVar(
+    'breaker_claim',
+    default=None,
+)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by recent errors and latency.
+
+    While closed, outcomes of the last ``window_seconds`` are kept. Once
+    there are ``min_calls`` of them and the error or slow-call rate is
+    over its limit, the circuit opens and calls fail fast for
+    ``open_seconds``. Then up to ``half_open_probes`` calls are let
+    through: a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        policy: BreakerPolicy | None = None,
+        name: str = 'gemini',
+    ) -> None:
+        self.policy = policy or BreakerPolicy()
+        self.name = name
+        self._state = BreakerState.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._outcomes: deque[tuple[float, bool, bool]] = deque()
+        self.logger = logging.getLogger(__name__)
+        metrics.set('breaker.state', 0, breaker=name)
+
+    @property
+    def state(self) -> BreakerState:
+        if (
+            self._state is BreakerState.OPEN
+            and time.monotonic() - self._opened_at >= self.policy.open_seconds
+        ):
+            self._transition(BreakerState.HALF_OPEN)
+        return self._state
+
+    def allows(self) -> bool:
+        """Whether a call would be let through right now."""
+        state = self.state
+        if state is BreakerState.OPEN:
+            return False
+        if state is BreakerState.HALF_OPEN:
+            return self._probes < self.policy.half_open_probes
+        return True
+
+    @contextlib.contextmanager
+    def claim(self) -> Iterator[bool]:
+        """Hold the right to call for the block, and say if it was granted.
+
+        Meant for work that precedes a call, like downloading its inputs.
+        While half-open, the probe is reserved when the block starts, so
+        only its holder prepares a call. The first ``before_call`` inside
+        the block uses it, and it is given back if the block ends first.
+        """
+        if not self.allows():
+            metrics.incr('breaker.rejected', breaker=self.name)
+            yield False
+            return
+        if self._state is not BreakerState.HALF_OPEN:
+            yield True
+            return
+
+        self._probes += 1
+        claim = _Claim(self)
+        token = _claim.set(claim)
+        try:
+            yield True
+        finally:
+            _claim.reset(token)
+            if not claim.used:
+                self._release_probe()
+
+    def before_call(self) -> None:
+        """Reserve a call, or raise CircuitOpenError to fail fast."""
+        if (claim := _claim.get()) and claim.breaker is self and not claim.used:
+            claim.used = True
+            return
+        if not self.allows():
+            metrics.incr('breaker.rejected', breaker=self.name)
+            msg = f'{self.name} backend is unavailable, try again later'
+            raise CircuitOpenError(msg)
+        if self._state is BreakerState.HALF_OPEN:
+            self._probes += 1
+
+    def record_success(self, latency: float) -> None:
+        if self._state is BreakerState.HALF_OPEN:
+            self._transition(BreakerState.CLOSED)
+            return
+        self._record(ok=True, slow=latency >= self.policy.slow_call_seconds)
+
+    def record_failure(self, error: BaseException) -> None:
+        if not is_backend_failure(error):
+            self._release_probe()
+            return
+        if self._state is BreakerState.HALF_OPEN:
+            self._transition(BreakerState.OPEN)
+            return
+        self._record(ok=False, slow=False)
+
+    def record_cancelled(self, *, timed_out: bool) -> None:
+        """Account for a call cancelled before it finished.
+
+        A call cut off by its deadline failed to answer in time. Any other
+        cancellation says nothing about the backend; it only gives back the
+        probe the call held.
+        """
+        if timed_out:
+            self.record_failure(TimeoutError())
+            return
+        self._release_probe()
+
+    def _release_probe(self) -> None:
+        if self._state is BreakerState.HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+
+    def _record(self, *, ok: bool, slow: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, ok, slow))
+        horizon = now - self.policy.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._outcomes.popleft()
+
+        if self._state is not BreakerState.CLOSED:
+            return
+        calls = len(self._outcomes)
+        if calls < self.policy.min_calls:
+            return
+        error_rate = sum(not ok for _, ok, _ in self._outcomes) / calls
+        slow_rate = sum(slow for _, _, slow in self._outcomes) / calls
+        if (
+            error_rate > self.policy.max_error_rate
+            or slow_rate > self.policy.max_slow_rate
+        ):
+            self._transition(BreakerState.OPEN)
+
+    def _transition(self, state: BreakerState) -> None:
+        previous, self._state = self._state, state
+        self._probes = 0
+        if state is BreakerState.OPEN:
+            self._opened_at = time.monotonic()
+        if state is BreakerState.CLOSED:
+            self._outcomes.clear()
+        metrics.incr(
+            'breaker.transitions',
+            breaker=self.name,
+            source=previous.value,
+            target=state.value,
+        )
+        metrics.set('breaker.state', _STATE_GAUGE[state], breaker=self.name)
+        level = logging.WARNING if state is BreakerState.OPEN else logging.INFO
+        self.logger.log(
+            level, 'Circuit %s: %s -> %s', self.name, previous, state
+        )
@@ -0,0 +1,233 @@
+"""Record Gemini calls to cassette files and replay them offline."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from pathlib import Path
+
+from google.genai import errors, types
+from PIL import Image
+
+from nano_banana.api.backends import SERVER_ERROR, ImageBackend, api_error
+from nano_banana.core.imagehash import content_key
+
+
+class CassetteMissError(LookupError):
+    """A replayed request has no recorded interaction."""
+
+
+def fingerprint(
+    model: str,
+    contents: list,
+    config: types.GenerateContentConfig | None = None,
+) -> str:
+    """Stable hash of a request: its model, contents and config.
+
+    Images are hashed by their pixels. The name of a cached system prompt
+    changes between runs, so it is left out.
+    """
+    digest = hashlib.sha256(model.encode())
+    for item in contents:
+        if isinstance(item, str):
+            digest.update(b'text:' + item.encode())
+        elif isinstance(item, Image.Image):
+            digest.update(b'image:' + content_key(item).encode())
+        elif isinstance(item, types.Part | types.Content | types.File):
+            digest.update(item.model_dump_json(exclude_none=True).encode())
+        else:
+            digest.update(repr(item).encode())
+    if config is not None:
+        digest.update(
+            config.model_dump_json(
+                exclude_none=True,
+                exclude={'cached_content'},
+            ).encode(),
+        )
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class Interaction:
+    """One recorded call and how it went."""
+
+    fingerprint: str
+    model: str
+    latency: float
+    response: types.GenerateContentResponse | None = None
+    error_code: int | None = None
+    error_json: dict | None = None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                'fingerprint': self.fingerprint,
+                'model': self.model,
+                'latency': self.latency,
+                'response': self.response.model_dump(
+                    mode='json',
+                    exclude_none=True,
+                )
+                if self.response is not None
+                else None,
+                'error_code': self.error_code,
+                'error_json': self.error_json,
+            },
+        )
+
+    @classmethod
+    def from_json(cls, line: str) -> 'Interaction':
+        data = json.loads(line)
+        response = data.get('response')
+        return cls(
+            fingerprint=data['fingerprint'],
+            model=data['model'],
+            latency=data['latency'],
+            response=types.GenerateContentResponse.model_validate(response)
+            if response is not None
+            else None,
+            error_code=data.get('error_code'),
+            error_json=data.get('error_json'),
+        )
+
+    def result(self) -> types.GenerateContentResponse:
+        """The recorded response, or the recorded API error raised again."""
+        if self.response is not None:
+            return self.response
+        raise api_error(self.error_code or SERVER_ERROR, self.error_json)
+
+
+class Cassette:
+    """Interactions kept in a JSON Lines file, one per line.
+
+    Recording appends to the file as calls complete. For replay, calls
+    with the same fingerprint are served in the order they were recorded,
+    wrapping around once all of them were used.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.interactions: list[Interaction] = []
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with self.path.open(encoding='utf-8') as f:
+                self.interactions = [
+                    Interaction.from_json(line) for line in f if line.strip()
+                ]
+        self._by_fingerprint: dict[str, deque[Interaction]] = defaultdict(
+            deque,
+        )
+        for interaction in self.interactions:
+            self._by_fingerprint[interaction.fingerprint].append(interaction)
+        self._sequence = deque(self.interactions)
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def append(self, interaction: Interaction) -> None:
+        """Add an interaction and write it out at once."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a', encoding='utf-8') as f:
+                f.write(interaction.to_json() + '\n')
+            self.interactions.append(interaction)
+            self._by_fingerprint[interaction.fingerprint].append(interaction)
+            self._sequence.append(interaction)
+
+    def lookup(self, key: str, *, strict: bool = True) -> Interaction:
+        """Next interaction recorded for fingerprint ``key``.
+
+        Unless ``strict``, a request that was never recorded is answered
+        with the next interaction in recording order instead.
+        """
+        with self._lock:
+            queue = self._by_fingerprint.get(key)
+            if not queue:
+                if strict or not self._sequence:
+                    msg = f'No recorded interaction for request {key[:12]}'
+                    raise CassetteMissError(msg)
+                queue = self._sequence
+            interaction = queue[0]
+            queue.rotate(-1)
+            return interaction
+
+
+class RecordingBackend:
+    """Pass calls through to ``backend`` and record them to a cassette."""
+
+    def __init__(self, backend: ImageBackend, cassette: Cassette) -> None:
+        self._backend = backend
+        self.cassette = cassette
+
+    async def generate_content(
+        self,
+        *,
+        model: str,
+        contents: list,
+        config: types.GenerateContentConfig | None = None,
+    ) -> types.GenerateContentResponse:
+        key = fingerprint(model, contents, config)
+        start = time.perf_counter()
+        try:
+            response = await self._backend.generate_content(
+                model=model,
+                contents=contents,
+                config=config,
+            )
+        except errors.APIError as e:
+            interaction = Interaction(
+                fingerprint=key,
+                model=model,
+                latency=time.perf_counter() - start,
+                error_code=e.code,
+                error_json=e.details if isinstance(e.details, dict) else None,
+            )
+            await asyncio.to_thread(self.cassette.append, interaction)
+            raise
+        interaction = Interaction(
+            fingerprint=key,
+            model=model,
+            latency=time.perf_counter() - start,
+            response=response,
+        )
+        await asyncio.to_thread(self.cassette.append, interaction)
+        return response
+
+
+class ReplayBackend:
+    """Serve recorded interactions instead of calling the API.
+
+    Each answer is delayed by its recorded latency times ``time_scale``:
+    1 replays at the original speed, 0 as fast as possible.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        time_scale: float = 1.0,
+        *,
+        strict: bool = False,
+    ) -> None:
+        self.cassette = cassette
+        self.time_scale = time_scale
+        self.strict = strict
+        self.logger = logging.getLogger(__name__)
+
+    async def generate_content(
+        self,
+        *,
+        model: str,
+        contents: list,
+        config: types.GenerateContentConfig | None = None,
+    ) -> types.GenerateContentResponse:
+        key = fingerprint(model, contents, config)
+        interaction = self.cassette.lookup(key, strict=self.strict)
+        if interaction.fingerprint != key:
+            self.logger.debug('Replaying %s out of order', key[:12])
+        if delay := interaction.latency * self.time_scale:
+            await asyncio.sleep(delay)
+        return interaction.result()
@@ -1,86 +1,435 @@
 """Google Gemini image generator client (Async Version)."""
 
 import asyncio
+import contextlib
+import functools
 import io
 import logging
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
 from typing import Never
 
-from google import genai
+from google.genai import types
 from PIL import Image, ImageFile
 
+from nano_banana.api.backends import ImageBackend
+from nano_banana.api.breaker import BreakerPolicy, CircuitBreaker
+from nano_banana.api.files import FileUploadCache
+from nano_banana.api.hedging import HedgePolicy, Hedger
+from nano_banana.api.keypool import KeyPool, PooledKey
+from nano_banana.api.prompt_cache import SystemPromptCache
+from nano_banana.api.sessions import ChatSessionStore
+from nano_banana.core.deadline import stage_expired
+from nano_banana.core.imagehash import content_key
+from nano_banana.core.log import SAMPLED
+from nano_banana.core.metrics import metrics
+
+# Stands in for an API key when a custom backend needs none.
+OFFLINE_KEY = 'offline'
+
+
+def _content_keys(
+    images: Sequence[Image.Image | ImageFile.ImageFile],
+) -> list[str]:
+    return [content_key(img) for img in images]
+
+
+@dataclass(frozen=True, slots=True)
+class ClientFeatures:
+    """Optional behaviours of NanoBananaClient, all off by default."""
+
+    hedge: HedgePolicy | None = None
+    sessions: ChatSessionStore | None = None
+    files: FileUploadCache | None = None
+    prompt_cache: SystemPromptCache | None = None
+    breaker: BreakerPolicy | None = None
+    backend: ImageBackend | None = None
+
 
 class NanoBananaClient:
     """Google Gemini image generator client."""
 
     def __init__(
         self,
-        api_key: str,
+        api_key: str | Sequence[str],
         model_name: str,
         system_prompt: str = '',
+        key_cooldown: float = 60.0,
+        features: ClientFeatures | None = None,
     ) -> None:
-        if not api_key:
-            msg = 'Google API key is required'
-            self._raise_value_error(msg)
+        features = features or ClientFeatures()
+        self.backend = features.backend
+        api_keys = [api_key] if isinstance(api_key, str) else list(api_key)
+        if not (api_keys := [key for key in api_keys if key]):
+            if self.backend is None:
+                self._raise_value_error('Google API key is required')
+            api_keys = [OFFLINE_KEY]
 
-        self.client = genai.Client(api_key=api_key)
+        self.key_pool = self._new_key_pool(api_keys, key_cooldown)
+        self.client = self.key_pool.keys[0].client
         self.model_name = model_name
         self.system_prompt = system_prompt
+        self.hedge = features.hedge
+        self.hedgers: dict[str, Hedger] = {}
+        self.sessions = features.sessions
+        self.files = features.files
+        self.prompt_cache = features.prompt_cache
+        self.breaker = features.breaker
+        self.breakers: dict[str, CircuitBreaker] = {}
         self.logger = logging.getLogger(__name__)
         self.logger.info(
-            'NanoBananaClient initialized with model=%s',
+            'NanoBananaClient initialized with model=%s, keys=%d',
+            self.model_name,
+            len(self.key_pool),
+        )
+
+    def reconfigure(
+        self,
+        *,
+        api_key: str | Sequence[str] | None = None,
+        model_name: str | None = None,
+        system_prompt: str | None = None,
+        key_cooldown: float | None = None,
+    ) -> None:
+        """Swap in new settings without disturbing requests in flight.
+
+        Requests already running finish with the key they leased; later
+        requests use the new values. The key pool is only rebuilt when the
+        keys or cooldown change, and keys that stay keep their state.
+        """
+        if api_key is not None or key_cooldown is not None:
+            self._swap_key_pool(api_key, key_cooldown)
+        if model_name is not None:
+            self.model_name = model_name
+        if system_prompt is not None:
+            self.system_prompt = system_prompt
+        self.logger.info(
+            'NanoBananaClient reconfigured with model=%s, keys=%d',
             self.model_name,
+            len(self.key_pool),
         )
 
+    def _swap_key_pool(
+        self,
+        api_key: str | Sequence[str] | None,
+        key_cooldown: float | None,
+    ) -> None:
+        current = {key.api_key: key for key in self.key_pool.keys}
+        if api_key is None:
+            api_keys = list(current)
+        else:
+            api_keys = [api_key] if isinstance(api_key, str) else list(api_key)
+        if not (api_keys := [key for key in api_keys if key]):
+            if self.backend is None:
+                self._raise_value_error('Google API key is required')
+            api_keys = [OFFLINE_KEY]
+        cooldown = (
+            self.key_pool.cooldown if key_cooldown is None else key_cooldown
+        )
+        if (
+            list(dict.fromkeys(api_keys)) == list(current)
+            and cooldown == self.key_pool.cooldown
+        ):
+            return
+
+        pool = self._new_key_pool(api_keys, cooldown)
+        pool.keys = [current.get(key.api_key, key) for key in pool.keys]
+        self.key_pool = pool
+        self.client = pool.keys[0].client
+
+    def _new_key_pool(self, api_keys: list[str], cooldown: float) -> KeyPool:
+        """Key pool whose calls go to the configured backend."""
+        pool = KeyPool(api_keys, cooldown=cooldown)
+        if (backend := self.backend) is not None:
+            pool.intercept(lambda _: backend)
+        return pool
+
+    def breaker_for(self, model_name: str) -> CircuitBreaker | None:
+        """The circuit breaker of ``model_name``, one per model."""
+        if self.breaker is None:
+            return None
+        if model_name not in self.breakers:
+            self.breakers[model_name] = CircuitBreaker(
+                self.breaker,
+                name=model_name,
+            )
+        return self.breakers[model_name]
+
+    def available(self, model_name: str | None = None) -> bool:
+        """Whether the circuit of ``model_name`` would let a call through."""
+        breaker = self.breaker_for(model_name or self.model_name)
+        return breaker is None or breaker.allows()
+
+    def claim(
+        self,
+        model_name: str | None = None,
+    ) -> contextlib.AbstractContextManager[bool]:
+        """Hold a call to ``model_name`` while its inputs are prepared.
+
+        See ``CircuitBreaker.claim``; without a breaker it always succeeds.
+        """
+        breaker = self.breaker_for(model_name or self.model_name)
+        if breaker is None:
+            return contextlib.nullcontext(enter_result=True)
+        return breaker.claim()
+
     async def generate(
         self,
         prompt: str,
         images: list[Image.Image | ImageFile.ImageFile] | None = None,
-    ) -> tuple[str, Image.Image | None]:
-        """Generate or transform an image using Gemini asynchronously.
+        model_name: str | None = None,
+        session: str | None = None,
+        candidates: int = 1,
+    ) -> tuple[str, list[Image.Image]]:
+        """Generate or transform images using Gemini asynchronously.
 
         If images are provided, transforms them based on the prompt.
-        Otherwise, generates an image from the text prompt.
+        Otherwise, generates an image from the text prompt. ``model_name``
+        overrides the client's default model for this call. When the client
+        keeps chat sessions, ``session`` continues that conversation.
+        ``candidates`` asks for that many alternative responses at once.
+
+        Returns the text of the first candidate and every image of every
+        candidate, in order.
         """
 
-        if not prompt and not self.system_prompt:
-            self._raise_value_error('Prompt is required.')
-
-        contents: list[str | Image.Image | ImageFile.ImageFile] = (
-            [self.system_prompt, prompt, *images]
-            if images
-            else [self.system_prompt, prompt]
-        )
+        if not prompt.strip() and not images:
+            self._raise_value_error('A prompt or an image is required.')
+        if candidates < 1:
+            self._raise_value_error('At least one candidate is required.')
 
         self.logger.info(
             'Sending request to Gemini (Mode: %s)',
             'Image Transform' if images else 'Text to Image',
+            extra=SAMPLED,
         )
+        model_name = model_name or self.model_name
         try:
-            response = await self.client.aio.models.generate_content(
-                model=self.model_name,
-                contents=contents,
+            if session is not None and self.sessions is not None:
+                return await self._generate_in_session(
+                    session,
+                    prompt,
+                    images or [],
+                    model_name,
+                    candidates,
+                )
+
+            contents: list[str | Image.Image | ImageFile.ImageFile] = [
+                *([prompt] if prompt else []),
+                *(images or []),
+            ]
+            response = await self._request(contents, model_name, candidates)
+            return await self._parse_response(response)
+
+        except Exception:
+            self.logger.exception('Failed to generate image')
+            raise
+
+    async def _generate_in_session(
+        self,
+        session: str,
+        prompt: str,
+        images: list[Image.Image | ImageFile.ImageFile],
+        model_name: str,
+        candidates: int = 1,
+    ) -> tuple[str, list[Image.Image]]:
+        """Send one turn of a conversation on top of its stored history.
+
+        Input images the model produced earlier in the session are already
+        in its history and are not sent again. The first candidate becomes
+        the model's turn in the history.
+        """
+        if (sessions := self.sessions) is None:
+            self._raise_value_error('Chat sessions are not enabled.')
+        if seen := sessions.outputs(session):
+            keys = await asyncio.to_thread(_content_keys, images)
+            fresh = [
+                img
+                for img, key in zip(images, keys, strict=True)
+                if key not in seen
+            ]
+            # A turn needs at least one part; keep the images otherwise.
+            if prompt or fresh:
+                metrics.incr(
+                    'sessions.inputs_skipped',
+                    len(images) - len(fresh),
+                )
+                images = fresh
+        turn = await asyncio.to_thread(self._user_turn, prompt, images)
+        contents = [*sessions.history(session), turn]
+
+        response = await self._request(contents, model_name, candidates)
+        result = await self._parse_response(response)
+        if response.candidates and (reply := response.candidates[0].content):
+            produced = sum(
+                1
+                for part in reply.parts or []
+                if part.inline_data and part.inline_data.data
+            )
+            outputs = await asyncio.to_thread(
+                _content_keys,
+                result[1][:produced],
             )
+            sessions.append(session, turn, reply, outputs)
+        return result
+
+    async def _request(
+        self,
+        contents: list,
+        model_name: str,
+        candidates: int = 1,
+    ) -> types.GenerateContentResponse:
+        """Issue the API call, hedged when the client is configured to.
+
+        With circuit breakers, the call fails fast while the circuit of
+        its model is open and its outcome and latency feed that breaker
+        otherwise. A call cancelled by its deadline counts as a failure.
+        """
+        call = functools.partial(
+            self._generate_content,
+            contents,
+            model_name,
+            candidates,
+        )
+        if self.hedge:
+            hedger = self.hedgers.setdefault(
+                model_name,
+                Hedger(self.hedge, name=model_name),
+            )
+            call = functools.partial(hedger.run, call)
+        if (breaker := self.breaker_for(model_name)) is None:
+            return await call()
+
+        breaker.before_call()
+        start = time.perf_counter()
+        try:
+            response = await call()
+        except asyncio.CancelledError:
+            breaker.record_cancelled(timed_out=stage_expired())
+            raise
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        breaker.record_success(time.perf_counter() - start)
+        return response
+
+    async def _parse_response(
+        self,
+        response: types.GenerateContentResponse,
+    ) -> tuple[str, list[Image.Image]]:
+        if not response.parts:
+            self._raise_value_error('Empty response from Gemini model.')
+
+        resp_texts = [part.text for part in response.parts if part.text]
+        image_bytes = [
+            part.inline_data.data
+            for candidate in response.candidates or []
+            if candidate.content and candidate.content.parts
+            for part in candidate.content.parts
+            if part.inline_data and part.inline_data.data
+        ]
+        resp_images = await asyncio.gather(
+            *(
+                asyncio.to_thread(self._bytes_to_pil, data)
+                for data in image_bytes
+            ),
+        )
+        return ''.join(resp_texts), list(resp_images)
 
-            if not response.parts:
-                self._raise_value_error('Empty response from Gemini model.')
+    @staticmethod
+    def _user_turn(
+        prompt: str,
+        images: list[Image.Image | ImageFile.ImageFile],
+    ) -> types.Content:
+        """Encode a prompt and its images as one user turn."""
+        parts = [types.Part.from_text(text=prompt)] if prompt else []
+        for img in images:
+            with io.BytesIO() as bio:
+                img.save(bio, format='PNG')
+                parts.append(
+                    types.Part.from_bytes(
+                        data=bio.getvalue(),
+                        mime_type='image/png',
+                    ),
+                )
+        return types.Content(role='user', parts=parts)
 
-            resp_texts: list[str] = []
-            resp_image: Image.Image | None = None
-            for part in response.parts:
-                if part.text:
-                    resp_texts.append(part.text)
+    async def _generate_content(
+        self,
+        contents: list,
+        model_name: str,
+        candidates: int = 1,
+    ) -> types.GenerateContentResponse:
+        """Send the request through the key pool.
 
-                if part.inline_data and (image_bytes := part.inline_data.data):
-                    resp_image = await asyncio.to_thread(
-                        self._bytes_to_pil,
-                        image_bytes,
+        A request rejected for quota or auth reasons is retried on another
+        key while one is still in rotation, trying at most as many times as
+        there are keys.
+        """
+        attempts = len(self.key_pool)
+        while True:
+            attempts -= 1
+            try:
+                async with self.key_pool.lease() as key:
+                    return await key.backend.generate_content(
+                        model=model_name,
+                        contents=await self._attach_files(contents, key),
+                        config=await self._config_for(
+                            key,
+                            model_name,
+                            candidates,
+                        ),
                     )
+            except Exception as e:
+                if not (
+                    attempts > 0
+                    and self.key_pool.should_rotate(e)
+                    and self.key_pool.available()
+                ):
+                    raise
+                self.logger.warning('API key rejected request, rotating: %s', e)
 
-            return ''.join(resp_texts), resp_image
+    async def _config_for(
+        self,
+        key: PooledKey,
+        model_name: str,
+        candidates: int = 1,
+    ) -> types.GenerateContentConfig | None:
+        """Pass the system prompt as a system instruction, cached if long.
 
-        except Exception:
-            self.logger.exception('Failed to generate image')
-            raise
+        More than one candidate is asked for through ``candidate_count``.
+        """
+        config = None
+        if self.system_prompt and self.prompt_cache is not None:
+            config = await self.prompt_cache.config_for(
+                self.system_prompt,
+                key,
+                model_name,
+            )
+        elif self.system_prompt:
+            config = types.GenerateContentConfig(
+                system_instruction=self.system_prompt,
+            )
+        if candidates > 1:
+            config = (config or types.GenerateContentConfig()).model_copy(
+                update={'candidate_count': candidates},
+            )
+        return config
+
+    async def _attach_files(self, contents: list, key: PooledKey) -> list:
+        """Replace reused images with Files API references."""
+        if self.files is None:
+            return contents
+
+        files = self.files
+
+        async def attach(item: object) -> object:
+            if isinstance(item, Image.Image):
+                return await files.part_for(item, key) or item
+            return item
+
+        return list(await asyncio.gather(*map(attach, contents)))
 
     @staticmethod
     def _bytes_to_pil(data: bytes) -> Image.Image:
@@ -0,0 +1,375 @@
+"""Load generator for NanoBananaClient: ``nano_banana_cli bench``."""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+from collections import Counter
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from google.genai import errors, types
+from PIL import Image
+
+from nano_banana.api.backends import ImageBackend, LocalBackend
+from nano_banana.api.cassette import Cassette, RecordingBackend, ReplayBackend
+from nano_banana.api.client import OFFLINE_KEY, NanoBananaClient
+from nano_banana.core.config import Settings, get_settings
+from nano_banana.core.metrics import LatencyWindow
+
+PERCENTILES = (50, 90, 95, 99)
+
+parser = argparse.ArgumentParser(
+    prog='nano_banana_cli bench',
+    description='Send many requests through NanoBananaClient and report '
+    'throughput, latency, errors and bytes transferred.',
+)
+parser.add_argument(
+    '-n',
+    '--requests',
+    type=int,
+    default=20,
+    help='Number of requests to send.',
+)
+parser.add_argument(
+    '-c',
+    '--concurrency',
+    type=int,
+    help='Maximum requests in flight (default: 4, or unbounded with --rate).',
+)
+parser.add_argument(
+    '-r',
+    '--rate',
+    type=float,
+    help='Open-loop arrival rate in requests per second.',
+)
+parser.add_argument(
+    '-p',
+    '--prompt',
+    type=str,
+    default='A ripe banana on a wooden table',
+    help='Text prompt sent with every request.',
+)
+parser.add_argument(
+    '-i',
+    '--image',
+    type=str,
+    nargs='*',
+    help='Path(s) to input image(s) sent with every request.',
+)
+parser.add_argument('-m', '--model', type=str, help='Model to benchmark.')
+parser.add_argument('-k', '--key', type=str, help='API key for the real API.')
+parser.add_argument(
+    '--fake',
+    action='store_true',
+    help='Use the local procedural backend instead of the Gemini API.',
+)
+parser.add_argument(
+    '--fake-latency',
+    type=float,
+    default=0.5,
+    help='Mean latency of the fake backend in seconds.',
+)
+parser.add_argument(
+    '--fake-jitter',
+    type=float,
+    default=0.1,
+    help='Standard deviation of the fake latency in seconds.',
+)
+parser.add_argument(
+    '--fake-size',
+    type=int,
+    default=1024,
+    help='Side of the square images the fake backend returns.',
+)
+parser.add_argument(
+    '--fake-error-rate',
+    type=float,
+    default=0.0,
+    help='Fraction of fake requests that fail with a 503.',
+)
+parser.add_argument('--seed', type=int, help='Seed for the fake backend.')
+parser.add_argument(
+    '--record',
+    type=Path,
+    metavar='CASSETTE',
+    help='Record every call and its timing to a cassette file.',
+)
+parser.add_argument(
+    '--replay',
+    type=Path,
+    metavar='CASSETTE',
+    help='Answer calls from a recorded cassette instead of a backend.',
+)
+parser.add_argument(
+    '--time-scale',
+    type=float,
+    default=1.0,
+    help='Multiply replayed latencies by this factor (0 for no delay).',
+)
+parser.add_argument(
+    '--format',
+    choices=('table', 'json'),
+    default='table',
+    help='Report format.',
+)
+
+
+@dataclass(frozen=True, slots=True)
+class BenchConfig:
+    """What to send and how hard."""
+
+    requests: int = 20
+    concurrency: int | None = 4
+    rate: float | None = None
+    prompt: str = 'A ripe banana on a wooden table'
+    model: str | None = None
+
+
+@dataclass(slots=True)
+class Meter:
+    """Approximate payload bytes that went over the wire."""
+
+    sent: int = 0
+    received: int = 0
+    _image_sizes: dict[int, int] = field(default_factory=dict)
+
+    def request(self, contents: Sequence[object]) -> None:
+        for item in contents:
+            if isinstance(item, str):
+                self.sent += len(item.encode())
+            elif isinstance(item, Image.Image):
+                self.sent += self._image_size(item)
+            elif isinstance(item, types.Content):
+                self.sent += len(item.model_dump_json(exclude_none=True))
+
+    def response(self, response: types.GenerateContentResponse) -> None:
+        for part in response.parts or []:
+            if part.text:
+                self.received += len(part.text.encode())
+            if part.inline_data and part.inline_data.data:
+                self.received += len(part.inline_data.data)
+
+    def _image_size(self, image: Image.Image) -> int:
+        if (size := self._image_sizes.get(id(image))) is None:
+            with io.BytesIO() as bio:
+                image.save(bio, format='PNG')
+                size = self._image_sizes[id(image)] = len(bio.getvalue())
+        return size
+
+
+@dataclass(frozen=True, slots=True)
+class BenchReport:
+    """Outcome of one benchmark run."""
+
+    requests: int
+    succeeded: int
+    failed: int
+    duration_seconds: float
+    throughput: float
+    latency_seconds: dict[str, float]
+    errors: dict[str, int]
+    bytes_sent: int
+    bytes_received: int
+
+    def table(self) -> str:
+        rows = [
+            ('requests', f'{self.requests}'),
+            ('succeeded', f'{self.succeeded}'),
+            ('failed', f'{self.failed}'),
+            ('duration', f'{self.duration_seconds:.2f} s'),
+            ('throughput', f'{self.throughput:.2f} req/s'),
+            *(
+                (f'latency {name}', f'{value:.3f} s')
+                for name, value in self.latency_seconds.items()
+            ),
+            *(
+                (f'error {label}', f'{count}')
+                for label, count in self.errors.items()
+            ),
+            ('bytes sent', f'{self.bytes_sent:,}'),
+            ('bytes received', f'{self.bytes_received:,}'),
+        ]
+        width = max(len(name) for name, _ in rows)
+        return '\n'.join(f'{name:<{width}}  {value}' for name, value in rows)
+
+    def json(self) -> str:
+        return json.dumps(asdict(self), indent=2)
+
+
+class MeteredBackend:
+    """Count the payload bytes of the calls passing through ``backend``."""
+
+    def __init__(self, backend: ImageBackend, meter: Meter) -> None:
+        self._backend = backend
+        self._meter = meter
+
+    async def generate_content(
+        self,
+        *,
+        model: str,
+        contents: list,
+        config: types.GenerateContentConfig | None = None,
+    ) -> types.GenerateContentResponse:
+        self._meter.request(contents)
+        response = await self._backend.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
+        )
+        self._meter.response(response)
+        return response
+
+
+def _error_label(error: Exception) -> str:
+    if isinstance(error, errors.APIError):
+        return f'{type(error).__name__} {error.code}'
+    return type(error).__name__
+
+
+async def run_bench(
+    client: NanoBananaClient,
+    config: BenchConfig,
+    images: list[Image.Image] | None = None,
+    meter: Meter | None = None,
+) -> BenchReport:
+    """Send ``config.requests`` requests and summarise how they went.
+
+    Without a rate, ``concurrency`` requests are kept in flight (closed
+    loop). With a rate, requests arrive on a fixed schedule whatever the
+    backend does (open loop), capped at ``concurrency`` in flight if set.
+    Latency is measured from when a request is actually sent.
+    """
+    meter = meter or Meter()
+    latencies: list[float] = []
+    failures: Counter[str] = Counter()
+    semaphore = (
+        asyncio.Semaphore(config.concurrency) if config.concurrency else None
+    )
+
+    async def one() -> None:
+        async with semaphore or contextlib.nullcontext():
+            sent = time.perf_counter()
+            try:
+                await client.generate(
+                    prompt=config.prompt,
+                    images=images or None,
+                    model_name=config.model,
+                )
+            except Exception as e:  # noqa: BLE001
+                failures[_error_label(e)] += 1
+            else:
+                latencies.append(time.perf_counter() - sent)
+
+    start = time.perf_counter()
+    if config.rate:
+        async with asyncio.TaskGroup() as group:
+            for i in range(config.requests):
+                group.create_task(one())
+                due = start + (i + 1) / config.rate
+                await asyncio.sleep(max(due - time.perf_counter(), 0))
+    else:
+        await asyncio.gather(*(one() for _ in range(config.requests)))
+    duration = time.perf_counter() - start
+
+    succeeded = len(latencies)
+    window = LatencyWindow(size=max(succeeded, 1))
+    for value in latencies:
+        window.add(value)
+    latency = {
+        f'p{q}': value
+        for q in PERCENTILES
+        if (value := window.percentile(q)) is not None
+    }
+    if latencies:
+        latency['mean'] = sum(latencies) / succeeded
+        latency['max'] = max(latencies)
+    return BenchReport(
+        requests=config.requests,
+        succeeded=succeeded,
+        failed=config.requests - succeeded,
+        duration_seconds=duration,
+        throughput=succeeded / duration if duration else 0.0,
+        latency_seconds=latency,
+        errors=dict(failures.most_common()),
+        bytes_sent=meter.sent,
+        bytes_received=meter.received,
+    )
+
+
+def _backend(
+    args: argparse.Namespace,
+    meter: Meter,
+) -> Callable[[ImageBackend], ImageBackend]:
+    """Wrap each key's backend as the command line asks."""
+    fake = (
+        LocalBackend(
+            latency=args.fake_latency,
+            jitter=args.fake_jitter,
+            size=args.fake_size,
+            error_rate=args.fake_error_rate,
+            seed=args.seed,
+        )
+        if args.fake
+        else None
+    )
+    replay = (
+        ReplayBackend(Cassette(args.replay), args.time_scale)
+        if args.replay
+        else None
+    )
+    recording = Cassette(args.record) if args.record else None
+
+    def wrap(backend: ImageBackend) -> ImageBackend:
+        backend = replay or fake or backend
+        if recording is not None:
+            backend = RecordingBackend(backend, recording)
+        return MeteredBackend(backend, meter)
+
+    return wrap
+
+
+def load_settings(args: argparse.Namespace) -> Settings:
+    """Settings for a run; fake and replayed runs need no API key."""
+    if args.fake or args.replay:
+        return Settings(BACKEND='local')
+    return get_settings()
+
+
+async def amain(argv: Sequence[str] | None = None) -> BenchReport:
+    args = parser.parse_args(argv)
+    settings = load_settings(args)
+
+    if args.fake or args.replay:
+        api_key: str | list[str] = OFFLINE_KEY
+    elif not (api_key := args.key or settings.google_api_keys):
+        msg = 'API key is required.'
+        raise ValueError(msg)
+
+    images = []
+    for p in args.image or []:
+        with Image.open(p) as img:
+            images.append(img.convert('RGB').copy())
+
+    client = NanoBananaClient(
+        api_key=api_key,
+        model_name=settings.MODEL_NAME,
+        system_prompt=settings.SYSTEM_PROMPT,
+        key_cooldown=settings.KEY_COOLDOWN_SECONDS,
+    )
+    meter = Meter()
+    client.key_pool.intercept(_backend(args, meter))
+
+    config = BenchConfig(
+        requests=args.requests,
+        concurrency=args.concurrency or (None if args.rate else 4),
+        rate=args.rate,
+        prompt=args.prompt,
+        model=args.model,
+    )
+    report = await run_bench(client, config, images, meter)
+    print(report.json() if args.format == 'json' else report.table())  # noqa: T201
+    return report
@@ -2,13 +2,18 @@
 
 import argparse
 import asyncio
-import uuid
+import sys
+import time
+from collections.abc import Sequence
 from pathlib import Path
 
 from PIL import Image
 
 from nano_banana.api.client import NanoBananaClient
-from nano_banana.core.config import Settings, logging
+from nano_banana.api.demo import bench
+from nano_banana.core.config import get_settings, logging
+from nano_banana.core.log import configure_logging
+from nano_banana.core.store import OutputStore
 
 parser = argparse.ArgumentParser(
     description='A simple example of argparse usage.',
@@ -32,6 +37,13 @@ parser.add_argument(
     nargs='*',
     help='Path(s) to input image(s) for transformation.',
 )
+parser.add_argument(
+    '-n',
+    '--candidates',
+    type=int,
+    default=1,
+    help='Number of alternative images to ask for in one call.',
+)
 
 
 def ensure_output_dir(base_dir: Path) -> Path:
@@ -48,23 +60,9 @@ def ensure_output_dir(base_dir: Path) -> Path:
     return base_dir
 
 
-def mock_image_path(output_dir: Path, suffix: str = 'png') -> Path:
-    """Build a mock file path for generated images.
-
-    Args:
-        output_dir: Directory in which to place the mock file.
-        suffix: File suffix to use.
-
-    Returns:
-        A path pointing to the mock image file.
-    """
-
-    return output_dir / f'nano-banana-{uuid.uuid4().hex}.{suffix}'
-
-
-async def amain() -> None:
-    args = parser.parse_args()
-    settings = Settings()
+async def amain(argv: Sequence[str] | None = None) -> None:
+    args = parser.parse_args(argv)
+    settings = get_settings()
     logger = logging.getLogger(__name__)
 
     if not (api_key := args.key or settings.GOOGLE_API_KEY):
@@ -89,27 +87,51 @@ async def amain() -> None:
         model_name=settings.MODEL_NAME,
         system_prompt=settings.SYSTEM_PROMPT,
     )
+    start = time.perf_counter()
     try:
-        resp_text, resp_image = await nano_banana.generate(
+        resp_text, resp_images = await nano_banana.generate(
             prompt=prompt,
             images=images,
+            candidates=args.candidates,
         )
     except Exception:
         logger.exception('Error occurred during generation:')
         return
 
-    if not resp_text and not resp_image:
+    if not resp_text and not resp_images:
         logger.warning('No response generated from the model.')
         return
 
     if resp_text:
         logger.info('Generated text response: %s', resp_text)
-    if resp_image:
-        output_path = mock_image_path(output_dir)
-        resp_image.save(output_path)
-        logger.info('Generated image saved to: %s', output_path)
-        resp_image.show()
-
-
-def main() -> None:
-    asyncio.run(amain())
+    if not resp_images:
+        return
+    timings = {'generate': time.perf_counter() - start}
+    with OutputStore(output_dir) as store:
+        for resp_image in resp_images:
+            stored = await store.aput(
+                resp_image,
+                prompt=prompt,
+                model=settings.MODEL_NAME,
+                inputs=images,
+                timings=timings,
+            )
+            logger.info('Generated image saved to: %s', stored.path)
+            resp_image.show()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['bench']:
+        settings = bench.load_settings(bench.parser.parse_args(argv[1:]))
+    else:
+        settings = get_settings()
+    configure_logging(
+        settings.LOG_LEVEL,
+        fmt=settings.LOG_FORMAT,
+        sample_rate=settings.LOG_SAMPLE_RATE,
+    )
+    if argv[:1] == ['bench']:
+        asyncio.run(bench.amain(argv[1:]))
+        return
+    asyncio.run(amain(argv))
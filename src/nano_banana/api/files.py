@@ -0,0 +1,186 @@
+"""Upload frequently reused images once through the Gemini Files API."""
+
+import asyncio
+import io
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Protocol
+
+from google import genai
+from google.genai import types
+from PIL import Image, ImageFile
+
+from nano_banana.api.keypool import PooledKey
+from nano_banana.core.cache import LRUCache
+from nano_banana.core.imagehash import content_key
+from nano_banana.core.metrics import metrics
+
+FILE_TTL_SECONDS = 48 * 3600
+
+
+@dataclass(frozen=True, slots=True)
+class UploadedFile:
+    """Handle of a file stored by the Files API."""
+
+    name: str
+    uri: str
+    mime_type: str
+    expires_at: float
+
+
+class FileService(Protocol):
+    """Anything that can store bytes and hand back a file handle."""
+
+    async def upload(
+        self,
+        client: genai.Client,
+        data: bytes,
+        mime_type: str,
+    ) -> UploadedFile: ...
+
+
+class GeminiFileService:
+    """Upload through ``client.aio.files`` of the leased API key."""
+
+    async def upload(
+        self,
+        client: genai.Client,
+        data: bytes,
+        mime_type: str,
+    ) -> UploadedFile:
+        file = await client.aio.files.upload(
+            file=io.BytesIO(data),
+            config=types.UploadFileConfig(mime_type=mime_type),
+        )
+        expires_at = (
+            file.expiration_time.timestamp()
+            if file.expiration_time
+            else time.time() + FILE_TTL_SECONDS
+        )
+        return UploadedFile(
+            name=file.name or '',
+            uri=file.uri or '',
+            mime_type=file.mime_type or mime_type,
+            expires_at=expires_at,
+        )
+
+
+class FakeFileService:
+    """In-memory file service for offline tests and benchmarks."""
+
+    def __init__(self, ttl: float = FILE_TTL_SECONDS) -> None:
+        self.ttl = ttl
+        self.uploads: list[bytes] = []
+        self._ids = itertools.count(1)
+
+    async def upload(
+        self,
+        client: genai.Client,
+        data: bytes,
+        mime_type: str,
+    ) -> UploadedFile:
+        self.uploads.append(data)
+        name = f'files/fake-{next(self._ids)}'
+        return UploadedFile(
+            name=name,
+            uri=f'https://fake.files.local/{name}',
+            mime_type=mime_type,
+            expires_at=time.time() + self.ttl,
+        )
+
+
+def _encode_png(image: Image.Image | ImageFile.ImageFile) -> bytes:
+    with io.BytesIO() as bio:
+        image.save(bio, format='PNG')
+        return bio.getvalue()
+
+
+class FileUploadCache:
+    """Swap reused inline images for Files API references.
+
+    Images are tracked by content hash. Once an image has been seen
+    ``min_uses`` times it is uploaded and later requests refer to the file
+    handle instead of resending the bytes. Handles are re-uploaded when they
+    are within ``refresh_margin`` seconds of expiry. Files belong to the
+    project of the key that uploaded them, so handles are cached per key.
+    """
+
+    def __init__(
+        self,
+        service: FileService | None = None,
+        min_uses: int = 2,
+        refresh_margin: float = 600.0,
+        maxsize: int = 512,
+    ) -> None:
+        self.service = service or GeminiFileService()
+        self.min_uses = min_uses
+        self.refresh_margin = refresh_margin
+        self._uses: LRUCache[str, int] = LRUCache(maxsize * 4)
+        self._handles: LRUCache[tuple[str, str], UploadedFile] = LRUCache(
+            maxsize,
+        )
+        self._uploading: dict[tuple[str, str], asyncio.Future] = {}
+        self.logger = logging.getLogger(__name__)
+
+    async def part_for(
+        self,
+        image: Image.Image | ImageFile.ImageFile,
+        key: PooledKey,
+    ) -> types.Part | None:
+        """File reference for ``image``, or None to send it inline."""
+        digest = await asyncio.to_thread(content_key, image)
+        uses = (self._uses.get(digest) or 0) + 1
+        self._uses.put(digest, uses)
+
+        handle = self._handles.get((key.fingerprint, digest))
+        if handle and handle.expires_at - self.refresh_margin > time.time():
+            metrics.incr('files.lookups', result='hit')
+            return types.Part.from_uri(
+                file_uri=handle.uri,
+                mime_type=handle.mime_type,
+            )
+
+        if uses < self.min_uses:
+            metrics.incr('files.lookups', result='inline')
+            return None
+
+        metrics.incr(
+            'files.lookups',
+            result='refresh' if handle else 'upload',
+        )
+        try:
+            handle = await self._upload(image, key, digest)
+        except Exception:
+            self.logger.exception('File upload failed, sending inline:')
+            return None
+        return types.Part.from_uri(
+            file_uri=handle.uri,
+            mime_type=handle.mime_type,
+        )
+
+    async def _upload(
+        self,
+        image: Image.Image | ImageFile.ImageFile,
+        key: PooledKey,
+        digest: str,
+    ) -> UploadedFile:
+        """Upload once per key and digest, sharing concurrent attempts."""
+        slot = (key.fingerprint, digest)
+        if (pending := self._uploading.get(slot)) is not None:
+            return await asyncio.shield(pending)
+
+        async def upload() -> UploadedFile:
+            data = await asyncio.to_thread(_encode_png, image)
+            handle = await self.service.upload(key.client, data, 'image/png')
+            self._handles.put(slot, handle)
+            self.logger.info('Uploaded reference image as %s', handle.name)
+            return handle
+
+        task = asyncio.ensure_future(upload())
+        self._uploading[slot] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._uploading.pop(slot, None)
@@ -0,0 +1,93 @@
+"""Hedged requests to cut tail latency."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from nano_banana.core.metrics import LatencyWindow, metrics
+
+
+@dataclass(frozen=True, slots=True)
+class HedgePolicy:
+    """When to fire a backup request and how many of them to allow."""
+
+    percentile: float = 95.0
+    budget_ratio: float = 0.1
+    min_delay: float = 2.0
+    min_samples: int = 20
+
+
+class Hedger:
+    """Race a backup request against a slow primary.
+
+    If the primary has not finished after the configured percentile of
+    recent latency, an identical request is issued. The first successful
+    response wins and the other call is cancelled. Hedges are capped at
+    ``budget_ratio`` of primary requests.
+    """
+
+    def __init__(self, policy: HedgePolicy, name: str = '') -> None:
+        self.policy = policy
+        self.name = name
+        self.latency = LatencyWindow()
+        self.requests = 0
+        self.hedges = 0
+        self.logger = logging.getLogger(__name__)
+
+    def delay(self) -> float | None:
+        """Seconds to wait before hedging, or None while warming up."""
+        if len(self.latency) < self.policy.min_samples:
+            return None
+        threshold = self.latency.percentile(self.policy.percentile) or 0.0
+        return max(threshold, self.policy.min_delay)
+
+    def _within_budget(self) -> bool:
+        return self.hedges < self.policy.budget_ratio * self.requests
+
+    async def run[T](self, call: Callable[[], Awaitable[T]]) -> T:
+        """Run ``call``, hedging it once if it turns out to be slow."""
+        self.requests += 1
+        metrics.incr('hedge.requests', model=self.name)
+        start = time.perf_counter()
+
+        primary = asyncio.ensure_future(call())
+        tasks = [primary]
+        try:
+            if (delay := self.delay()) is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._within_budget():
+                    self.hedges += 1
+                    metrics.incr('hedge.issued', model=self.name)
+                    self.logger.info('Hedging request after %.2fs', delay)
+                    tasks.append(asyncio.ensure_future(call()))
+
+            winner = await _first_success(tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        self.latency.add(time.perf_counter() - start)
+        if len(tasks) > 1:
+            outcome = 'hedge' if winner is tasks[1] else 'primary'
+            metrics.incr('hedge.wins', model=self.name, winner=outcome)
+        return winner.result()
+
+
+async def _first_success[T](
+    tasks: list[asyncio.Future[T]],
+) -> asyncio.Future[T]:
+    """Wait for the first task that succeeds, or re-raise the first error."""
+    pending = set(tasks)
+    failures: list[BaseException] = []
+    while pending:
+        done, pending = await asyncio.wait(
+            pending,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        for task in sorted(done, key=tasks.index):
+            if (error := task.exception()) is None:
+                return task
+            failures.append(error)
+    raise failures[0]
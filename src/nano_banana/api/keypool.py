@@ -0,0 +1,154 @@
+"""Pool of Gemini API keys with least-outstanding load balancing."""
+
+import contextlib
+import hashlib
+import logging
+import time
+from collections.abc import AsyncIterator, Callable, Sequence
+from dataclasses import dataclass, field
+
+from google import genai
+from google.genai import errors
+
+from nano_banana.api.backends import GeminiBackend, ImageBackend
+from nano_banana.core.metrics import metrics
+
+RATE_LIMIT_CODES = frozenset({429})
+AUTH_ERROR_CODES = frozenset({401, 403})
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PooledKey:
+    """One API key, its client, its backend and its rotation state."""
+
+    api_key: str
+    client: genai.Client
+    backend: ImageBackend = field(init=False)
+    outstanding: int = 0
+    requests: int = 0
+    cooldown_until: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.backend = GeminiBackend(self.client)
+
+    @property
+    def label(self) -> str:
+        """Short, human-readable name for the key, for logs only.
+
+        Keys can share a suffix, so use ``fingerprint`` to tell them apart.
+        """
+        return f'...{self.api_key[-4:]}'
+
+    @property
+    def fingerprint(self) -> str:
+        """Unique, log-safe identity of the key."""
+        return hashlib.sha256(self.api_key.encode()).hexdigest()
+
+    @property
+    def metric_id(self) -> str:
+        """Prefix of ``fingerprint`` that labels the key's metrics."""
+        return self.fingerprint[:12]
+
+
+class KeyPool:
+    """Spread requests over several API keys.
+
+    Each request goes to the available key with the fewest outstanding
+    calls. A key that answers with a rate-limit or auth error is taken out
+    of rotation until its cooldown expires.
+    """
+
+    def __init__(
+        self,
+        api_keys: Sequence[str],
+        cooldown: float = 60.0,
+        auth_cooldown: float = 600.0,
+    ) -> None:
+        if not api_keys:
+            msg = 'At least one API key is required'
+            raise ValueError(msg)
+
+        self.keys = [
+            PooledKey(api_key=key, client=genai.Client(api_key=key))
+            for key in dict.fromkeys(api_keys)
+        ]
+        self.cooldown = cooldown
+        self.auth_cooldown = auth_cooldown
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def intercept(self, wrap: Callable[[ImageBackend], ImageBackend]) -> None:
+        """Replace every key's backend with ``wrap(backend)``.
+
+        Used to meter, record or replay requests, or to answer them from
+        another backend altogether.
+        """
+        for key in self.keys:
+            key.backend = wrap(key.backend)
+
+    def available(self) -> list[PooledKey]:
+        """Keys that are not cooling down."""
+        now = time.monotonic()
+        return [key for key in self.keys if key.cooldown_until <= now]
+
+    def pick(self) -> PooledKey:
+        """Choose the least busy key that is in rotation."""
+        if not (candidates := self.available()):
+            msg = 'All API keys are cooling down'
+            raise RuntimeError(msg)
+        return min(candidates, key=lambda k: (k.outstanding, k.requests))
+
+    @staticmethod
+    def should_rotate(error: Exception) -> bool:
+        """Whether the error means another key might succeed."""
+        return isinstance(error, errors.APIError) and (
+            error.code in RATE_LIMIT_CODES or error.code in AUTH_ERROR_CODES
+        )
+
+    def _bench(self, key: PooledKey, error: errors.APIError) -> None:
+        if error.code in RATE_LIMIT_CODES:
+            cooldown = self.cooldown
+        elif error.code in AUTH_ERROR_CODES:
+            cooldown = self.auth_cooldown
+        else:
+            return
+        key.cooldown_until = time.monotonic() + cooldown
+        logger.warning(
+            'Key %s benched for %.0f s after HTTP %d',
+            key.label,
+            cooldown,
+            error.code,
+        )
+        metrics.incr('keypool.benched', key=key.metric_id, code=error.code)
+
+    @contextlib.asynccontextmanager
+    async def lease(self) -> AsyncIterator[PooledKey]:
+        """Borrow a key for one request and record its outcome."""
+        key = self.pick()
+        key.outstanding += 1
+        metrics.set('keypool.outstanding', key.outstanding, key=key.metric_id)
+        start = time.perf_counter()
+        try:
+            yield key
+        except errors.APIError as e:
+            metrics.incr('keypool.errors', key=key.metric_id, code=e.code)
+            self._bench(key, e)
+            raise
+        except Exception:
+            metrics.incr('keypool.errors', key=key.metric_id, code='other')
+            raise
+        finally:
+            key.outstanding -= 1
+            key.requests += 1
+            metrics.set(
+                'keypool.outstanding', key.outstanding, key=key.metric_id
+            )
+            metrics.incr('keypool.requests', key=key.metric_id)
+            metrics.observe(
+                'keypool.latency',
+                time.perf_counter() - start,
+                key=key.metric_id,
+            )
@@ -0,0 +1,125 @@
+"""Serve a long system prompt from Gemini context caching."""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from google.genai import types
+
+from nano_banana.api.keypool import PooledKey
+from nano_banana.core.metrics import metrics
+
+
+@dataclass(frozen=True, slots=True)
+class _CachedPrompt:
+    name: str
+    expires_at: float
+
+
+class SystemPromptCache:
+    """Create a cached-content object for the system prompt and reuse it.
+
+    Prompts shorter than ``min_chars`` are not worth caching and are sent as
+    a plain ``system_instruction``. Longer ones are cached once per API key,
+    model and prompt text, and their TTL is extended when they get within
+    ``refresh_margin`` seconds of expiry. Any caching failure falls back to
+    the plain system instruction, and caching is not retried for that slot
+    until ``ttl`` seconds have passed. Calls that reuse a cache are counted
+    in ``prompt_cache.hit`` and the others in ``prompt_cache.miss``, per
+    model.
+    """
+
+    def __init__(
+        self,
+        min_chars: int = 4096,
+        ttl: float = 3600.0,
+        refresh_margin: float = 300.0,
+    ) -> None:
+        self.min_chars = min_chars
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._entries: dict[tuple[str, str, str], _CachedPrompt] = {}
+        self._failed_until: dict[tuple[str, str, str], float] = {}
+        self._locks: defaultdict[tuple[str, str, str], asyncio.Lock] = (
+            defaultdict(asyncio.Lock)
+        )
+        self.logger = logging.getLogger(__name__)
+
+    async def config_for(
+        self,
+        system_prompt: str,
+        key: PooledKey,
+        model_name: str,
+    ) -> types.GenerateContentConfig:
+        """Generation config carrying the system prompt for this call."""
+        plain = types.GenerateContentConfig(system_instruction=system_prompt)
+        if len(system_prompt) < self.min_chars:
+            return plain
+
+        digest = hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+        slot = (key.fingerprint, model_name, digest)
+        if self._failed_until.get(slot, 0) > time.time():
+            metrics.incr('prompt_cache.miss', model=model_name)
+            return plain
+        try:
+            async with self._locks[slot]:
+                entry = await self._ensure(slot, system_prompt, key)
+        except Exception:
+            self.logger.exception('Context caching failed, sending prompt:')
+            metrics.incr('prompt_cache.events', event='error')
+            metrics.incr('prompt_cache.miss', model=model_name)
+            self._failed_until[slot] = time.time() + self.ttl
+            return plain
+        return types.GenerateContentConfig(cached_content=entry.name)
+
+    async def _ensure(
+        self,
+        slot: tuple[str, str, str],
+        system_prompt: str,
+        key: PooledKey,
+    ) -> _CachedPrompt:
+        now = time.time()
+        entry = self._entries.get(slot)
+        if entry and entry.expires_at - self.refresh_margin > now:
+            metrics.incr('prompt_cache.hit', model=slot[1])
+            self.logger.debug('System prompt cache hit: %s', entry.name)
+            return entry
+
+        caches = key.client.aio.caches
+        ttl = f'{int(self.ttl)}s'
+        if entry and entry.expires_at > now:
+            cached = await caches.update(
+                name=entry.name,
+                config=types.UpdateCachedContentConfig(ttl=ttl),
+            )
+            event = 'refresh'
+        else:
+            cached = await caches.create(
+                model=slot[1],
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_prompt,
+                    ttl=ttl,
+                ),
+            )
+            event = 'create'
+
+        entry = _CachedPrompt(
+            name=cached.name or (entry.name if entry else ''),
+            expires_at=cached.expire_time.timestamp()
+            if cached.expire_time
+            else now + self.ttl,
+        )
+        self._entries[slot] = entry
+        metrics.incr('prompt_cache.events', event=event)
+        outcome = 'hit' if event == 'refresh' else 'miss'
+        metrics.incr(f'prompt_cache.{outcome}', model=slot[1])
+        self.logger.info(
+            'System prompt cache %s: %s (model=%s)',
+            event,
+            entry.name,
+            slot[1],
+        )
+        return entry
@@ -0,0 +1,163 @@
+"""Policy-based routing of generation requests across Gemini models."""
+
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from PIL import Image, ImageFile
+
+from nano_banana.api.client import NanoBananaClient
+from nano_banana.core.config import MODEL_MAX_IMAGES
+from nano_banana.core.metrics import LatencyWindow, metrics
+
+
+@dataclass(frozen=True, slots=True)
+class RoutingPolicy:
+    """Thresholds that decide which model serves a request."""
+
+    fast_model: str = 'gemini-2.5-flash-image'
+    pro_model: str = 'gemini-3-pro-image-preview'
+    pro_min_images: int = 3
+    max_error_rate: float = 0.5
+    max_p95_seconds: float = 60.0
+    min_samples: int = 10
+    window_seconds: float = 300.0
+
+
+class ModelHealth:
+    """Recent outcomes of one model within a sliding time window."""
+
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self._outcomes: deque[tuple[float, bool, float]] = deque()
+
+    def record(self, ok: bool, latency: float) -> None:
+        self._outcomes.append((time.monotonic(), ok, latency))
+        self._prune()
+
+    def _prune(self) -> None:
+        horizon = time.monotonic() - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._outcomes.popleft()
+
+    @property
+    def samples(self) -> int:
+        self._prune()
+        return len(self._outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        if not (samples := self.samples):
+            return 0.0
+        return sum(not ok for _, ok, _ in self._outcomes) / samples
+
+    @property
+    def p95(self) -> float:
+        window = LatencyWindow(size=max(self.samples, 1))
+        for _, _, latency in self._outcomes:
+            window.add(latency)
+        return window.percentile(95) or 0.0
+
+    def is_healthy(self, policy: RoutingPolicy) -> bool:
+        """Healthy until enough samples show errors or slow responses."""
+        if self.samples < policy.min_samples:
+            return True
+        return (
+            self.error_rate <= policy.max_error_rate
+            and self.p95 <= policy.max_p95_seconds
+        )
+
+
+class ModelRouter:
+    """Route requests to the fast or pro model by policy.
+
+    Text-only and lightly illustrated prompts go to the fast model, prompts
+    with many reference images to the pro model. When the preferred model is
+    unhealthy and the other one can take the request, it falls back.
+    """
+
+    def __init__(
+        self,
+        client: NanoBananaClient,
+        policy: RoutingPolicy | None = None,
+    ) -> None:
+        self.client = client
+        self.policy = policy or RoutingPolicy()
+        self.health = {
+            model: ModelHealth(self.policy.window_seconds)
+            for model in (self.policy.fast_model, self.policy.pro_model)
+        }
+        self.logger = logging.getLogger(__name__)
+
+    def _can_serve(self, model: str, image_count: int) -> bool:
+        return image_count <= MODEL_MAX_IMAGES.get(model, image_count)
+
+    def _is_healthy(self, model: str) -> bool:
+        """Healthy by its recent outcomes and not cut off by its breaker."""
+        return self.health[model].is_healthy(
+            self.policy,
+        ) and self.client.available(model)
+
+    def choose(self, image_count: int) -> tuple[str, str]:
+        """Return the model for a request and the reason it was picked."""
+        policy = self.policy
+        if image_count >= policy.pro_min_images:
+            preferred, alternate, reason = (
+                policy.pro_model,
+                policy.fast_model,
+                'images',
+            )
+        else:
+            preferred, alternate, reason = (
+                policy.fast_model,
+                policy.pro_model,
+                'text' if not image_count else 'light',
+            )
+
+        if not self._can_serve(preferred, image_count):
+            return alternate, 'capacity'
+
+        if (
+            not self._is_healthy(preferred)
+            and self._is_healthy(alternate)
+            and self._can_serve(alternate, image_count)
+        ):
+            return alternate, 'fallback'
+
+        return preferred, reason
+
+    async def generate(
+        self,
+        prompt: str,
+        images: list[Image.Image | ImageFile.ImageFile] | None = None,
+        session: str | None = None,
+        candidates: int = 1,
+    ) -> tuple[str, list[Image.Image]]:
+        """Generate through the model chosen for this request."""
+        model, reason = self.choose(len(images or []))
+        metrics.incr('router.decisions', model=model, reason=reason)
+        self.logger.info('Routing request to %s (%s)', model, reason)
+
+        start = time.perf_counter()
+        try:
+            result = await self.client.generate(
+                prompt=prompt,
+                images=images,
+                model_name=model,
+                session=session,
+                candidates=candidates,
+            )
+        except Exception:
+            self.health[model].record(ok=False, latency=_elapsed(start))
+            metrics.incr('router.errors', model=model)
+            raise
+
+        latency = _elapsed(start)
+        self.health[model].record(ok=True, latency=latency)
+        metrics.observe('router.latency', latency, model=model)
+        return result
+
+
+def _elapsed(start: float) -> float:
+    return time.perf_counter() - start
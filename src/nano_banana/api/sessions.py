@@ -0,0 +1,118 @@
+"""Bounded store of multi-turn conversation histories."""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from google.genai import types
+
+from nano_banana.core.cache import LRUCache
+from nano_banana.core.metrics import metrics
+
+
+@dataclass(frozen=True, slots=True)
+class _Exchange:
+    """One user turn, the model's reply and the images that reply carried.
+
+    ``outputs`` holds the content keys of the reply's decoded images.
+    """
+
+    user: types.Content
+    model: types.Content
+    outputs: frozenset[str] = frozenset()
+
+
+def _content_nbytes(content: types.Content) -> int:
+    total = 0
+    for part in content.parts or []:
+        total += len(part.text or '')
+        if part.inline_data and part.inline_data.data:
+            total += len(part.inline_data.data)
+    return total
+
+
+def _history_nbytes(exchanges: list[_Exchange]) -> int:
+    """Approximate memory held by a history's text and inline data."""
+    return sum(
+        _content_nbytes(exchange.user) + _content_nbytes(exchange.model)
+        for exchange in exchanges
+    )
+
+
+class ChatSessionStore:
+    """Conversation histories keyed by session (thread or channel/user).
+
+    Each history keeps at most ``max_turns`` user/model exchanges, and
+    drops its oldest ones while it holds more than ``max_bytes``. Sessions
+    are evicted least-recently-used once there are more than
+    ``max_sessions`` of them or they hold more than ``max_bytes`` in total,
+    and expire after ``idle_seconds`` without a new turn.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 4,
+        max_sessions: int = 128,
+        idle_seconds: float = 1800.0,
+        max_bytes: int | None = None,
+    ) -> None:
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+        self._histories: LRUCache[str, list[_Exchange]] = LRUCache(
+            max_sessions,
+            ttl=idle_seconds,
+            max_bytes=max_bytes,
+            sizeof=_history_nbytes,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self._histories.nbytes
+
+    def __len__(self) -> int:
+        return len(self._histories)
+
+    def history(self, key: str) -> list[types.Content]:
+        """Return a copy of the session's history (empty if unknown)."""
+        exchanges = self._histories.get(key)
+        metrics.incr('sessions.lookups', hit=exchanges is not None)
+        return [
+            content
+            for exchange in exchanges or []
+            for content in (exchange.user, exchange.model)
+        ]
+
+    def outputs(self, key: str) -> frozenset[str]:
+        """Content keys of the model's images still in the session."""
+        return frozenset().union(
+            *(exchange.outputs for exchange in self._histories.get(key) or []),
+        )
+
+    def append(
+        self,
+        key: str,
+        user_turn: types.Content,
+        model_turn: types.Content,
+        outputs: Iterable[str] = (),
+    ) -> None:
+        """Add one exchange, dropping the oldest beyond the window.
+
+        Exchanges are also dropped oldest-first until the history fits in
+        ``max_bytes``, counted in ``sessions.trimmed``. A single exchange
+        that does not fit ends the session, counted in ``sessions.dropped``.
+        """
+        exchange = _Exchange(user_turn, model_turn, frozenset(outputs))
+        exchanges = [*(self._histories.get(key) or []), exchange]
+        exchanges = exchanges[-self.max_turns :]
+        if self.max_bytes is not None:
+            while (
+                len(exchanges) > 1
+                and _history_nbytes(exchanges) > self.max_bytes
+            ):
+                exchanges = exchanges[1:]
+                metrics.incr('sessions.trimmed')
+            if _history_nbytes(exchanges) > self.max_bytes:
+                metrics.incr('sessions.dropped')
+        self._histories.put(key, exchanges)
+
+    def reset(self, key: str) -> None:
+        self._histories.pop(key)
@@ -0,0 +1,219 @@
+"""Admission control that sheds load before any work is done."""
+
+import asyncio
+import contextlib
+import enum
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Self
+
+from nano_banana.core.metrics import LatencyWindow, metrics
+
+
+class Priority(enum.IntEnum):
+    """Higher priorities are admitted first and shed last."""
+
+    PASSIVE = 0
+    COMMAND = 1
+
+
+@dataclass(frozen=True, slots=True)
+class AdmissionPolicy:
+    """Limits past which new requests are rejected."""
+
+    max_concurrent: int = 4
+    max_queue: int = 16
+    max_wait_seconds: float = 90.0
+    command_reserve: int = 4
+    default_service_seconds: float = 30.0
+
+
+class Ticket:
+    """A request admitted into the queue.
+
+    Entering the ticket waits for a run slot; leaving it frees the slot,
+    or the queue place if the slot was never taken.
+    """
+
+    def __init__(
+        self,
+        controller: 'AdmissionController',
+        priority: Priority,
+    ) -> None:
+        self._controller = controller
+        self.priority = priority
+        self._running = False
+        self._done = False
+
+    async def __aenter__(self) -> Self:
+        await self._controller._acquire(self)  # noqa: SLF001
+        self._running = True
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.release()
+
+    def release(self) -> None:
+        if not self._done:
+            self._done = True
+            self._controller._release(self, running=self._running)  # noqa: SLF001
+
+
+class AdmissionController:
+    """Bound concurrent jobs and shed load by queue depth and wait.
+
+    At most ``max_concurrent`` tickets run at once; the rest queue by
+    priority. A new request is rejected when the queue is full or its
+    estimated wait is over ``max_wait_seconds``. Commands get
+    ``command_reserve`` extra queue places and are served before passive
+    messages.
+    """
+
+    def __init__(self, policy: AdmissionPolicy | None = None) -> None:
+        self.policy = policy or AdmissionPolicy()
+        self.running = 0
+        self.queued = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._seq = itertools.count()
+        self._service = LatencyWindow(size=64)
+        self._started: dict[int, float] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def service_time(self) -> float:
+        """Typical time a job holds its slot."""
+        return (
+            self._service.percentile(50) or self.policy.default_service_seconds
+        )
+
+    def estimated_wait(self, priority: Priority = Priority.PASSIVE) -> float:
+        """Seconds a new request of ``priority`` would wait for a slot."""
+        ahead = self.queued
+        if priority > Priority.PASSIVE:
+            ahead = sum(-p >= priority for p, _, _ in self._waiters)
+        free = self.policy.max_concurrent - self.running
+        if ahead < free:
+            return 0.0
+        rounds = math.ceil((ahead - free + 1) / self.policy.max_concurrent)
+        return rounds * self.service_time()
+
+    def rejects(self, priority: Priority = Priority.PASSIVE) -> str | None:
+        """Why a new request would be shed right now, if it would."""
+        limit = self.policy.max_queue
+        if priority > Priority.PASSIVE:
+            limit += self.policy.command_reserve
+        if self.queued >= limit:
+            return 'queue'
+        if self.estimated_wait(priority) > self.policy.max_wait_seconds:
+            return 'wait'
+        return None
+
+    def admit(
+        self,
+        priority: Priority = Priority.PASSIVE,
+    ) -> Ticket | None:
+        """Take a queue place, or return None if the request is shed."""
+        if reason := self.rejects(priority):
+            metrics.incr(
+                'admission.shed',
+                reason=reason,
+                priority=priority.name.lower(),
+            )
+            self.logger.warning(
+                'Shedding %s request (%s): running=%d queued=%d',
+                priority.name.lower(),
+                reason,
+                self.running,
+                self.queued,
+            )
+            return None
+        return self.reserve(priority)
+
+    def reserve(self, priority: Priority = Priority.PASSIVE) -> Ticket:
+        """Take a queue place without checking the shedding thresholds."""
+        self.queued += 1
+        metrics.incr('admission.admitted', priority=priority.name.lower())
+        self._report()
+        return Ticket(self, priority)
+
+    @contextlib.contextmanager
+    def borrow(self, count: int) -> Iterator[int]:
+        """Take up to ``count`` free run slots for the block, without queueing.
+
+        For a running job that fans out into several calls. Yields how many
+        slots were taken; none are lent while requests wait for one.
+        """
+        free = 0 if self._waiters else self.policy.max_concurrent - self.running
+        taken = max(min(count, free), 0)
+        self.running += taken
+        self._report()
+        try:
+            yield taken
+        finally:
+            self.running -= taken
+            self._wake()
+            self._report()
+
+    async def _acquire(self, ticket: Ticket) -> None:
+        start = time.perf_counter()
+        if self.running < self.policy.max_concurrent and not self._waiters:
+            self._start(ticket)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            entry = (-ticket.priority, next(self._seq), future)
+            heapq.heappush(self._waiters, entry)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # __aexit__ will not run, so give back what the ticket holds.
+                if handed_over := future.done() and not future.cancelled():
+                    self._started[id(ticket)] = time.perf_counter()
+                else:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                ticket._running = handed_over  # noqa: SLF001
+                ticket.release()
+                raise
+            self._started[id(ticket)] = time.perf_counter()
+        metrics.observe('admission.wait', time.perf_counter() - start)
+
+    def _start(self, ticket: Ticket) -> None:
+        self.queued -= 1
+        self.running += 1
+        self._started[id(ticket)] = time.perf_counter()
+        self._report()
+
+    def _release(self, ticket: Ticket, *, running: bool) -> None:
+        if running:
+            started = self._started.pop(id(ticket), None)
+            if started is not None:
+                self._service.add(time.perf_counter() - started)
+            self.running -= 1
+            self._wake()
+        else:
+            self.queued -= 1
+        self._report()
+
+    def _wake(self) -> None:
+        """Hand free slots to the highest-priority waiters."""
+        while self._waiters and self.running < self.policy.max_concurrent:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.queued -= 1
+            self.running += 1
+            future.set_result(None)
+
+    def _report(self) -> None:
+        metrics.set('admission.running', self.running)
+        metrics.set('admission.queued', self.queued)
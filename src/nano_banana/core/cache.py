@@ -0,0 +1,77 @@
+"""Bounded in-memory LRU cache with optional TTL and byte budget."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import NamedTuple
+
+
+class _Entry[V](NamedTuple):
+    value: V
+    expires_at: float
+    size: int
+
+
+class LRUCache[K, V]:
+    """Least-recently-used cache.
+
+    Entries are evicted oldest-first when the cache holds more than
+    ``maxsize`` items or, if ``sizeof`` is given, more than ``max_bytes``
+    in total. Entries older than ``ttl`` seconds are treated as missing.
+    A value larger than ``max_bytes`` is not stored, and drops the value
+    previously stored under its key.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._entries: OrderedDict[K, _Entry[V]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        if (entry := self._entries.get(key)) is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, key: K, value: V) -> None:
+        self.pop(key)
+        size = self.sizeof(value) if self.sizeof else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else float('inf')
+        self._entries[key] = _Entry(value, expires_at, size)
+        self.nbytes += size
+        self._evict()
+
+    def pop(self, key: K) -> V | None:
+        if (entry := self._entries.pop(key, None)) is None:
+            return None
+        self.nbytes -= entry.size
+        return entry.value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.maxsize or (
+            self.max_bytes is not None and self.nbytes > self.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
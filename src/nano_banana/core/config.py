@@ -1,20 +1,108 @@
 """Application configuration using Pydantic settings."""
 
 import logging
+import threading
+from collections.abc import Callable
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+MODEL_MAX_IMAGES: dict[str, int] = {
+    'gemini-2.5-flash-image': 3,
+    'gemini-3-pro-image-preview': 14,
+}
+BACKENDS = frozenset({'gemini', 'local'})
+ATTACHMENT_LIMITS = frozenset(
+    {'max_bytes', 'max_side', 'max_pixels', 'downscale_side'},
+)
+
 
 class Settings(BaseSettings):
     """Configuration loaded from environment variables."""
 
     GOOGLE_API_KEY: str = ''
+    GOOGLE_API_KEYS: str = ''
+    KEY_COOLDOWN_SECONDS: float = 60.0
+    BACKEND: str = 'gemini'
+    LOCAL_BACKEND_LATENCY_SECONDS: float = 0.5
+    LOCAL_BACKEND_JITTER_SECONDS: float = 0.1
+    LOCAL_BACKEND_SIZE: int = 1024
+    LOCAL_BACKEND_ERROR_RATE: float = 0.0
     DISCORD_TOKEN: str = ''
     DISCORD_GUILD_ID: int = -1
     LOG_LEVEL: str = 'INFO'
+    LOG_FORMAT: str = 'json'
+    LOG_SAMPLE_RATE: float = 1.0
+    METRICS_LOG_INTERVAL_SECONDS: float = 60.0
     MODEL_NAME: str = 'gemini-2.5-flash-image'
     MAX_IMAGE_PER_REQUEST: int = -1
     SYSTEM_PROMPT: str = ''
+    CANDIDATE_COUNT: int = 1
+    VARIATIONS_MAX: int = 4
+    ATTACHMENT_MAX_BYTES: int = 20 * 1024 * 1024
+    ATTACHMENT_MAX_SIDE: int = 8192
+    ATTACHMENT_MAX_PIXELS: int = 40_000_000
+    ATTACHMENT_DOWNSCALE_SIDE: int = 2048
+    ATTACHMENT_MODEL_LIMITS: dict[str, dict[str, int]] = {}
+    ATTACHMENT_GUILD_LIMITS: dict[int, dict[str, int]] = {}
+    ROUTER_ENABLED: bool = False
+    ROUTER_FAST_MODEL: str = 'gemini-2.5-flash-image'
+    ROUTER_PRO_MODEL: str = 'gemini-3-pro-image-preview'
+    ROUTER_PRO_MIN_IMAGES: int = 3
+    ROUTER_MAX_ERROR_RATE: float = 0.5
+    ROUTER_MAX_P95_SECONDS: float = 60.0
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_BUDGET_RATIO: float = 0.1
+    HEDGE_MIN_DELAY_SECONDS: float = 2.0
+    BREAKER_ENABLED: bool = True
+    BREAKER_WINDOW_SECONDS: float = 60.0
+    BREAKER_MIN_CALLS: int = 5
+    BREAKER_MAX_ERROR_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 90.0
+    BREAKER_OPEN_SECONDS: float = 30.0
+    CHAT_SESSIONS_ENABLED: bool = False
+    CHAT_HISTORY_TURNS: int = 4
+    CHAT_MAX_SESSIONS: int = 128
+    CHAT_SESSION_IDLE_SECONDS: float = 1800.0
+    CHAT_SESSIONS_MAX_BYTES: int = 128 * 1024 * 1024
+    FILES_CACHE_ENABLED: bool = False
+    FILES_MIN_USES: int = 2
+    FILES_CACHE_SIZE: int = 512
+    PROMPT_CACHE_ENABLED: bool = False
+    PROMPT_CACHE_MIN_CHARS: int = 4096
+    PROMPT_CACHE_TTL_SECONDS: float = 3600.0
+    PREVIEW_ENABLED: bool = False
+    PREVIEW_MODEL: str = 'gemini-2.5-flash-image'
+    PREVIEW_MAX_SIDE: int = 512
+    TRIGGER_MENTION: bool = False
+    TRIGGER_PREFIX: str = ''
+    TRIGGER_CHANNEL_IDS: str = ''
+    TRIGGER_ROLE_IDS: str = ''
+    IMAGE_DEDUP_ENABLED: bool = True
+    IMAGE_DEDUP_MAX_DISTANCE: int = 4
+    IMAGE_DEDUP_MAX_DELTA: float = 6.0
+    IMAGE_DEDUP_EXTRA_INPUTS: int = 2
+    REFERENCE_CACHE_SIZE: int = 4096
+    OUTPUT_CACHE_SIZE: int = 256
+    OUTPUT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    OUTPUT_CACHE_TTL_SECONDS: float = 3600.0
+    OUTPUT_STORE_ENABLED: bool = False
+    OUTPUT_STORE_PATH: str = 'nano_banana_outputs'
+    ADMISSION_MAX_CONCURRENT: int = 4
+    ADMISSION_MAX_QUEUE: int = 16
+    ADMISSION_MAX_WAIT_SECONDS: float = 90.0
+    ADMISSION_COMMAND_RESERVE: int = 4
+    SHUTDOWN_DRAIN_SECONDS: float = 30.0
+    DEADLINE_TOTAL_SECONDS: float = 300.0
+    DEADLINE_FETCH_SECONDS: float = 15.0
+    DEADLINE_DOWNLOAD_SECONDS: float = 30.0
+    DEADLINE_GENERATE_SECONDS: float = 180.0
+    DEADLINE_ENCODE_SECONDS: float = 15.0
+    DEADLINE_UPLOAD_SECONDS: float = 60.0
+    SETTINGS_WATCH_INTERVAL: float = 2.0
+    JOURNAL_PATH: str = 'nano_banana_jobs.db'
+    JOURNAL_REPLAY_CONCURRENCY: int = 2
+    JOURNAL_MAX_ATTEMPTS: int = 3
 
     model_config = SettingsConfigDict(
         env_file=('.env', '../.env'),
@@ -23,11 +111,19 @@ class Settings(BaseSettings):
         extra='ignore',
     )
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s.%(msecs)03d | %(levelname)s | %(name)s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-    )
+    @property
+    def google_api_keys(self) -> list[str]:
+        """GOOGLE_API_KEY followed by any comma-separated GOOGLE_API_KEYS."""
+        extra = (key.strip() for key in self.GOOGLE_API_KEYS.split(','))
+        return list(dict.fromkeys([self.GOOGLE_API_KEY, *filter(None, extra)]))
+
+    @property
+    def trigger_channel_ids(self) -> frozenset[int]:
+        return _split_ids(self.TRIGGER_CHANNEL_IDS)
+
+    @property
+    def trigger_role_ids(self) -> frozenset[int]:
+        return _split_ids(self.TRIGGER_ROLE_IDS)
 
     @property
     def discord_token(self) -> str:
@@ -43,21 +139,121 @@ class Settings(BaseSettings):
         msg = 'DISCORD_GUILD_ID is not set'
         raise ValueError(msg)
 
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, **values: object) -> None:
+        super().__init__(**values)
         logger = logging.getLogger(__name__)
 
-        if not self.GOOGLE_API_KEY:
+        if self.LOG_LEVEL.upper() not in logging.getLevelNamesMapping():
+            msg = f'Unsupported LOG_LEVEL: {self.LOG_LEVEL}'
+            logger.error(msg)
+            raise ValueError(msg)
+
+        if self.BACKEND not in BACKENDS:
+            msg = f'Unsupported BACKEND: {self.BACKEND}'
+            logger.error(msg)
+            raise ValueError(msg)
+
+        if self.BACKEND == 'gemini' and not self.GOOGLE_API_KEY:
             msg = 'GOOGLE_API_KEY must be set in environment variables.'
             logger.error(msg)
             raise ValueError(msg)
 
-        match self.MODEL_NAME:
-            case 'gemini-2.5-flash-image':
-                self.MAX_IMAGE_PER_REQUEST = 3
-            case 'gemini-3-pro-image-preview':
-                self.MAX_IMAGE_PER_REQUEST = 14
-            case _:
-                msg = f'Unsupported MODEL_NAME: {self.MODEL_NAME}'
+        models = [self.MODEL_NAME]
+        if self.ROUTER_ENABLED:
+            models = [self.ROUTER_FAST_MODEL, self.ROUTER_PRO_MODEL]
+
+        for model in models:
+            if model not in MODEL_MAX_IMAGES:
+                msg = f'Unsupported MODEL_NAME: {model}'
+                logger.error(msg)
+                raise ValueError(msg)
+
+        self.MAX_IMAGE_PER_REQUEST = max(map(MODEL_MAX_IMAGES.get, models))
+
+        for overrides in (
+            *self.ATTACHMENT_MODEL_LIMITS.values(),
+            *self.ATTACHMENT_GUILD_LIMITS.values(),
+        ):
+            if unknown := overrides.keys() - ATTACHMENT_LIMITS:
+                msg = f'Unsupported attachment limits: {sorted(unknown)}'
                 logger.error(msg)
                 raise ValueError(msg)
+
+
+def _split_ids(value: str) -> frozenset[int]:
+    """Parse a comma-separated list of Discord snowflakes."""
+    return frozenset(int(part) for part in value.split(',') if part.strip())
+
+
+class SettingsProvider:
+    """Load Settings once and swap them atomically on reload.
+
+    A reload parses and validates a complete new Settings, then hands it
+    to the subscribers, and only swaps it in once all of them applied it.
+    A bad edit or a failing subscriber leaves the running settings in
+    place, with subscribers that already ran given the old ones back.
+    """
+
+    def __init__(self, factory: Callable[[], Settings] = Settings) -> None:
+        self._factory = factory
+        self._settings: Settings | None = None
+        self._lock = threading.Lock()
+        self._subscribers: list[Callable[[Settings], None]] = []
+        self.logger = logging.getLogger(__name__)
+
+    def get(self) -> Settings:
+        """The current settings, loaded on first use."""
+        with self._lock:
+            if self._settings is None:
+                self._settings = self._factory()
+            return self._settings
+
+    def load(self) -> Settings:
+        """Parse and validate fresh settings without applying them."""
+        return self._factory()
+
+    def apply(self, settings: Settings) -> Settings:
+        """Hand ``settings`` to every subscriber, then make them current.
+
+        If a subscriber raises, every subscriber called so far, the failing
+        one included, is called again with the current settings, and the
+        error is raised.
+        """
+        previous = self.get()
+        applied: list[Callable[[Settings], None]] = []
+        try:
+            for callback in list(self._subscribers):
+                applied.append(callback)
+                callback(settings)
+        except Exception:
+            self.logger.exception('Failed to apply reloaded settings:')
+            for callback in reversed(applied):
+                try:
+                    callback(previous)
+                except Exception:
+                    self.logger.exception('Failed to restore settings:')
+            raise
+        with self._lock:
+            self._settings = settings
+        self.logger.info('Settings reloaded')
+        return settings
+
+    def reload(self) -> Settings:
+        """Load fresh settings and apply them."""
+        return self.apply(self.load())
+
+    def subscribe(
+        self,
+        callback: Callable[[Settings], None],
+    ) -> Callable[[Settings], None]:
+        """Call ``callback`` after every reload; usable as a decorator."""
+        self._subscribers.append(callback)
+        return callback
+
+
+settings_provider = SettingsProvider()
+
+
+def get_settings() -> Settings:
+    """The process-wide settings, parsed only once."""
+    return settings_provider.get()
@@ -0,0 +1,61 @@
+"""Tile several images into one contact sheet with NumPy."""
+
+import math
+from collections.abc import Sequence
+
+import numpy as np
+from PIL import Image, ImageOps
+
+WHITE = (255, 255, 255)
+
+
+def _cell(
+    image: Image.Image,
+    size: tuple[int, int],
+    background: tuple[int, int, int],
+) -> np.ndarray:
+    """``image`` as an RGB array of ``size``, letterboxed if it differs."""
+    image = image.convert('RGB')
+    if image.size != size:
+        image = ImageOps.pad(image, size, color=background)
+    return np.asarray(image)
+
+
+def contact_sheet(
+    images: Sequence[Image.Image],
+    *,
+    columns: int | None = None,
+    gap: int = 8,
+    background: tuple[int, int, int] = WHITE,
+) -> Image.Image:
+    """Lay ``images`` out in a grid, row by row, as a single image.
+
+    Every cell has the size of the first image; others are scaled to fit
+    it. The grid is as square as possible unless ``columns`` is given, and
+    cells are ``gap`` pixels apart. The cells are stacked into one array
+    and rearranged into the sheet in a single reshape, without pasting
+    them one by one.
+    """
+    if not images:
+        msg = 'At least one image is required.'
+        raise ValueError(msg)
+
+    columns = min(columns or math.ceil(math.sqrt(len(images))), len(images))
+    rows = math.ceil(len(images) / columns)
+    width, height = images[0].size
+    cells = np.empty(
+        (rows * columns, height + gap, width + gap, 3),
+        dtype=np.uint8,
+    )
+    cells[...] = background
+    cells[: len(images), :height, :width] = np.stack(
+        [_cell(image, (width, height), background) for image in images],
+    )
+    sheet = (
+        cells.reshape(rows, columns, height + gap, width + gap, 3)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(rows * (height + gap), columns * (width + gap), 3)
+    )
+    return Image.fromarray(
+        sheet[: sheet.shape[0] - gap, : sheet.shape[1] - gap]
+    )
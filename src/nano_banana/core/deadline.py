@@ -0,0 +1,105 @@
+"""End-to-end request deadlines split into per-stage budgets."""
+
+import asyncio
+import contextlib
+import contextvars
+import time
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+
+from nano_banana.core.metrics import metrics
+
+
+@dataclass(frozen=True, slots=True)
+class StageBudgets:
+    """Seconds a request may spend in total and in each stage."""
+
+    total: float = 300.0
+    fetch: float = 15.0
+    download: float = 30.0
+    generate: float = 180.0
+    encode: float = 15.0
+    upload: float = 60.0
+
+
+class DeadlineExceededError(TimeoutError):
+    """A stage ran out of its budget or of the request's deadline."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f'{stage} stage ran out of time')
+        self.stage = stage
+
+
+class Deadline:
+    """The time left for one request, shared by all of its stages."""
+
+    def __init__(self, budgets: StageBudgets | None = None) -> None:
+        self.budgets = budgets or StageBudgets()
+        self.expires = time.monotonic() + self.budgets.total
+
+    def remaining(self) -> float:
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def budget_for(self, stage: str) -> float:
+        """Seconds ``stage`` may run: its own budget, capped by the total."""
+        return min(getattr(self.budgets, stage), self.remaining())
+
+
+_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    'deadline',
+    default=None,
+)
+
+
+_timeout: contextvars.ContextVar[asyncio.Timeout | None] = (
+    contextvars.ContextVar('stage_timeout', default=None)
+)
+
+
+def current_deadline() -> Deadline | None:
+    return _deadline.get()
+
+
+def stage_expired() -> bool:
+    """Whether the innermost budget around the caller has run out.
+
+    Tells work cancelled by its deadline apart from other cancellations.
+    """
+    timeout = _timeout.get()
+    return timeout is not None and timeout.expired()
+
+
+@contextlib.contextmanager
+def deadline_scope(budgets: StageBudgets | None = None) -> Iterator[Deadline]:
+    """Start the deadline of the request handled inside the block."""
+    deadline = Deadline(budgets)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def budget(stage: str) -> AsyncIterator[None]:
+    """Cancel the block once ``stage`` runs out of time.
+
+    Work still running in the block is cancelled and DeadlineExceededError
+    is raised in its place. Outside a deadline scope the block is unbounded.
+    """
+    if (deadline := _deadline.get()) is None:
+        yield
+        return
+
+    timeout = asyncio.timeout(deadline.budget_for(stage))
+    token = _timeout.set(timeout)
+    try:
+        async with timeout:
+            yield
+    except TimeoutError as e:
+        if not timeout.expired():
+            raise
+        metrics.incr('deadline.hits', stage=stage)
+        raise DeadlineExceededError(stage) from e
+    finally:
+        _timeout.reset(token)
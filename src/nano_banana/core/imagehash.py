@@ -0,0 +1,109 @@
+"""Exact and DCT-based perceptual hashing of images."""
+
+import functools
+import hashlib
+from collections.abc import Sequence
+
+import numpy as np
+from PIL import Image, ImageFile
+
+from nano_banana.core.metrics import metrics
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+THUMBNAIL_SIZE = 16
+
+
+@functools.cache
+def _dct_rows() -> np.ndarray:
+    """First ``HASH_SIZE`` rows of the orthonormal DCT-II matrix."""
+    k = np.arange(HASH_SIZE)[:, None]
+    n = np.arange(SAMPLE_SIZE)[None, :]
+    rows = np.cos(np.pi * (2 * n + 1) * k / (2 * SAMPLE_SIZE))
+    rows *= np.sqrt(2 / SAMPLE_SIZE)
+    rows[0] /= np.sqrt(2)
+    return rows
+
+
+def _sample(image: Image.Image | ImageFile.ImageFile) -> np.ndarray:
+    small = image.convert('L').resize(
+        (SAMPLE_SIZE, SAMPLE_SIZE),
+        Image.Resampling.LANCZOS,
+    )
+    return np.asarray(small, dtype=np.float64)
+
+
+def content_key(image: Image.Image | ImageFile.ImageFile) -> str:
+    """Hash of an image's decoded pixels."""
+    digest = hashlib.sha256(f'{image.mode}{image.size}'.encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def phash_many(
+    images: Sequence[Image.Image | ImageFile.ImageFile],
+) -> np.ndarray:
+    """64-bit perceptual hashes of ``images`` as a ``uint64`` array.
+
+    Each image is reduced to a 32x32 grayscale thumbnail, and the lowest
+    8x8 DCT frequencies are compared against their median. The DCT of the
+    whole batch runs as a single stacked matrix product.
+    """
+    if not images:
+        return np.empty(0, dtype=np.uint64)
+    pixels = np.stack([_sample(image) for image in images])
+    dct = _dct_rows()
+    low = dct @ pixels @ dct.T
+    flat = low.reshape(len(images), -1)
+    bits = flat > np.median(flat, axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view('>u8').ravel().astype(np.uint64)
+
+
+def phash(image: Image.Image | ImageFile.ImageFile) -> int:
+    """Perceptual hash of one image."""
+    return int(phash_many([image])[0])
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+def _thumbnail(image: Image.Image | ImageFile.ImageFile) -> np.ndarray:
+    small = image.convert('RGB').resize(
+        (THUMBNAIL_SIZE, THUMBNAIL_SIZE),
+        Image.Resampling.BOX,
+    )
+    return np.asarray(small, dtype=np.float64)
+
+
+def dedupe[T: Image.Image | ImageFile.ImageFile](
+    images: Sequence[T],
+    max_distance: int = 4,
+    max_delta: float = 6.0,
+) -> list[T]:
+    """Drop images that are the same picture as an earlier one.
+
+    Two images match when their hashes are within ``max_distance`` bits
+    and their 16x16 colour thumbnails differ by at most ``max_delta`` per
+    channel on average (out of 255). The hash ignores brightness and
+    colour, so the thumbnails keep darkened or recoloured edits apart from
+    their source. The first occurrence is kept, so the order of the
+    remaining images is preserved.
+    """
+    if len(images) < 2:  # noqa: PLR2004
+        return list(images)
+    hashes = phash_many(images)
+    distances = np.bitwise_count(hashes[:, None] ^ hashes[None, :])
+    thumbnails = np.stack([_thumbnail(image) for image in images])
+    kept: list[int] = []
+    for i in range(len(images)):
+        if not any(
+            distances[i, j] <= max_distance
+            and np.abs(thumbnails[i] - thumbnails[j]).mean() <= max_delta
+            for j in kept
+        ):
+            kept.append(i)
+    if dropped := len(images) - len(kept):
+        metrics.incr('images.duplicates', dropped)
+    return [images[i] for i in kept]
@@ -0,0 +1,73 @@
+"""Track in-flight jobs so shutdown can drain them."""
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from nano_banana.core.metrics import metrics
+
+
+@dataclass(frozen=True, slots=True)
+class DrainReport:
+    """Outcome of waiting for in-flight jobs at shutdown."""
+
+    completed: int
+    abandoned: int
+
+
+class InFlightTracker:
+    """Register the tasks running jobs and wait for them on shutdown.
+
+    Once ``stop_accepting`` is called, callers should refuse new work;
+    ``drain`` then gives the running jobs until a deadline to finish and
+    cancels whatever is left.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: set[asyncio.Task] = set()
+        self.accepting = True
+        self.logger = logging.getLogger(__name__)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @contextlib.contextmanager
+    def track(self) -> Iterator[None]:
+        """Mark the current task as running a job for the block."""
+        task = asyncio.current_task()
+        if task is None or task in self._tasks:
+            yield
+            return
+        self._tasks.add(task)
+        metrics.set('inflight.jobs', len(self._tasks))
+        try:
+            yield
+        finally:
+            self._tasks.discard(task)
+            metrics.set('inflight.jobs', len(self._tasks))
+
+    def stop_accepting(self) -> None:
+        self.accepting = False
+
+    async def drain(self, deadline: float) -> DrainReport:
+        """Wait up to ``deadline`` seconds for jobs, then cancel the rest."""
+        self.stop_accepting()
+        if not (pending := set(self._tasks)):
+            return DrainReport(completed=0, abandoned=0)
+
+        self.logger.info(
+            'Waiting up to %.0fs for %d in-flight jobs',
+            deadline,
+            len(pending),
+        )
+        done, pending = await asyncio.wait(pending, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        report = DrainReport(completed=len(done), abandoned=len(pending))
+        metrics.incr('shutdown.jobs', report.completed, outcome='completed')
+        metrics.incr('shutdown.jobs', report.abandoned, outcome='abandoned')
+        return report
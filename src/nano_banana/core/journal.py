@@ -0,0 +1,135 @@
+"""Write-ahead job journal backed by SQLite."""
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import Self
+
+
+class JobState(StrEnum):
+    """Lifecycle state of a journaled job."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+
+
+@dataclass(frozen=True, slots=True)
+class Job:
+    """A generation request that has not been delivered yet."""
+
+    id: int
+    channel_id: int
+    message_id: int
+    prompt: str
+    image_urls: list[str]
+    state: JobState
+    attempts: int
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    prompt TEXT NOT NULL,
+    image_urls TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobJournal:
+    """Persist in-flight jobs so they can be replayed after a restart.
+
+    Only unfinished jobs live in the journal: a job is inserted as pending,
+    marked running when work starts, and deleted once it is delivered.
+    Whatever is left on startup was interrupted and should be replayed.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(_SCHEMA)
+
+    def add(
+        self,
+        channel_id: int,
+        message_id: int,
+        prompt: str,
+        image_urls: list[str],
+    ) -> int:
+        """Record a new pending job and return its ID."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO jobs (channel_id, message_id, prompt, image_urls,'
+                ' state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    channel_id,
+                    message_id,
+                    prompt,
+                    json.dumps(image_urls),
+                    JobState.PENDING,
+                    now,
+                    now,
+                ),
+            )
+        return int(cursor.lastrowid or 0)
+
+    def start(self, job_id: int) -> None:
+        """Mark a job as running and count the attempt."""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, attempts = attempts + 1,'
+                ' updated_at = ? WHERE id = ?',
+                (JobState.RUNNING, time.time(), job_id),
+            )
+
+    def finish(self, job_id: int) -> None:
+        """Drop a job from the journal once it needs no replay."""
+        with self._lock:
+            self._conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def unfinished(self) -> list[Job]:
+        """Return every pending or running job, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, channel_id, message_id, prompt, image_urls, state,'
+                ' attempts FROM jobs ORDER BY id',
+            ).fetchall()
+        return [
+            Job(
+                id=row[0],
+                channel_id=row[1],
+                message_id=row[2],
+                prompt=row[3],
+                image_urls=json.loads(row[4]),
+                state=JobState(row[5]),
+                attempts=row[6],
+            )
+            for row in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
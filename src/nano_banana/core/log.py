@@ -0,0 +1,179 @@
+"""Queue-backed logging with request IDs, stage timings and sampling."""
+
+import atexit
+import contextlib
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+import uuid
+from collections.abc import Callable, Iterator
+
+TEXT_FORMAT = (
+    '%(asctime)s.%(msecs)03d | %(levelname)s | %(name)s | '
+    '%(request_id)s | %(message)s'
+)
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Pass as ``extra=SAMPLED`` to let a noisy record be sampled.
+SAMPLED = {'sampled': True}
+
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    'request_id',
+    default=None,
+)
+_stages: contextvars.ContextVar[dict[str, float] | None] = (
+    contextvars.ContextVar('stages', default=None)
+)
+_listener: logging.handlers.QueueListener | None = None
+_handler: logging.Handler | None = None
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+@contextlib.contextmanager
+def request_scope(request_id: str | None = None) -> Iterator[str]:
+    """Tag every record logged inside the block with a request ID."""
+    request_id = request_id or uuid.uuid4().hex[:12]
+    id_token = _request_id.set(request_id)
+    stages_token = _stages.set({})
+    try:
+        yield request_id
+    finally:
+        _stages.reset(stages_token)
+        _request_id.reset(id_token)
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the current request and attach it to its records."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if (stages := _stages.get()) is not None:
+            stages[name] = round(time.perf_counter() - start, 4)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the request ID and stage timings onto each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or '-'
+        record.stages = dict(_stages.get() or {})
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a ``rate`` fraction of records marked with ``SAMPLED``.
+
+    Warnings and errors are never dropped.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        rand: Callable[[], float] = random.random,
+    ) -> None:
+        super().__init__()
+        self.rate = rate
+        self.rand = rand
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False):
+            return True
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return self.rand() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, object] = {
+            'time': self.formatTime(record, DATE_FORMAT)
+            + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if (request_id := getattr(record, 'request_id', '-')) != '-':
+            entry['request_id'] = request_id
+        if stages := getattr(record, 'stages', None):
+            entry['stages'] = stages
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info,
+            )
+            record.exc_info = None
+        return record
+
+
+def configure_logging(
+    level: str | int = 'INFO',
+    fmt: str = 'json',
+    sample_rate: float = 1.0,
+) -> logging.handlers.QueueListener:
+    """Route root logging through a queue drained by a writer thread.
+
+    Calls on the event loop only enqueue records; a background thread
+    formats them and writes to stderr. Calling this again replaces the
+    previous setup.
+    """
+    global _listener, _handler  # noqa: PLW0603
+    shutdown_logging()
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(
+        JsonFormatter()
+        if fmt == 'json'
+        else logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT),
+    )
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.addHandler(handler)
+
+    _handler = handler
+    _listener = logging.handlers.QueueListener(log_queue, stream)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and detach the queue handler."""
+    global _listener, _handler  # noqa: PLW0603
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,126 @@
+"""In-process metrics registry."""
+
+import asyncio
+import json
+import logging
+import math
+import threading
+from collections import defaultdict, deque
+
+
+class LatencyWindow:
+    """Rolling window of recent samples with nearest-rank percentiles."""
+
+    def __init__(self, size: int = 256) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self._samples.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        """Return the q-th percentile (0-100), or None without samples."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(math.ceil(q / 100 * len(ordered)), 1)
+        return ordered[rank - 1]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+def _key(name: str, labels: dict[str, object]) -> str:
+    if not labels:
+        return name
+    rendered = ','.join(f'{k}={v}' for k, v in sorted(labels.items()))
+    return f'{name}{{{rendered}}}'
+
+
+class Metrics:
+    """Counters, gauges and latency histograms keyed by name and labels."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: defaultdict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._histograms: defaultdict[str, LatencyWindow] = defaultdict(
+            LatencyWindow,
+        )
+
+    def incr(self, name: str, value: float = 1, **labels: object) -> None:
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def set(self, name: str, value: float, **labels: object) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        with self._lock:
+            self._histograms[_key(name, labels)].add(value)
+
+    def counter(self, name: str, **labels: object) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def gauge(self, name: str, **labels: object) -> float | None:
+        with self._lock:
+            return self._gauges.get(_key(name, labels))
+
+    def histogram(self, name: str, **labels: object) -> LatencyWindow:
+        with self._lock:
+            return self._histograms[_key(name, labels)]
+
+    def snapshot(self) -> dict[str, float]:
+        """Flatten every metric into a name -> value mapping."""
+        with self._lock:
+            snapshot = dict(self._counters) | self._gauges
+            for key, window in self._histograms.items():
+                snapshot[f'{key}.count'] = len(window)
+                for q in (50, 95, 99):
+                    if (value := window.percentile(q)) is not None:
+                        snapshot[f'{key}.p{q}'] = value
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+metrics = Metrics()
+
+
+class MetricsReporter:
+    """Log a snapshot of ``registry`` every ``interval`` seconds.
+
+    Each report is one INFO record whose message carries the snapshot as a
+    JSON object, so the counters can be read from the logs.
+    """
+
+    def __init__(self, registry: Metrics, interval: float = 60.0) -> None:
+        self.registry = registry
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.logger = logging.getLogger(__name__)
+
+    def report(self) -> None:
+        snapshot = self.registry.snapshot()
+        self.logger.info('Metrics %s', json.dumps(snapshot, sort_keys=True))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.report()
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop reporting, after one last report."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self.report()
@@ -0,0 +1,101 @@
+"""Trigger settings reloads from .env file changes or SIGHUP."""
+
+import asyncio
+import contextlib
+import logging
+import signal
+from collections.abc import Sequence
+from pathlib import Path
+
+from nano_banana.core.config import Settings, SettingsProvider
+from nano_banana.core.metrics import metrics
+
+
+def _env_files() -> list[Path]:
+    env_file = Settings.model_config.get('env_file') or ()
+    if isinstance(env_file, (str, Path)):
+        env_file = (env_file,)
+    return [Path(path) for path in env_file]
+
+
+class SettingsWatcher:
+    """Reload settings when an env file changes or on SIGHUP.
+
+    Files are polled every ``interval`` seconds by modification time and
+    size. Settings are parsed off the event loop and applied on it, so
+    subscribers never race requests. A failed reload is logged and
+    counted, and the previous settings stay active.
+    """
+
+    def __init__(
+        self,
+        provider: SettingsProvider,
+        paths: Sequence[str | Path] | None = None,
+        interval: float = 2.0,
+    ) -> None:
+        self.provider = provider
+        self.paths = [Path(p) for p in paths] if paths else _env_files()
+        self.interval = interval
+        self._stamps = self._snapshot()
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _snapshot(self) -> dict[Path, tuple[int, int] | None]:
+        stamps: dict[Path, tuple[int, int] | None] = {}
+        for path in self.paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                stamps[path] = None
+            else:
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def changed(self) -> bool:
+        """Whether any watched file changed since the last check."""
+        stamps = self._snapshot()
+        changed, self._stamps = stamps != self._stamps, stamps
+        return changed
+
+    async def reload(self, trigger: str = 'manual') -> bool:
+        """Reload the settings, returning whether the new ones took effect."""
+        async with self._lock:
+            try:
+                settings = await asyncio.to_thread(self.provider.load)
+                self.provider.apply(settings)
+            except Exception:
+                self.logger.exception('Settings reload rejected:')
+                metrics.incr('settings.reloads', trigger=trigger, ok=False)
+                return False
+        metrics.incr('settings.reloads', trigger=trigger, ok=True)
+        return True
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if await asyncio.to_thread(self.changed):
+                self.logger.info('Settings file changed, reloading')
+                await self.reload('file')
+
+    def start(self) -> None:
+        """Start polling the files and listening for SIGHUP."""
+        loop = asyncio.get_running_loop()
+        with contextlib.suppress(NotImplementedError, AttributeError):
+            loop.add_signal_handler(
+                signal.SIGHUP,
+                lambda: asyncio.ensure_future(self.reload('signal')),
+            )
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        with contextlib.suppress(
+            NotImplementedError,
+            AttributeError,
+            RuntimeError,
+        ):
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
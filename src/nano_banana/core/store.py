@@ -0,0 +1,333 @@
+"""Content-addressed store of generated images with a SQLite index."""
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Self
+
+from PIL import Image, ImageFile
+
+from nano_banana.core.imagehash import content_key
+
+
+@dataclass(frozen=True, slots=True)
+class StoredOutput:
+    """One generation and the image file it produced."""
+
+    id: int
+    digest: str
+    path: Path
+    prompt: str
+    model: str
+    input_hashes: list[str]
+    timings: dict[str, float]
+    size: int
+    width: int
+    height: int
+    created_at: float
+
+
+@dataclass(frozen=True, slots=True)
+class ModelSummary:
+    """Aggregate figures for the generations of one model."""
+
+    model: str
+    generations: int
+    outputs: int
+    total_bytes: int
+    mean_generate_seconds: float | None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    digest TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL REFERENCES outputs (digest),
+    prompt TEXT NOT NULL,
+    model TEXT NOT NULL,
+    input_key TEXT NOT NULL,
+    input_hashes TEXT NOT NULL,
+    timings TEXT NOT NULL,
+    generate_seconds REAL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generation_inputs (
+    generation_id INTEGER NOT NULL REFERENCES generations (id),
+    input_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generations_request
+    ON generations (model, prompt, input_key);
+CREATE INDEX IF NOT EXISTS generations_created ON generations (created_at);
+CREATE INDEX IF NOT EXISTS generations_digest ON generations (digest);
+CREATE INDEX IF NOT EXISTS generation_inputs_hash
+    ON generation_inputs (input_hash);
+"""
+
+_SELECT = (
+    'SELECT g.id, g.digest, o.path, g.prompt, g.model, g.input_hashes,'
+    ' g.timings, o.size, o.width, o.height, g.created_at'
+    ' FROM generations g JOIN outputs o ON o.digest = g.digest'
+)
+
+
+def _encode_png(image: Image.Image) -> bytes:
+    with io.BytesIO() as bio:
+        image.save(bio, format='PNG')
+        return bio.getvalue()
+
+
+def _input_key(input_hashes: Sequence[str]) -> str:
+    return ','.join(input_hashes)
+
+
+class OutputStore:
+    """Keep generated images on disk by content hash and index them.
+
+    Each image is written once as ``<root>/<aa>/<sha256>.png``, however
+    many generations produced it. Every generation is indexed in SQLite
+    with its prompt, model, content hashes of its inputs, timings and
+    output size, so results can be reused and the workload analysed
+    offline. The blocking methods are thread-safe; the ``a``-prefixed
+    ones run them off the event loop.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        index_path: str | Path | None = None,
+    ) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = str(index_path or self.root / 'index.db')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.index_path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    def put(
+        self,
+        image: Image.Image,
+        *,
+        prompt: str,
+        model: str,
+        inputs: Sequence[Image.Image | ImageFile.ImageFile] = (),
+        timings: Mapping[str, float] | None = None,
+    ) -> StoredOutput:
+        """Write ``image`` unless it is already stored and index the call."""
+        data = _encode_png(image)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.root / digest[:2] / f'{digest}.png'
+        if not path.exists():
+            self._write(path, data)
+
+        input_hashes = [content_key(img) for img in inputs]
+        timings = dict(timings or {})
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.execute(
+                    'INSERT OR IGNORE INTO outputs (digest, path, size, width,'
+                    ' height, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (digest, str(path), len(data), *image.size, now),
+                )
+                cursor = self._conn.execute(
+                    'INSERT INTO generations (digest, prompt, model, input_key,'
+                    ' input_hashes, timings, generate_seconds, created_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        digest,
+                        prompt,
+                        model,
+                        _input_key(input_hashes),
+                        json.dumps(input_hashes),
+                        json.dumps(timings),
+                        timings.get('generate'),
+                        now,
+                    ),
+                )
+                generation_id = int(cursor.lastrowid or 0)
+                self._conn.executemany(
+                    'INSERT INTO generation_inputs (generation_id, input_hash)'
+                    ' VALUES (?, ?)',
+                    [(generation_id, h) for h in dict.fromkeys(input_hashes)],
+                )
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        return StoredOutput(
+            id=generation_id,
+            digest=digest,
+            path=path,
+            prompt=prompt,
+            model=model,
+            input_hashes=input_hashes,
+            timings=timings,
+            size=len(data),
+            width=image.width,
+            height=image.height,
+            created_at=now,
+        )
+
+    async def aput(
+        self,
+        image: Image.Image,
+        *,
+        prompt: str,
+        model: str,
+        inputs: Sequence[Image.Image | ImageFile.ImageFile] = (),
+        timings: Mapping[str, float] | None = None,
+    ) -> StoredOutput:
+        return await asyncio.to_thread(
+            self.put,
+            image,
+            prompt=prompt,
+            model=model,
+            inputs=inputs,
+            timings=timings,
+        )
+
+    def find(
+        self,
+        prompt: str,
+        model: str,
+        inputs: Sequence[Image.Image | ImageFile.ImageFile] = (),
+    ) -> StoredOutput | None:
+        """Latest stored result of the same request, for reuse."""
+        key = _input_key([content_key(img) for img in inputs])
+        rows = self._select(
+            ' WHERE g.model = ? AND g.prompt = ? AND g.input_key = ?'
+            ' ORDER BY g.id DESC LIMIT 1',
+            (model, prompt, key),
+        )
+        return rows[0] if rows else None
+
+    async def afind(
+        self,
+        prompt: str,
+        model: str,
+        inputs: Sequence[Image.Image | ImageFile.ImageFile] = (),
+    ) -> StoredOutput | None:
+        return await asyncio.to_thread(self.find, prompt, model, inputs)
+
+    def query(
+        self,
+        *,
+        model: str | None = None,
+        prompt_contains: str | None = None,
+        input_hash: str | None = None,
+        since: float | None = None,
+        limit: int = 100,
+    ) -> list[StoredOutput]:
+        """Generations matching every given filter, newest first."""
+        clauses: list[str] = []
+        params: list[object] = []
+        if model is not None:
+            clauses.append('g.model = ?')
+            params.append(model)
+        if prompt_contains is not None:
+            clauses.append("g.prompt LIKE ? ESCAPE '\\'")
+            escaped = prompt_contains.translate(
+                str.maketrans({'%': r'\%', '_': r'\_', '\\': r'\\'}),
+            )
+            params.append(f'%{escaped}%')
+        if input_hash is not None:
+            clauses.append(
+                'g.id IN (SELECT generation_id FROM generation_inputs'
+                ' WHERE input_hash = ?)',
+            )
+            params.append(input_hash)
+        if since is not None:
+            clauses.append('g.created_at >= ?')
+            params.append(since)
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        return self._select(
+            f'{where} ORDER BY g.id DESC LIMIT ?',
+            (*params, limit),
+        )
+
+    def get(self, digest: str) -> StoredOutput | None:
+        """Latest generation that produced the image ``digest``."""
+        rows = self._select(
+            ' WHERE g.digest = ? ORDER BY g.id DESC LIMIT 1',
+            (digest,),
+        )
+        return rows[0] if rows else None
+
+    def summary(self) -> list[ModelSummary]:
+        """Per-model totals over every indexed generation."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT g.model, COUNT(*), COUNT(DISTINCT g.digest),'
+                ' SUM(o.size), AVG(g.generate_seconds)'
+                ' FROM generations g JOIN outputs o ON o.digest = g.digest'
+                ' GROUP BY g.model ORDER BY g.model',
+            ).fetchall()
+        return [ModelSummary(*row) for row in rows]
+
+    @staticmethod
+    def open(output: StoredOutput) -> Image.Image:
+        with Image.open(output.path) as img:
+            img.load()
+            return img
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def _select(
+        self, tail: str, params: Sequence[object]
+    ) -> list[StoredOutput]:
+        with self._lock:
+            rows = self._conn.execute(_SELECT + tail, params).fetchall()
+        return [
+            StoredOutput(
+                id=row[0],
+                digest=row[1],
+                path=Path(row[2]),
+                prompt=row[3],
+                model=row[4],
+                input_hashes=json.loads(row[5]),
+                timings=json.loads(row[6]),
+                size=row[7],
+                width=row[8],
+                height=row[9],
+                created_at=row[10],
+            )
+            for row in rows
+        ]
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        """Write atomically, so a crash never leaves a partial file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(data)
+        tmp.replace(path)
@@ -0,0 +1,127 @@
+"""Screen image attachments by their metadata before downloading them."""
+
+import dataclasses
+from collections import Counter
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+
+import discord
+
+from nano_banana.core.metrics import metrics
+
+
+def _known(value: object) -> int | None:
+    """``value`` if Discord reported it; it omits what it cannot probe."""
+    return value if isinstance(value, int) else None
+
+
+@dataclass(frozen=True, slots=True)
+class ImageAttachment:
+    """What Discord says about an image attachment, without fetching it."""
+
+    url: str
+    size: int | None = None
+    width: int | None = None
+    height: int | None = None
+
+    @classmethod
+    def of(cls, attachment: discord.Attachment) -> 'ImageAttachment':
+        return cls(
+            url=attachment.url,
+            size=_known(attachment.size),
+            width=_known(attachment.width),
+            height=_known(attachment.height),
+        )
+
+    @property
+    def longest_side(self) -> int | None:
+        if self.width is None or self.height is None:
+            return None
+        return max(self.width, self.height)
+
+
+def image_attachments(
+    attachments: Iterable[discord.Attachment],
+) -> list[ImageAttachment]:
+    """The attachments that are images, by their declared content type."""
+    return [
+        ImageAttachment.of(att)
+        for att in attachments
+        if att.content_type and att.content_type.startswith('image/')
+    ]
+
+
+@dataclass(frozen=True, slots=True)
+class AttachmentLimits:
+    """What an input image may weigh and measure.
+
+    Images over ``max_bytes``, with a side over ``max_side`` or more than
+    ``max_pixels`` pixels are rejected. Accepted images with a side over
+    ``downscale_side`` are shrunk to it as they are decoded.
+    """
+
+    max_bytes: int = 20 * 1024 * 1024
+    max_side: int = 8192
+    max_pixels: int = 40_000_000
+    downscale_side: int = 2048
+
+    def tightened(self, overrides: Mapping[str, int]) -> 'AttachmentLimits':
+        """These limits, lowered wherever ``overrides`` is stricter."""
+        return dataclasses.replace(
+            self,
+            **{
+                name: min(value, getattr(self, name))
+                for name, value in overrides.items()
+            },
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Screening:
+    """Outcome of checking a request's attachments against the limits."""
+
+    accepted: list[ImageAttachment] = field(default_factory=list)
+    rejected: dict[str, int] = field(default_factory=dict)
+    downscaled: int = 0
+
+
+def rejection(
+    attachment: ImageAttachment,
+    limits: AttachmentLimits,
+) -> str | None:
+    """Why ``attachment`` is refused, or None if it may be downloaded."""
+    if attachment.size is not None and attachment.size > limits.max_bytes:
+        return 'size'
+    width, height = attachment.width, attachment.height
+    if width is None or height is None:
+        return None
+    if max(width, height) > limits.max_side:
+        return 'dimensions'
+    if width * height > limits.max_pixels:
+        return 'pixels'
+    return None
+
+
+def screen(
+    attachments: Iterable[ImageAttachment],
+    limits: AttachmentLimits,
+) -> Screening:
+    """Sort attachments into accepted and rejected ones, by metadata only.
+
+    Attachments without metadata are accepted. Rejections are counted in
+    ``attachments.rejected`` by reason, and planned downscales in
+    ``attachments.downscaled``.
+    """
+    accepted: list[ImageAttachment] = []
+    rejected: Counter[str] = Counter()
+    downscaled = 0
+    for attachment in attachments:
+        if reason := rejection(attachment, limits):
+            rejected[reason] += 1
+            metrics.incr('attachments.rejected', reason=reason)
+            continue
+        accepted.append(attachment)
+        if (side := attachment.longest_side) and side > limits.downscale_side:
+            downscaled += 1
+            metrics.incr('attachments.downscaled')
+    return Screening(accepted, dict(rejected), downscaled)
@@ -1,22 +1,232 @@
 import asyncio
+import contextlib
+import sqlite3
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
 
 import discord
+from PIL import Image
 
-from nano_banana.api.client import NanoBananaClient
-from nano_banana.core.config import Settings, logging
+from nano_banana.api.backends import LocalBackend
+from nano_banana.api.breaker import BreakerPolicy
+from nano_banana.api.client import ClientFeatures, NanoBananaClient
+from nano_banana.api.files import FileUploadCache
+from nano_banana.api.hedging import HedgePolicy
+from nano_banana.api.prompt_cache import SystemPromptCache
+from nano_banana.api.router import ModelRouter, RoutingPolicy
+from nano_banana.api.sessions import ChatSessionStore
+from nano_banana.core.admission import (
+    AdmissionController,
+    AdmissionPolicy,
+    Priority,
+    Ticket,
+)
+from nano_banana.core.config import (
+    Settings,
+    get_settings,
+    logging,
+    settings_provider,
+)
+from nano_banana.core.contactsheet import contact_sheet
+from nano_banana.core.deadline import (
+    DeadlineExceededError,
+    StageBudgets,
+    budget,
+    deadline_scope,
+)
+from nano_banana.core.imagehash import dedupe
+from nano_banana.core.inflight import DrainReport, InFlightTracker
+from nano_banana.core.journal import Job, JobJournal
+from nano_banana.core.log import (
+    SAMPLED,
+    configure_logging,
+    request_scope,
+    stage,
+)
+from nano_banana.core.metrics import MetricsReporter, metrics
+from nano_banana.core.reload import SettingsWatcher
+from nano_banana.core.store import OutputStore
 from nano_banana.discord import utils
+from nano_banana.discord.attachments import (
+    AttachmentLimits,
+    ImageAttachment,
+    image_attachments,
+    screen,
+)
+from nano_banana.discord.delivery import PreviewDelivery
+from nano_banana.discord.outputs import OutputCache
+from nano_banana.discord.references import ReferenceResolver
+from nano_banana.discord.triggers import TriggerFilter
 
 logger = logging.getLogger(__name__)
-settings = Settings()
+SHUTTING_DOWN_TEXT = '機器人正在重新啟動，請稍後再試。'
+BUSY_TEXT = '目前請求太多，請稍後再試（預估需等待約 {seconds} 秒）。'
+UNAVAILABLE_TEXT = '圖片生成服務暫時無法使用，請稍後再試。'
+TIMEOUT_TEXT = '處理時間過長，已取消這次請求，請稍後再試。'
+EMPTY_REQUEST_TEXT = '請輸入提示詞或附上圖片。'
+TOO_MANY_IMAGES_TEXT = '一次最多只能處理 {limit} 張圖片喔！'
+PARTIAL_VARIATIONS_TEXT = '（{total} 張變化圖中完成了 {done} 張）'
+BUSY_VARIATIONS_TEXT = '（系統忙碌，{total} 張變化圖中只生成了 {done} 張）'
+ATTACHMENT_REJECTED_TEXT = '圖片超出限制，無法處理（{reasons}）。'
+REJECTION_REASON_TEXTS = {
+    'size': '{count} 張超過 {max_size}',
+    'dimensions': '{count} 張邊長超過 {max_side} 像素',
+    'pixels': '{count} 張超過 {max_pixels} 像素',
+}
+settings = get_settings()
+configure_logging(
+    settings.LOG_LEVEL,
+    fmt=settings.LOG_FORMAT,
+    sample_rate=settings.LOG_SAMPLE_RATE,
+)
 banana = NanoBananaClient(
-    api_key=settings.GOOGLE_API_KEY,
+    api_key=settings.google_api_keys,
     model_name=settings.MODEL_NAME,
     system_prompt=settings.SYSTEM_PROMPT,
+    key_cooldown=settings.KEY_COOLDOWN_SECONDS,
+    features=ClientFeatures(
+        hedge=HedgePolicy(
+            percentile=settings.HEDGE_PERCENTILE,
+            budget_ratio=settings.HEDGE_BUDGET_RATIO,
+            min_delay=settings.HEDGE_MIN_DELAY_SECONDS,
+        )
+        if settings.HEDGE_ENABLED
+        else None,
+        sessions=ChatSessionStore(
+            max_turns=settings.CHAT_HISTORY_TURNS,
+            max_sessions=settings.CHAT_MAX_SESSIONS,
+            idle_seconds=settings.CHAT_SESSION_IDLE_SECONDS,
+            max_bytes=settings.CHAT_SESSIONS_MAX_BYTES,
+        )
+        if settings.CHAT_SESSIONS_ENABLED
+        else None,
+        files=FileUploadCache(
+            min_uses=settings.FILES_MIN_USES,
+            maxsize=settings.FILES_CACHE_SIZE,
+        )
+        if settings.FILES_CACHE_ENABLED and settings.BACKEND == 'gemini'
+        else None,
+        prompt_cache=SystemPromptCache(
+            min_chars=settings.PROMPT_CACHE_MIN_CHARS,
+            ttl=settings.PROMPT_CACHE_TTL_SECONDS,
+        )
+        if settings.PROMPT_CACHE_ENABLED and settings.BACKEND == 'gemini'
+        else None,
+        breaker=BreakerPolicy(
+            window_seconds=settings.BREAKER_WINDOW_SECONDS,
+            min_calls=settings.BREAKER_MIN_CALLS,
+            max_error_rate=settings.BREAKER_MAX_ERROR_RATE,
+            slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=settings.BREAKER_OPEN_SECONDS,
+        )
+        if settings.BREAKER_ENABLED
+        else None,
+        backend=LocalBackend(
+            latency=settings.LOCAL_BACKEND_LATENCY_SECONDS,
+            jitter=settings.LOCAL_BACKEND_JITTER_SECONDS,
+            size=settings.LOCAL_BACKEND_SIZE,
+            error_rate=settings.LOCAL_BACKEND_ERROR_RATE,
+        )
+        if settings.BACKEND == 'local'
+        else None,
+    ),
+)
+generator: NanoBananaClient | ModelRouter = banana
+if settings.ROUTER_ENABLED:
+    generator = ModelRouter(
+        banana,
+        RoutingPolicy(
+            fast_model=settings.ROUTER_FAST_MODEL,
+            pro_model=settings.ROUTER_PRO_MODEL,
+            pro_min_images=settings.ROUTER_PRO_MIN_IMAGES,
+            max_error_rate=settings.ROUTER_MAX_ERROR_RATE,
+            max_p95_seconds=settings.ROUTER_MAX_P95_SECONDS,
+        ),
+    )
+delivery = (
+    PreviewDelivery(
+        banana,
+        preview_model=settings.PREVIEW_MODEL,
+        max_side=settings.PREVIEW_MAX_SIDE,
+    )
+    if settings.PREVIEW_ENABLED
+    else None
 )
 bot = discord.Bot(
     intents=discord.Intents.all(),
     member_cache_flags=discord.MemberCacheFlags.all(),
 )
+journal = JobJournal(settings.JOURNAL_PATH)
+inflight = InFlightTracker()
+admission = AdmissionController(
+    AdmissionPolicy(
+        max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        max_wait_seconds=settings.ADMISSION_MAX_WAIT_SECONDS,
+        command_reserve=settings.ADMISSION_COMMAND_RESERVE,
+    ),
+)
+outputs = OutputCache(
+    maxsize=settings.OUTPUT_CACHE_SIZE,
+    max_bytes=settings.OUTPUT_CACHE_MAX_BYTES,
+    ttl=settings.OUTPUT_CACHE_TTL_SECONDS,
+)
+store = (
+    OutputStore(settings.OUTPUT_STORE_PATH)
+    if settings.OUTPUT_STORE_ENABLED
+    else None
+)
+references = ReferenceResolver(bot, maxsize=settings.REFERENCE_CACHE_SIZE)
+watcher = SettingsWatcher(
+    settings_provider,
+    interval=settings.SETTINGS_WATCH_INTERVAL,
+)
+reporter = MetricsReporter(
+    metrics,
+    interval=settings.METRICS_LOG_INTERVAL_SECONDS,
+)
+
+
+def _trigger_filter(settings: Settings) -> TriggerFilter:
+    return TriggerFilter(
+        mention=settings.TRIGGER_MENTION,
+        prefix=settings.TRIGGER_PREFIX,
+        channel_ids=settings.trigger_channel_ids,
+        role_ids=settings.trigger_role_ids,
+    )
+
+
+triggers = _trigger_filter(settings)
+
+
+def _stage_budgets(settings: Settings) -> StageBudgets:
+    return StageBudgets(
+        total=settings.DEADLINE_TOTAL_SECONDS,
+        fetch=settings.DEADLINE_FETCH_SECONDS,
+        download=settings.DEADLINE_DOWNLOAD_SECONDS,
+        generate=settings.DEADLINE_GENERATE_SECONDS,
+        encode=settings.DEADLINE_ENCODE_SECONDS,
+        upload=settings.DEADLINE_UPLOAD_SECONDS,
+    )
+
+
+@settings_provider.subscribe
+def _apply_settings(new: Settings) -> None:
+    """Swap reloaded settings into the running bot.
+
+    Prompts, models, keys, limits, deadlines, triggers and the log level
+    apply to the next request. Features wired at startup (router, hedging,
+    caches, journal) keep their configuration until restart.
+    """
+    global settings, triggers
+    banana.reconfigure(
+        api_key=new.google_api_keys,
+        model_name=new.MODEL_NAME,
+        system_prompt=new.SYSTEM_PROMPT,
+        key_cooldown=new.KEY_COOLDOWN_SECONDS,
+    )
+    logging.getLogger().setLevel(new.LOG_LEVEL.upper())
+    settings, triggers = new, _trigger_filter(new)
 
 
 @bot.slash_command(
@@ -28,43 +238,415 @@ bot = discord.Bot(
         'zh-CN': '由提示词生成一张图片',
     },
 )
-async def draw(ctx: discord.ApplicationContext, prompt: str) -> None:
-    await ctx.defer()
-    logger.info('Receive draw command from %s: %s', ctx.author, prompt)
-    resp_text, resp_image = await banana.generate(
-        prompt=prompt,
-    )
+@discord.option(
+    'variations',
+    int,
+    description='number of variations to draw at once',
+    description_localizations={
+        'zh-TW': '一次生成的變化圖數量',
+        'zh-CN': '一次生成的变化图数量',
+    },
+    min_value=1,
+    max_value=max(settings.VARIATIONS_MAX, 1),
+    default=1,
+)
+async def draw(
+    ctx: discord.ApplicationContext,
+    prompt: str,
+    variations: int = 1,
+) -> None:
+    if (ticket := await _admit(ctx.respond, Priority.COMMAND)) is None:
+        return
 
-    await utils.respond(ctx.respond, resp_text, resp_image)
+    try:
+        await ctx.defer()
+        with (
+            request_scope(),
+            deadline_scope(_stage_budgets(settings)),
+            inflight.track(),
+        ):
+            logger.info(
+                'Receive draw command from %s: %s (%d variations)',
+                ctx.author,
+                prompt,
+                variations,
+                extra=SAMPLED,
+            )
+            variations = min(variations, settings.VARIATIONS_MAX)
+            async with ticket:
+                with (
+                    admission.borrow(variations - 1) as extra,
+                    stage('generate'),
+                ):
+                    if extra < variations - 1:
+                        logger.info(
+                            'Drawing %d of %d variations, no free slots',
+                            extra + 1,
+                            variations,
+                        )
+                    await _deliver(
+                        ctx.respond,
+                        prompt,
+                        [],
+                        _session_key(ctx.channel, ctx.author),
+                        extra + 1,
+                        requested=variations,
+                    )
+    except DeadlineExceededError as e:
+        await _report_timeout(ctx.respond, e)
+    finally:
+        ticket.release()
+
+
+async def _admit(
+    reply: Callable[..., Awaitable[object]],
+    priority: Priority,
+) -> Ticket | None:
+    """Queue a request, or turn it away at once when overloaded."""
+    if not inflight.accepting:
+        metrics.incr('trigger.dropped', reason='shutdown')
+        await reply(SHUTTING_DOWN_TEXT)
+        return None
+    if not _backend_available():
+        await reply(UNAVAILABLE_TEXT)
+        return None
+    if (ticket := admission.admit(priority)) is None:
+        wait = admission.estimated_wait(priority)
+        await reply(BUSY_TEXT.format(seconds=max(round(wait), 1)))
+    return ticket
 
 
-def _extract_image_urls(message: discord.Message) -> list[str]:
-    """Extract image URLs from message attachments."""
-    return [
-        att.url
-        for att in message.attachments
-        if att.content_type and att.content_type.startswith('image/')
-    ]
+async def _report_timeout(
+    reply: Callable[..., Awaitable[object]],
+    error: DeadlineExceededError,
+) -> None:
+    logger.warning('Request cancelled: %s', error)
+    await reply(TIMEOUT_TEXT)
+
 
+def _backend_available(image_count: int = 0) -> bool:
+    """Whether the circuit breaker would let a generation through."""
+    model = _final_model(image_count)
+    if banana.available(model):
+        return True
+    metrics.incr('breaker.rejected', breaker=model)
+    return False
 
-async def _fetch_reference_images(message: discord.Message) -> list[str]:
-    """Fetch image URLs from the referenced message."""
-    img_urls = []
+
+def _session_key(
+    channel: discord.abc.Snowflake,
+    author: discord.abc.Snowflake,
+) -> str:
+    """Conversation key: the whole thread, or one user in a channel."""
+    if isinstance(channel, discord.Thread):
+        return f'thread:{channel.id}'
+    return f'channel:{channel.id}:user:{author.id}'
+
+
+def _extract_images(message: discord.Message) -> list[ImageAttachment]:
+    """Extract the image attachments of a message."""
+    return image_attachments(message.attachments)
+
+
+async def _fetch_reference_images(
+    message: discord.Message,
+) -> list[ImageAttachment]:
+    """Fetch the image attachments of the referenced message."""
+    images = []
     if (ref := message.reference) and (ref_message_id := ref.message_id):
         try:
-            ref_msg = await message.channel.fetch_message(ref_message_id)
-            img_urls.extend(
-                att.url
-                for att in ref_msg.attachments
-                if att.content_type and att.content_type.startswith('image/')
-            )
+            async with budget('fetch'):
+                images.extend(
+                    await references.attachments(message, ref_message_id),
+                )
+        except DeadlineExceededError:
+            raise
         except discord.HTTPException as e:
             logger.warning('Cannot fetch reference message: %s', e)
             await message.channel.send(f'發生錯誤: {e}')
         except Exception as e:
             logger.exception('Unexpected error occurred:')
             await message.channel.send(f'發生未預期的錯誤: {e}')
-    return img_urls
+    return images
+
+
+def _own_outputs(message: discord.Message) -> dict[str, Image.Image]:
+    """Images of the bot's own message that ``message`` replies to."""
+    if (ref := message.reference) and (ref_message_id := ref.message_id):
+        return outputs.lookup(ref_message_id)
+    return {}
+
+
+def _final_model(image_count: int) -> str:
+    """Model that will serve a request with ``image_count`` images."""
+    if isinstance(generator, ModelRouter):
+        return generator.choose(image_count)[0]
+    return banana.model_name
+
+
+def _attachment_limits(
+    guild: discord.Guild | None,
+    model: str,
+) -> AttachmentLimits:
+    """Input image limits, the strictest of the defaults and overrides.
+
+    Overrides are looked up for the serving ``model`` and for ``guild``.
+    """
+    limits = AttachmentLimits(
+        max_bytes=settings.ATTACHMENT_MAX_BYTES,
+        max_side=settings.ATTACHMENT_MAX_SIDE,
+        max_pixels=settings.ATTACHMENT_MAX_PIXELS,
+        downscale_side=settings.ATTACHMENT_DOWNSCALE_SIDE,
+    ).tightened(settings.ATTACHMENT_MODEL_LIMITS.get(model, {}))
+    if guild is not None:
+        limits = limits.tightened(
+            settings.ATTACHMENT_GUILD_LIMITS.get(guild.id, {}),
+        )
+    return limits
+
+
+def _format_bytes(size: int) -> str:
+    """``size`` in MB, or in KB below 1 MB, to one decimal place."""
+    for unit, scale in (('MB', 1024 * 1024), ('KB', 1024)):
+        if size >= scale:
+            return f'{size / scale:.1f}'.removesuffix('.0') + f' {unit}'
+    return f'{size} B'
+
+
+def _rejection_text(rejected: dict[str, int], limits: AttachmentLimits) -> str:
+    """Tell the user which images were refused and for what."""
+    reasons = '、'.join(
+        REJECTION_REASON_TEXTS[reason].format(
+            count=count,
+            max_size=_format_bytes(limits.max_bytes),
+            max_side=limits.max_side,
+            max_pixels=limits.max_pixels,
+        )
+        for reason, count in rejected.items()
+    )
+    return ATTACHMENT_REJECTED_TEXT.format(reasons=reasons)
+
+
+def _max_input_urls() -> int:
+    """Input URLs a request may carry before anything is downloaded.
+
+    With dedup on, a few more than MAX_IMAGE_PER_REQUEST are let through,
+    as duplicates among them do not count against the limit.
+    """
+    extra = settings.IMAGE_DEDUP_EXTRA_INPUTS
+    return settings.MAX_IMAGE_PER_REQUEST + (
+        max(extra, 0) if settings.IMAGE_DEDUP_ENABLED else 0
+    )
+
+
+async def _refuse_too_many(message: discord.Message, count: int) -> bool:
+    """Tell the user and return True when ``count`` images are too many."""
+    if count <= _max_input_urls():
+        return False
+    metrics.incr('trigger.dropped', reason='too_many_images')
+    await message.channel.send(
+        TOO_MANY_IMAGES_TEXT.format(limit=settings.MAX_IMAGE_PER_REQUEST),
+    )
+    return True
+
+
+async def _input_urls(
+    message: discord.Message,
+    preloaded: dict[str, Image.Image],
+) -> list[str] | None:
+    """URLs of the request's input images, screened before any download.
+
+    Images the bot already holds are not screened again. Returns None
+    after telling the user when there are too many images or one is over
+    the limits.
+    """
+    images = _extract_images(message)
+    if not preloaded:
+        images.extend(await _fetch_reference_images(message))
+    urls = {image.url for image in images} | preloaded.keys()
+    if await _refuse_too_many(message, len(urls)):
+        return None
+    model = _final_model(len(images) + len(preloaded))
+    limits = _attachment_limits(message.guild, model)
+    screening = screen(images, limits)
+    if screening.rejected:
+        logger.info('Rejected attachments: %s', screening.rejected)
+        await message.reply(_rejection_text(screening.rejected, limits))
+        return None
+    return list(
+        dict.fromkeys(
+            [*(image.url for image in screening.accepted), *preloaded]
+        ),
+    )
+
+
+async def _generate(
+    prompt: str,
+    pil_images: list,
+    session: str,
+    timings: dict[str, float],
+) -> tuple[str, list[Image.Image]]:
+    start = time.perf_counter()
+    async with budget('generate'):
+        result = await generator.generate(
+            prompt=prompt,
+            images=pil_images if pil_images else None,
+            session=session,
+            candidates=settings.CANDIDATE_COUNT,
+        )
+    timings['generate'] = round(time.perf_counter() - start, 4)
+    return result
+
+
+async def _generate_variations(
+    prompt: str,
+    pil_images: list,
+    count: int,
+    timings: dict[str, float],
+    requested: int | None = None,
+) -> tuple[str, list[Image.Image]]:
+    """Run ``count`` independent generations at once.
+
+    Whatever finished when the generate budget runs out is kept and the
+    rest is cancelled, so a slow variation does not sink the others. Only
+    if nothing came back is the timeout or the first error raised. The
+    text says how many of the ``requested`` variations came back, and
+    that the system was busy if it could only run ``count`` of them.
+    """
+    requested = max(requested or count, count)
+    start = time.perf_counter()
+    tasks: list[asyncio.Future[tuple[str, list[Image.Image]]]] = []
+    expired: DeadlineExceededError | None = None
+    try:
+        async with budget('generate'):
+            tasks = [
+                asyncio.ensure_future(
+                    generator.generate(
+                        prompt=prompt, images=pil_images or None
+                    ),
+                )
+                for _ in range(count)
+            ]
+            await asyncio.wait(tasks)
+    except DeadlineExceededError as e:
+        expired = e
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    timings['generate'] = round(time.perf_counter() - start, 4)
+
+    texts, images, errors = _variation_results(tasks)
+    if not images and errors:
+        raise errors[0]
+    if not images and expired:
+        raise expired
+    text = next(filter(None, texts), '')
+    if len(texts) < requested:
+        template = (
+            BUSY_VARIATIONS_TEXT
+            if count < requested
+            else PARTIAL_VARIATIONS_TEXT
+        )
+        note = template.format(done=len(texts), total=requested)
+        text = f'{text}\n{note}' if text else note
+    return text, images
+
+
+def _variation_results(
+    tasks: list[asyncio.Future[tuple[str, list[Image.Image]]]],
+) -> tuple[list[str], list[Image.Image], list[BaseException]]:
+    """Texts, images and errors of finished variations, counted by outcome."""
+    texts: list[str] = []
+    images: list[Image.Image] = []
+    errors: list[BaseException] = []
+    for task in tasks:
+        if task.cancelled():
+            metrics.incr('variations.results', outcome='timeout')
+        elif (error := task.exception()) is not None:
+            metrics.incr('variations.results', outcome='error')
+            errors.append(error)
+        else:
+            metrics.incr('variations.results', outcome='ok')
+            text, task_images = task.result()
+            texts.append(text)
+            images.extend(task_images)
+    return texts, images, errors
+
+
+async def _deliver(
+    reply: Callable[..., Awaitable[object]],
+    prompt: str,
+    pil_images: list,
+    session: str,
+    variations: int = 1,
+    requested: int | None = None,
+) -> None:
+    """Generate, send the result and remember the images it carries.
+
+    Several ``variations`` are generated independently and sent as one
+    contact sheet; each of them is stored on its own. When fewer than the
+    ``requested`` variations could be run, the reply says so.
+    """
+    start = time.perf_counter()
+    timings: dict[str, float] = {}
+    model = _final_model(len(pil_images))
+    if max(variations, requested or 0) > 1:
+        resp_text, generated = await _generate_variations(
+            prompt,
+            pil_images,
+            variations,
+            timings,
+            requested,
+        )
+        resp_images = (
+            [await asyncio.to_thread(contact_sheet, generated)]
+            if len(generated) > 1
+            else generated
+        )
+        sent = await utils.respond(reply, resp_text, resp_images)
+    elif delivery and delivery.wants_preview(model, len(pil_images)):
+        final = _generate(prompt, pil_images, session, timings)
+        sent, resp_images = await delivery.deliver(
+            reply,
+            final,
+            prompt,
+            pil_images or None,
+        )
+        generated = resp_images
+    else:
+        final = _generate(prompt, pil_images, session, timings)
+        resp_text, resp_images = await final
+        sent = await utils.respond(reply, resp_text, resp_images)
+        generated = resp_images
+    if resp_images:
+        outputs.remember(sent, resp_images)
+        timings['deliver'] = round(time.perf_counter() - start, 4)
+        for image in generated:
+            await _store_output(image, prompt, model, pil_images, timings)
+
+
+async def _store_output(
+    image: Image.Image,
+    prompt: str,
+    model: str,
+    inputs: list,
+    timings: dict[str, float],
+) -> None:
+    """Index a delivered image; a failing store never fails the reply."""
+    if store is None:
+        return
+    try:
+        await store.aput(
+            image,
+            prompt=prompt,
+            model=model,
+            inputs=inputs,
+            timings=timings,
+        )
+    except (OSError, sqlite3.Error):
+        logger.exception('Cannot store generated image:')
 
 
 async def _generate_response(
@@ -74,11 +656,14 @@ async def _generate_response(
 ) -> None:
     """Generate and send AI response."""
     try:
-        resp_text, resp_image = await banana.generate(
-            prompt=prompt,
-            images=pil_images if pil_images else None,
+        await _deliver(
+            message.reply,
+            prompt,
+            pil_images,
+            _session_key(message.channel, message.author),
         )
-        await utils.respond(message.reply, resp_text, resp_image)
+    except DeadlineExceededError as e:
+        await _report_timeout(message.reply, e)
     except (discord.HTTPException, ValueError, RuntimeError) as e:
         logger.exception('Error occurred during generation:')
         await message.channel.send(f'發生錯誤: {e}')
@@ -87,39 +672,255 @@ async def _generate_response(
         await message.channel.send(f'發生未預期的錯誤: {e}')
 
 
+@contextlib.asynccontextmanager
+async def _journaled(job_id: int) -> AsyncIterator[None]:
+    """Keep a job in the journal until it is delivered or fails for good."""
+    await asyncio.to_thread(journal.start, job_id)
+    interrupted = False
+    try:
+        yield
+    except asyncio.CancelledError:
+        interrupted = True
+        logger.warning('Job %d interrupted, kept for replay', job_id)
+        raise
+    finally:
+        if not interrupted:
+            await asyncio.to_thread(journal.finish, job_id)
+
+
+async def _load_images(
+    img_urls: list[str],
+    preloaded: dict[str, Image.Image],
+    max_side: int | None = None,
+) -> list[Image.Image]:
+    """Download the input images that are not already in memory.
+
+    Downloads with a side over ``max_side`` are shrunk as they are decoded.
+    """
+
+    async def download(url: str) -> Image.Image:
+        image = await utils.download_image(url)
+        if max_side is None:
+            return image
+        return await asyncio.to_thread(utils.shrink, image, max_side)
+
+    if missing := [url for url in img_urls if url not in preloaded]:
+        logger.info('Downloading %d images...', len(missing), extra=SAMPLED)
+        async with budget('download'):
+            downloaded = await asyncio.gather(*map(download, missing))
+        preloaded = preloaded | dict(zip(missing, downloaded, strict=True))
+    return [preloaded[url] for url in img_urls]
+
+
+async def _distinct_images(images: list[Image.Image]) -> list[Image.Image]:
+    """Drop inputs that are perceptually the same picture."""
+    if not settings.IMAGE_DEDUP_ENABLED:
+        return images
+    distinct = await asyncio.to_thread(
+        dedupe,
+        images,
+        settings.IMAGE_DEDUP_MAX_DISTANCE,
+        settings.IMAGE_DEDUP_MAX_DELTA,
+    )
+    if len(distinct) < len(images):
+        logger.info(
+            'Dropped %d duplicate images',
+            len(images) - len(distinct),
+        )
+    return distinct
+
+
+async def _run_job(
+    message: discord.Message,
+    prompt: str,
+    img_urls: list[str],
+    job_id: int,
+    preloaded: dict[str, Image.Image] | None = None,
+    ticket: Ticket | None = None,
+) -> None:
+    """Wait for a run slot, then load the images and deliver the job.
+
+    The call to the model is claimed before anything is downloaded, so
+    while its circuit is half-open only the job that will probe it does.
+    """
+    ticket = ticket or admission.reserve()
+    model = _final_model(len(img_urls))
+    with inflight.track():
+        async with ticket, _journaled(job_id):
+            with banana.claim(model) as available:
+                if not available:
+                    await message.reply(UNAVAILABLE_TEXT)
+                    return
+                await _process(message, prompt, img_urls, model, preloaded)
+            logger.info('Job %d done', job_id)
+
+
+async def _process(
+    message: discord.Message,
+    prompt: str,
+    img_urls: list[str],
+    model: str,
+    preloaded: dict[str, Image.Image] | None = None,
+) -> None:
+    """Load the input images of a job and answer it.
+
+    Near-duplicate images are dropped before the rest are counted against
+    MAX_IMAGE_PER_REQUEST.
+    """
+    limits = _attachment_limits(message.guild, model)
+    try:
+        with stage('download'):
+            pil_images = await _load_images(
+                img_urls,
+                preloaded or {},
+                limits.downscale_side,
+            )
+    except DeadlineExceededError as e:
+        await _report_timeout(message.reply, e)
+        return
+    with stage('dedupe'):
+        pil_images = await _distinct_images(pil_images)
+    if len(pil_images) > settings.MAX_IMAGE_PER_REQUEST:
+        await message.channel.send(
+            TOO_MANY_IMAGES_TEXT.format(limit=settings.MAX_IMAGE_PER_REQUEST),
+        )
+        return
+
+    async with message.channel.typing():
+        with stage('generate'):
+            await _generate_response(message, prompt, pil_images)
+
+
 @bot.listen()
 async def on_message(message: discord.Message) -> None:
+    references.remember(message)
     if message.author.bot or (
         message.guild and message.guild.id != settings.discord_guild_id
     ):
         return
 
-    prompt = message.content or ''
-    img_urls = _extract_image_urls(message)
-    img_urls.extend(await _fetch_reference_images(message))
+    if reason := triggers.rejects(message, bot.user):
+        metrics.incr('trigger.dropped', reason=reason)
+        return
+
+    attachments = {image.url for image in _extract_images(message)}
+    if await _refuse_too_many(message, len(attachments)):
+        return
 
-    if len(img_urls) > settings.MAX_IMAGE_PER_REQUEST:
-        await message.channel.send(
-            f'一次最多只能處理 {settings.MAX_IMAGE_PER_REQUEST} 張圖片喔！',
+    if (ticket := await _admit(message.reply, Priority.PASSIVE)) is None:
+        return
+
+    try:
+        with (
+            inflight.track(),
+            request_scope(f'msg-{message.id}'),
+            deadline_scope(_stage_budgets(settings)),
+        ):
+            prompt = triggers.strip(message.content or '', bot.user)
+            preloaded = _own_outputs(message)
+            if (img_urls := await _input_urls(message, preloaded)) is None:
+                return
+            if not prompt.strip() and not img_urls:
+                await message.reply(EMPTY_REQUEST_TEXT)
+                return
+
+            logger.info(
+                'Receive message from %s: Content="%s", Images=%d',
+                message.author,
+                prompt,
+                len(img_urls),
+                extra=SAMPLED,
+            )
+
+            job_id = await asyncio.to_thread(
+                journal.add,
+                message.channel.id,
+                message.id,
+                prompt,
+                img_urls,
+            )
+            await _run_job(message, prompt, img_urls, job_id, preloaded, ticket)
+    except DeadlineExceededError as e:
+        await _report_timeout(message.reply, e)
+    finally:
+        ticket.release()
+
+
+async def _replay_job(job: Job) -> None:
+    """Re-run an interrupted job if its source message still exists."""
+    if job.attempts >= settings.JOURNAL_MAX_ATTEMPTS:
+        logger.warning(
+            'Dropping job %d after %d attempts',
+            job.id,
+            job.attempts,
         )
+        await asyncio.to_thread(journal.finish, job.id)
         return
 
-    logger.info(
-        'Receive message from %s: Content="%s", Images=%d',
-        message.author,
-        prompt,
-        len(img_urls),
-    )
+    try:
+        channel = bot.get_channel(job.channel_id) or await bot.fetch_channel(
+            job.channel_id,
+        )
+        message = await channel.fetch_message(job.message_id)
+    except (discord.NotFound, discord.Forbidden):
+        logger.info('Source message of job %d is gone, skipping', job.id)
+        await asyncio.to_thread(journal.finish, job.id)
+        return
+    except discord.HTTPException as e:
+        logger.warning('Cannot replay job %d yet: %s', job.id, e)
+        return
+
+    with (
+        request_scope(f'msg-{job.message_id}'),
+        deadline_scope(_stage_budgets(settings)),
+    ):
+        await _run_job(message, job.prompt, job.image_urls, job.id)
 
-    pil_images = []
-    if img_urls:
-        logger.info('Downloading %d images...', len(img_urls))
-        pil_images = await asyncio.gather(*map(utils.download_image, img_urls))
 
-    async with message.channel.typing():
-        await _generate_response(message, prompt, pil_images)
+@bot.listen('on_ready', once=True)
+async def replay_journal() -> None:
+    """Replay the jobs that were in flight when the bot last stopped."""
+    jobs = await asyncio.to_thread(journal.unfinished)
+    if not jobs:
+        return
+
+    logger.info('Replaying %d unfinished jobs', len(jobs))
+    semaphore = asyncio.Semaphore(settings.JOURNAL_REPLAY_CONCURRENCY)
+
+    async def replay(job: Job) -> None:
+        async with semaphore:
+            try:
+                await _replay_job(job)
+            except Exception:
+                logger.exception('Failed to replay job %d:', job.id)
+
+    await asyncio.gather(*map(replay, jobs))
+
+
+async def shutdown() -> DrainReport:
+    """Stop taking work, drain in-flight jobs and release resources.
+
+    Jobs still running at the deadline are cancelled and stay in the
+    journal, so they are replayed on the next start.
+    """
+    report = await inflight.drain(settings.SHUTDOWN_DRAIN_SECONDS)
+    logger.info(
+        'Shutdown drained jobs: %d completed, %d abandoned',
+        report.completed,
+        report.abandoned,
+    )
+    watcher.stop()
+    reporter.stop()
+    await bot.close()
+    await utils.close_http()
+    await asyncio.to_thread(journal.close)
+    if store is not None:
+        await asyncio.to_thread(store.close)
+    return report
 
 
 @bot.listen(once=True)
 async def on_ready() -> None:
+    watcher.start()
+    reporter.start()
     logger.info('Client is ready!')
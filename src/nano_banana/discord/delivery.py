@@ -0,0 +1,135 @@
+"""Two-phase delivery: a quick preview first, the final image in place."""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+from PIL import Image
+
+from nano_banana.api.client import NanoBananaClient
+from nano_banana.core.config import MODEL_MAX_IMAGES
+from nano_banana.core.metrics import metrics
+from nano_banana.discord import utils
+
+PREVIEW_TEXT = '預覽圖，完整圖片生成中…'
+PREVIEW_FAILED_TEXT = '預覽圖，完整圖片生成失敗。'
+
+
+def _downscale(image: Image.Image, max_side: int) -> Image.Image:
+    preview = image.copy()
+    preview.thumbnail((max_side, max_side))
+    return preview
+
+
+class PreviewDelivery:
+    """Post a fast preview while the final image is still generating.
+
+    The preview comes from a call to ``preview_model`` and is downscaled to
+    at most ``max_side`` pixels. It runs alongside the final generation;
+    once the final result is ready, the preview message is edited to carry
+    it instead. If the final result wins the race, no preview is posted.
+    If the final generation fails, the preview is relabelled to say so.
+    """
+
+    def __init__(
+        self,
+        client: NanoBananaClient,
+        preview_model: str = 'gemini-2.5-flash-image',
+        max_side: int = 512,
+    ) -> None:
+        self.client = client
+        self.preview_model = preview_model
+        self.max_side = max_side
+        self.logger = logging.getLogger(__name__)
+
+    def wants_preview(self, final_model: str, image_count: int) -> bool:
+        """Whether a preview is worth it for a request to ``final_model``."""
+        return final_model != self.preview_model and (
+            image_count <= MODEL_MAX_IMAGES.get(self.preview_model, image_count)
+        )
+
+    async def deliver(
+        self,
+        reply: Callable[..., Awaitable[object]],
+        final: Awaitable[tuple[str, list[Image.Image]]],
+        prompt: str,
+        images: list[Image.Image] | None = None,
+    ) -> tuple[object, list[Image.Image]]:
+        """Send the result of ``final``, preceded by a preview if it is late.
+
+        Returns the message carrying the final result and its images.
+        """
+        start = time.perf_counter()
+        sent = None
+        final_task = asyncio.ensure_future(final)
+        preview_task = asyncio.ensure_future(self._preview(prompt, images))
+        try:
+            await asyncio.wait(
+                {final_task, preview_task},
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not final_task.done() and (preview := preview_task.result()):
+                sent = await utils.respond(reply, PREVIEW_TEXT, [preview])
+                self._observe(start, 'preview', perceived=True)
+                metrics.incr('delivery.previews', outcome='shown')
+            elif final_task.done():
+                metrics.incr('delivery.previews', outcome='late')
+
+            try:
+                text, final_images = await final_task
+            except BaseException:
+                if sent is not None:
+                    await self._mark_failed(sent)
+                raise
+        finally:
+            for task in (preview_task, final_task):
+                task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await preview_task
+
+        perceived = sent is None
+        if sent is None:
+            sent = await utils.respond(reply, text, final_images)
+        else:
+            edit = functools.partial(sent.edit, attachments=[])
+            sent = await utils.respond(edit, text, final_images)
+        self._observe(start, 'final', perceived=perceived)
+        return sent, final_images
+
+    async def _mark_failed(self, sent: object) -> None:
+        """Tell the user the image on show is only the preview."""
+        metrics.incr('delivery.previews', outcome='orphaned')
+        try:
+            await sent.edit(content=PREVIEW_FAILED_TEXT)
+        except Exception as e:  # noqa: BLE001
+            self.logger.warning('Cannot relabel preview: %s', e)
+
+    async def _preview(
+        self,
+        prompt: str,
+        images: list[Image.Image] | None,
+    ) -> Image.Image | None:
+        try:
+            _, previews = await self.client.generate(
+                prompt=prompt,
+                images=images,
+                model_name=self.preview_model,
+            )
+        except Exception as e:  # noqa: BLE001
+            self.logger.warning('Preview generation failed: %s', e)
+            metrics.incr('delivery.previews', outcome='failed')
+            return None
+        if not previews:
+            return None
+        return await asyncio.to_thread(_downscale, previews[0], self.max_side)
+
+    @staticmethod
+    def _observe(start: float, phase: str, *, perceived: bool) -> None:
+        """Record a phase's latency, and the perceived one if it is first."""
+        elapsed = time.perf_counter() - start
+        metrics.observe('delivery.latency', elapsed, phase=phase)
+        if perceived:
+            metrics.observe('delivery.perceived_latency', elapsed)
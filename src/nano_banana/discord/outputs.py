@@ -0,0 +1,55 @@
+"""Keep the bot's own generated images around for follow-up replies."""
+
+import discord
+from PIL import Image
+
+from nano_banana.core.cache import LRUCache
+from nano_banana.core.metrics import metrics
+
+
+def _image_nbytes(images: dict[str, Image.Image]) -> int:
+    return sum(
+        img.width * img.height * len(img.getbands()) for img in images.values()
+    )
+
+
+class OutputCache:
+    """Map the bot's sent message IDs to the decoded images they carry.
+
+    When a user replies to one of these messages, the images are reused as
+    is instead of being downloaded back from the CDN and decoded again.
+    Entries are keyed by message ID and map each attachment URL to its
+    image, so callers can still journal the URLs.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        max_bytes: int | None = None,
+        ttl: float | None = None,
+    ) -> None:
+        self._cache: LRUCache[int, dict[str, Image.Image]] = LRUCache(
+            maxsize,
+            ttl=ttl,
+            max_bytes=max_bytes,
+            sizeof=_image_nbytes,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self._cache.nbytes
+
+    def remember(self, sent: object, images: list[Image.Image]) -> None:
+        """Store the images of a message the bot just sent."""
+        if not isinstance(sent, discord.Message) or not images:
+            return
+        urls = [att.url for att in sent.attachments]
+        if len(urls) != len(images):
+            return
+        self._cache.put(sent.id, dict(zip(urls, images, strict=True)))
+
+    def lookup(self, message_id: int) -> dict[str, Image.Image]:
+        """Return the URL -> image map of a sent message, if still cached."""
+        images = self._cache.get(message_id)
+        metrics.incr('outputs.lookups', hit=images is not None)
+        return dict(images or {})
@@ -0,0 +1,58 @@
+"""Resolve replied-to messages without hitting the REST API when possible."""
+
+import logging
+
+import discord
+
+from nano_banana.core.cache import LRUCache
+from nano_banana.core.metrics import metrics
+from nano_banana.discord.attachments import ImageAttachment, image_attachments
+
+
+class ReferenceResolver:
+    """Find the image attachments of a message's reply target.
+
+    Lookups go through four tiers, cheapest first: the ``resolved`` object
+    sent by the gateway, the bot's message cache, a bounded LRU of attachment
+    metadata for recently seen messages, and finally a REST fetch. Every
+    lookup is counted in ``reference.lookups`` by tier.
+    """
+
+    def __init__(self, bot: discord.Client, maxsize: int = 4096) -> None:
+        self.bot = bot
+        self.recent: LRUCache[int, list[ImageAttachment]] = LRUCache(maxsize)
+        self.logger = logging.getLogger(__name__)
+
+    def remember(self, message: discord.Message) -> None:
+        """Record a message's image attachments for later replies to it."""
+        self.recent.put(message.id, image_attachments(message.attachments))
+
+    async def attachments(
+        self,
+        message: discord.Message,
+        message_id: int,
+    ) -> list[ImageAttachment]:
+        """Return the image attachments of the message ``message`` replies to."""
+        tier, found = await self._lookup(message, message_id)
+        metrics.incr('reference.lookups', tier=tier)
+        self.logger.debug('Resolved reference %d via %s', message_id, tier)
+        return found
+
+    async def _lookup(
+        self,
+        message: discord.Message,
+        message_id: int,
+    ) -> tuple[str, list[ImageAttachment]]:
+        ref = message.reference
+        if ref and isinstance(resolved := ref.resolved, discord.Message):
+            return 'resolved', image_attachments(resolved.attachments)
+
+        if cached := self.bot.get_message(message_id):
+            return 'cache', image_attachments(cached.attachments)
+
+        if (found := self.recent.get(message_id)) is not None:
+            return 'lru', found
+
+        ref_msg = await message.channel.fetch_message(message_id)
+        self.remember(ref_msg)
+        return 'rest', image_attachments(ref_msg.attachments)
@@ -0,0 +1,71 @@
+"""Cheap, I/O-free checks deciding whether a message asks for generation."""
+
+import re
+from dataclasses import dataclass
+
+import discord
+
+
+@dataclass(frozen=True, slots=True)
+class TriggerFilter:
+    """Decide from gateway data alone whether a message is a request.
+
+    ``channel_ids`` and ``role_ids`` restrict where and by whom the bot can
+    be invoked. ``mention`` and ``prefix`` say how it is invoked: when either
+    is set, a message has to match at least one of them. With nothing
+    configured every message triggers.
+    """
+
+    mention: bool = False
+    prefix: str = ''
+    channel_ids: frozenset[int] = frozenset()
+    role_ids: frozenset[int] = frozenset()
+
+    def rejects(
+        self,
+        message: discord.Message,
+        bot_user: discord.ClientUser | None,
+    ) -> str | None:
+        """Return why the message is ignored, or None if it triggers."""
+        if self.channel_ids and not self._in_channel(message.channel):
+            return 'channel'
+
+        if self.role_ids and not self._has_role(message.author):
+            return 'role'
+
+        if not (self.mention or self.prefix):
+            return None
+
+        if self.mention and self._mentions(message, bot_user):
+            return None
+        if self.prefix and (message.content or '').startswith(self.prefix):
+            return None
+        return 'invocation'
+
+    def strip(self, content: str, bot_user: discord.ClientUser | None) -> str:
+        """Remove the invocation (prefix or bot mention) from a prompt."""
+        if self.prefix and content.startswith(self.prefix):
+            content = content.removeprefix(self.prefix)
+        if self.mention and bot_user:
+            content = re.sub(rf'<@!?{bot_user.id}>', '', content)
+        return content.strip()
+
+    def _in_channel(self, channel: object) -> bool:
+        ids = {
+            getattr(channel, 'id', None),
+            getattr(channel, 'parent_id', None),
+        }
+        return not self.channel_ids.isdisjoint(ids)
+
+    def _has_role(self, author: object) -> bool:
+        roles = getattr(author, 'roles', None) or []
+        return any(role.id in self.role_ids for role in roles)
+
+    @staticmethod
+    def _mentions(
+        message: discord.Message,
+        bot_user: discord.ClientUser | None,
+    ) -> bool:
+        return bot_user is not None and any(
+            user.id == bot_user.id for user in message.mentions
+        )
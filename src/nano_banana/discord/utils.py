@@ -1,34 +1,92 @@
+import asyncio
+import contextlib
 import io
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Sequence
 
 import discord
 import httpx
 from PIL import Image
 
+from nano_banana.core.deadline import budget
+
+_http_stack = contextlib.AsyncExitStack()
+_http_client: httpx.AsyncClient | None = None
+
+
+async def http_client() -> httpx.AsyncClient:
+    """Shared HTTP client, so downloads reuse pooled connections."""
+    global _http_client  # noqa: PLW0603
+    if _http_client is None:
+        _http_client = await _http_stack.enter_async_context(
+            httpx.AsyncClient(),
+        )
+    return _http_client
+
+
+async def close_http() -> None:
+    """Close the shared HTTP client and its connection pool."""
+    global _http_client  # noqa: PLW0603
+    _http_client = None
+    await _http_stack.aclose()
+
 
 async def download_image(url: str) -> Image.Image:
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url)
-        return Image.open(io.BytesIO(resp.content))
+    client = await http_client()
+    resp = await client.get(url)
+    return Image.open(io.BytesIO(resp.content))
+
+
+def shrink(image: Image.Image, max_side: int) -> Image.Image:
+    """Fit ``image`` within ``max_side`` pixels, decoding no more than needed.
 
+    A JPEG that is not loaded yet is decoded at a reduced scale.
+    """
+    if max(image.size) <= max_side:
+        return image
+    image.draft(image.mode, (max_side, max_side))
+    image.thumbnail((max_side, max_side))
+    return image
 
-async def respond(
-    func: Callable[..., Awaitable],
+
+def encode_png(image: Image.Image) -> bytes:
+    with io.BytesIO() as image_binary:
+        image.save(image_binary, format='PNG')
+        return image_binary.getvalue()
+
+
+def _filenames(count: int) -> list[str]:
+    if count == 1:
+        return ['image.png']
+    return [f'image-{i}.png' for i in range(1, count + 1)]
+
+
+async def respond[T](
+    func: Callable[..., Awaitable[T]],
     text: str,
-    image: Image.Image | None,
-) -> None:
-    if not text and not image:
-        await func('我不知道該說什麼')
-        return
-
-    if image:
-        with io.BytesIO() as image_binary:
-            image.save(image_binary, format='PNG')
-            image_binary.seek(0)
-
-            await func(
-                content=text,
-                file=discord.File(fp=image_binary, filename='image.png'),
-            )
-            return
-    await func(content=text)
+    images: Sequence[Image.Image] = (),
+) -> T:
+    """Send ``text`` with every image attached to one message."""
+    if not text and not images:
+        async with budget('upload'):
+            return await func('我不知道該說什麼')
+
+    if not images:
+        async with budget('upload'):
+            return await func(content=text)
+
+    async with budget('encode'):
+        encoded = await asyncio.gather(
+            *(asyncio.to_thread(encode_png, image) for image in images),
+        )
+    async with budget('upload'):
+        return await func(
+            content=text,
+            files=[
+                discord.File(fp=io.BytesIO(data), filename=name)
+                for data, name in zip(
+                    encoded,
+                    _filenames(len(encoded)),
+                    strict=True,
+                )
+            ],
+        )
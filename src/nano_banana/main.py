@@ -2,11 +2,38 @@
 
 """Entry point for the GDG tutorial application."""
 
-from nano_banana.core.config import Settings
-from nano_banana.discord.bot import bot
+import asyncio
+import contextlib
+import signal
+
+from nano_banana.core.config import get_settings
+from nano_banana.discord.bot import bot, shutdown
+
+CLIENT_STOP_TIMEOUT = 10.0
+
+
+async def serve(token: str) -> None:
+    """Run the bot until SIGINT/SIGTERM, then shut down gracefully."""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    client = asyncio.create_task(bot.start(token))
+    stopping = asyncio.create_task(stop.wait())
+    await asyncio.wait({client, stopping}, return_when=asyncio.FIRST_COMPLETED)
+    stopping.cancel()
+
+    await shutdown()
+    with contextlib.suppress(TimeoutError):
+        await asyncio.wait_for(asyncio.shield(client), CLIENT_STOP_TIMEOUT)
+    if client.done() and not client.cancelled():
+        client.result()
 
 
 def main() -> None:
     """Run the Nano Banana application."""
-    settings = Settings()
-    bot.run(settings.discord_token)
+    token = get_settings().discord_token
+    with asyncio.Runner(loop_factory=lambda: bot.loop) as runner:
+        runner.run(serve(token))
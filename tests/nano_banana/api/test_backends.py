@@ -0,0 +1,136 @@
+"""Tests for the image generation backends."""
+
+import io
+import time
+from unittest.mock import patch
+
+import pytest
+from google.genai import errors, types
+from PIL import Image
+
+from nano_banana.api.backends import LocalBackend, api_error, render
+from nano_banana.api.client import ClientFeatures, NanoBananaClient
+
+
+class TestRender:
+    """Test procedural images."""
+
+    def test_same_prompt_same_image(self) -> None:
+        """Test a prompt always renders the same picture."""
+        first = render('a banana', 16)
+        second = render('a banana', 16)
+        other = render('an apple', 16)
+
+        assert first == second
+        assert first != other
+
+    def test_blends_source_image(self, sample_image: Image.Image) -> None:
+        """Test a source image changes the result at the requested size."""
+        plain = render('a banana', 16)
+
+        blended = render('a banana', 16, sample_image)
+
+        assert blended != plain
+        with Image.open(io.BytesIO(blended)) as img:
+            assert img.size == (16, 16)
+
+
+class TestApiError:
+    """Test building genai errors from status codes."""
+
+    def test_error_type_follows_code(self) -> None:
+        """Test 5xx codes are server errors and 4xx client errors."""
+        assert isinstance(api_error(503), errors.ServerError)
+        assert isinstance(api_error(429), errors.ClientError)
+
+
+class TestLocalBackend:
+    """Test the local procedural backend."""
+
+    @pytest.mark.asyncio
+    async def test_answers_with_image_after_latency(self) -> None:
+        """Test a response carries the prompt and an image of the size."""
+        backend = LocalBackend(latency=0.02, jitter=0.0, size=8)
+
+        start = time.perf_counter()
+        response = await backend.generate_content(
+            model='m',
+            contents=['a banana'],
+        )
+
+        assert time.perf_counter() - start >= 0.02
+        assert response.text == '[m] a banana'
+        assert response.parts is not None
+        image_part = response.parts[1]
+        assert image_part.inline_data is not None
+        assert image_part.inline_data.data == render('a banana', 8)
+
+    @pytest.mark.asyncio
+    async def test_one_image_per_candidate(self) -> None:
+        """Test each requested candidate gets its own picture."""
+        backend = LocalBackend(latency=0.0, jitter=0.0, size=8)
+
+        response = await backend.generate_content(
+            model='m',
+            contents=['a banana'],
+            config=types.GenerateContentConfig(candidate_count=3),
+        )
+
+        assert response.candidates is not None
+        data = [
+            part.inline_data.data
+            for candidate in response.candidates
+            if candidate.content and candidate.content.parts
+            for part in candidate.content.parts
+            if part.inline_data
+        ]
+        assert len(set(data)) == 3
+
+    @pytest.mark.asyncio
+    async def test_reuses_rendered_images(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test a repeated request is answered without drawing again."""
+        backend = LocalBackend(latency=0.0, jitter=0.0, size=8)
+
+        with patch(
+            'nano_banana.api.backends.render',
+            wraps=render,
+        ) as mock_render:
+            for _ in range(3):
+                await backend.generate_content(model='m', contents=['x'])
+            await backend.generate_content(
+                model='m',
+                contents=['x', sample_image],
+            )
+
+        assert mock_render.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_injects_errors(self) -> None:
+        """Test failures are raised with the configured code."""
+        backend = LocalBackend(latency=0.0, jitter=0.0, error_rate=1.0)
+
+        with pytest.raises(errors.ServerError) as excinfo:
+            await backend.generate_content(model='m', contents=['x'])
+
+        assert excinfo.value.code == 503
+
+    @pytest.mark.asyncio
+    async def test_client_needs_no_key(self) -> None:
+        """Test a client on the local backend runs without an API key."""
+        client = NanoBananaClient(
+            api_key='',
+            model_name='m',
+            features=ClientFeatures(
+                backend=LocalBackend(latency=0.0, jitter=0.0, size=8),
+            ),
+        )
+
+        text, images = await client.generate(prompt='a banana')
+        client.reconfigure(api_key='')
+
+        assert text == '[m] a banana'
+        assert [image.size for image in images] == [(8, 8)]
+        assert isinstance(client.key_pool.keys[0].backend, LocalBackend)
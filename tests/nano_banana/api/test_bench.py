@@ -0,0 +1,212 @@
+"""Tests for the benchmark subcommand."""
+
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image
+
+from nano_banana.api.backends import LocalBackend
+from nano_banana.api.client import NanoBananaClient
+from nano_banana.api.demo import bench
+
+
+def _client(
+    meter: bench.Meter,
+    **fake_options: float,
+) -> NanoBananaClient:
+    client = NanoBananaClient(api_key='fake-key', model_name='fake-model')
+    fake = LocalBackend(size=8, seed=0, **fake_options)
+    client.key_pool.intercept(lambda _: bench.MeteredBackend(fake, meter))
+    return client
+
+
+def _settings() -> MagicMock:
+    settings = MagicMock()
+    settings.MODEL_NAME = 'fake-model'
+    settings.SYSTEM_PROMPT = ''
+    settings.KEY_COOLDOWN_SECONDS = 60.0
+    return settings
+
+
+class TestRunBench:
+    """Test run_bench against the fake backend."""
+
+    @pytest.mark.asyncio
+    async def test_closed_loop_reports_latency_and_bytes(self) -> None:
+        """Test every request is sent and summarised."""
+        meter = bench.Meter()
+        client = _client(meter, latency=0.01, jitter=0.0)
+
+        report = await bench.run_bench(
+            client,
+            bench.BenchConfig(requests=6, concurrency=3),
+            meter=meter,
+        )
+
+        assert (report.succeeded, report.failed) == (6, 0)
+        assert set(report.latency_seconds) == {
+            'p50',
+            'p90',
+            'p95',
+            'p99',
+            'mean',
+            'max',
+        }
+        assert report.latency_seconds['p50'] >= 0.01
+        assert report.throughput > 0
+        assert report.bytes_sent == 6 * len(b'A ripe banana on a wooden table')
+        assert report.bytes_received > 0
+
+    @pytest.mark.asyncio
+    async def test_concurrency_bounds_duration(self) -> None:
+        """Test requests overlap up to the concurrency limit."""
+        meter = bench.Meter()
+        client = _client(meter, latency=0.05, jitter=0.0)
+
+        report = await bench.run_bench(
+            client,
+            bench.BenchConfig(requests=4, concurrency=4),
+            meter=meter,
+        )
+
+        assert report.duration_seconds < 0.15
+
+    @pytest.mark.asyncio
+    async def test_errors_are_broken_down(self) -> None:
+        """Test failed requests are counted by error type and code."""
+        meter = bench.Meter()
+        client = _client(meter, latency=0.0, jitter=0.0, error_rate=1.0)
+
+        report = await bench.run_bench(
+            client,
+            bench.BenchConfig(requests=3),
+            meter=meter,
+        )
+
+        assert report.failed == 3
+        assert report.errors == {'ServerError 503': 3}
+        assert report.latency_seconds == {}
+
+    @pytest.mark.asyncio
+    async def test_open_loop_follows_rate(self) -> None:
+        """Test requests arrive on schedule at the target rate."""
+        meter = bench.Meter()
+        client = _client(meter, latency=0.0, jitter=0.0)
+
+        report = await bench.run_bench(
+            client,
+            bench.BenchConfig(requests=5, concurrency=None, rate=100.0),
+            meter=meter,
+        )
+
+        assert report.succeeded == 5
+        assert report.duration_seconds >= 0.05
+
+    @pytest.mark.asyncio
+    async def test_input_images_are_metered(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test input images count toward the bytes sent."""
+        meter = bench.Meter()
+        client = _client(meter, latency=0.0, jitter=0.0)
+
+        report = await bench.run_bench(
+            client,
+            bench.BenchConfig(requests=2, prompt='x'),
+            [sample_image],
+            meter,
+        )
+
+        image_size = meter._image_size(sample_image)
+        assert report.bytes_sent == 2 * (len(b'x') + image_size)
+
+
+class TestBenchReport:
+    """Test report rendering."""
+
+    def test_table_and_json(self) -> None:
+        """Test the report renders as an aligned table and as JSON."""
+        report = bench.BenchReport(
+            requests=2,
+            succeeded=1,
+            failed=1,
+            duration_seconds=1.0,
+            throughput=1.0,
+            latency_seconds={'p50': 0.5},
+            errors={'ServerError 503': 1},
+            bytes_sent=10,
+            bytes_received=2048,
+        )
+
+        table = report.table()
+
+        assert 'latency p50' in table
+        assert 'error ServerError 503' in table
+        assert '2,048' in table
+        assert json.loads(report.json())['errors'] == {'ServerError 503': 1}
+
+
+class TestBenchMain:
+    """Test the bench entry point."""
+
+    @pytest.mark.asyncio
+    async def test_amain_fake_json(
+        self,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test the fake backend needs no API key and prints JSON."""
+        with patch.object(bench, 'get_settings', return_value=_settings()):
+            report = await bench.amain(
+                [
+                    '--fake',
+                    '-n',
+                    '3',
+                    '--fake-latency',
+                    '0',
+                    '--fake-size',
+                    '8',
+                    '--format',
+                    'json',
+                ],
+            )
+
+        assert report.succeeded == 3
+        assert json.loads(capsys.readouterr().out)['requests'] == 3
+
+    @pytest.mark.asyncio
+    async def test_amain_requires_key_for_real_api(self) -> None:
+        """Test benchmarking the real API needs a key."""
+        settings = _settings()
+        settings.google_api_keys = []
+
+        with (
+            patch.object(bench, 'get_settings', return_value=settings),
+            pytest.raises(ValueError, match='API key is required'),
+        ):
+            await bench.amain([])
+
+
+class TestBenchCassettes:
+    """Test recording a benchmark and replaying it offline."""
+
+    @pytest.mark.asyncio
+    async def test_record_then_replay(self, tmp_path: Path) -> None:
+        """Test a replayed run reproduces the recorded outcomes."""
+        cassette = tmp_path / 'run.jsonl'
+        fake = ['--fake-latency', '0', '--fake-size', '8', '--seed', '3']
+        run = ['-n', '4', '--format', 'json', '--fake-error-rate', '0.5']
+
+        with patch.object(bench, 'get_settings', return_value=_settings()):
+            recorded = await bench.amain(
+                ['--fake', *fake, *run, '--record', str(cassette)],
+            )
+            replayed = await bench.amain(
+                ['--replay', str(cassette), '--time-scale', '0', *run],
+            )
+
+        assert len(cassette.read_text().splitlines()) == 4
+        assert replayed.errors == recorded.errors
+        assert replayed.bytes_received == recorded.bytes_received
@@ -0,0 +1,214 @@
+"""Tests for the circuit breaker."""
+
+from unittest.mock import patch
+
+import pytest
+from google.genai import errors
+
+from nano_banana.api.breaker import (
+    BreakerPolicy,
+    BreakerState,
+    CircuitBreaker,
+    CircuitOpenError,
+    is_backend_failure,
+)
+from nano_banana.core.metrics import metrics
+
+POLICY = BreakerPolicy(min_calls=4, max_error_rate=0.5, open_seconds=30)
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics() -> None:
+    metrics.reset()
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.policy.min_calls):
+        breaker.record_failure(RuntimeError('boom'))
+
+
+class TestIsBackendFailure:
+    """Test which errors count against the backend."""
+
+    def test_server_errors_count(self) -> None:
+        """Test server errors and timeouts count as failures."""
+        assert is_backend_failure(errors.ServerError(503, {}))
+        assert is_backend_failure(TimeoutError())
+
+    def test_rate_limits_count(self) -> None:
+        """Test 429 responses count as failures."""
+        assert is_backend_failure(errors.ClientError(429, {}))
+
+    def test_bad_requests_do_not_count(self) -> None:
+        """Test caller mistakes do not count against the backend."""
+        assert not is_backend_failure(errors.ClientError(400, {}))
+        assert not is_backend_failure(ValueError('Empty response'))
+
+
+class TestCircuitBreaker:
+    """Test CircuitBreaker state transitions."""
+
+    def test_stays_closed_below_min_calls(self) -> None:
+        """Test a few failures are not enough to judge the backend."""
+        breaker = CircuitBreaker(POLICY)
+        for _ in range(POLICY.min_calls - 1):
+            breaker.record_failure(RuntimeError('boom'))
+
+        assert breaker.state is BreakerState.CLOSED
+
+    def test_opens_on_error_rate(self) -> None:
+        """Test the circuit opens once the error rate is over the limit."""
+        breaker = CircuitBreaker(POLICY)
+        breaker.record_success(0.1)
+        _trip(breaker)
+
+        assert breaker.state is BreakerState.OPEN
+        assert not breaker.allows()
+
+    def test_stays_closed_when_mostly_healthy(self) -> None:
+        """Test occasional failures do not open the circuit."""
+        breaker = CircuitBreaker(POLICY)
+        for _ in range(3):
+            breaker.record_success(0.1)
+        breaker.record_failure(RuntimeError('boom'))
+
+        assert breaker.state is BreakerState.CLOSED
+
+    def test_opens_on_slow_calls(self) -> None:
+        """Test the circuit opens when most calls are too slow."""
+        breaker = CircuitBreaker(
+            BreakerPolicy(
+                min_calls=2, slow_call_seconds=1.0, max_slow_rate=0.5
+            ),
+        )
+        breaker.record_success(5.0)
+        breaker.record_success(5.0)
+
+        assert breaker.state is BreakerState.OPEN
+
+    def test_old_outcomes_leave_window(self) -> None:
+        """Test failures older than the window are forgotten."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            for _ in range(POLICY.min_calls - 1):
+                breaker.record_failure(RuntimeError('boom'))
+        with patch('time.monotonic', return_value=POLICY.window_seconds + 1):
+            breaker.record_failure(RuntimeError('boom'))
+
+            assert breaker.state is BreakerState.CLOSED
+
+    def test_open_fails_fast(self) -> None:
+        """Test calls are rejected while the circuit is open."""
+        breaker = CircuitBreaker(POLICY)
+        _trip(breaker)
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert metrics.counter('breaker.rejected', breaker='gemini') == 1
+
+    def test_half_open_after_cooldown(self) -> None:
+        """Test one probe is let through once the circuit has cooled down."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            _trip(breaker)
+        with patch('time.monotonic', return_value=POLICY.open_seconds):
+            assert breaker.state is BreakerState.HALF_OPEN
+            breaker.before_call()
+
+            assert not breaker.allows()
+
+    def test_probe_success_closes(self) -> None:
+        """Test a successful probe closes the circuit."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            _trip(breaker)
+        with patch('time.monotonic', return_value=POLICY.open_seconds):
+            breaker.before_call()
+            breaker.record_success(0.1)
+
+            assert breaker.state is BreakerState.CLOSED
+            assert breaker.allows()
+
+    def test_probe_failure_reopens(self) -> None:
+        """Test a failed probe opens the circuit again."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            _trip(breaker)
+        with patch('time.monotonic', return_value=POLICY.open_seconds):
+            breaker.before_call()
+            breaker.record_failure(TimeoutError())
+
+            assert breaker.state is BreakerState.OPEN
+
+    def test_probe_bad_request_frees_probe(self) -> None:
+        """Test a probe failing on a bad request lets another probe through."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            _trip(breaker)
+        with patch('time.monotonic', return_value=POLICY.open_seconds):
+            breaker.before_call()
+            breaker.record_failure(ValueError('Prompt is required.'))
+
+            assert breaker.state is BreakerState.HALF_OPEN
+            assert breaker.allows()
+
+    def test_transitions_are_counted(self) -> None:
+        """Test state changes are exposed as metrics."""
+        breaker = CircuitBreaker(POLICY)
+        _trip(breaker)
+
+        assert (
+            metrics.counter(
+                'breaker.transitions',
+                breaker='gemini',
+                source='closed',
+                target='open',
+            )
+            == 1
+        )
+        assert metrics.gauge('breaker.state', breaker='gemini') == 2
+
+    def test_claim_holds_the_probe(self) -> None:
+        """Test a half-open claim keeps others out until it is used."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            _trip(breaker)
+        with patch('time.monotonic', return_value=POLICY.open_seconds):
+            with breaker.claim() as granted:
+                assert granted
+                with breaker.claim() as second:
+                    assert not second
+                breaker.before_call()
+
+            assert not breaker.allows()
+
+    def test_unused_claim_is_given_back(self) -> None:
+        """Test a claim released without calling frees the probe."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            _trip(breaker)
+        with patch('time.monotonic', return_value=POLICY.open_seconds):
+            with breaker.claim():
+                pass
+
+            assert breaker.allows()
+
+    def test_cancelled_probe_is_given_back(self) -> None:
+        """Test a probe cancelled for other reasons frees its slot."""
+        breaker = CircuitBreaker(POLICY)
+        with patch('time.monotonic', return_value=0.0):
+            _trip(breaker)
+        with patch('time.monotonic', return_value=POLICY.open_seconds):
+            breaker.before_call()
+            breaker.record_cancelled(timed_out=False)
+
+            assert breaker.state is BreakerState.HALF_OPEN
+            assert breaker.allows()
+
+    def test_timed_out_call_is_a_failure(self) -> None:
+        """Test calls cut off by their deadline count against the backend."""
+        breaker = CircuitBreaker(POLICY)
+        for _ in range(POLICY.min_calls):
+            breaker.record_cancelled(timed_out=True)
+
+        assert breaker.state is BreakerState.OPEN
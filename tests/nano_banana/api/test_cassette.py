@@ -0,0 +1,156 @@
+"""Tests for recording and replaying Gemini calls."""
+
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+from google.genai import errors, types
+from PIL import Image
+
+from nano_banana.api.cassette import (
+    Cassette,
+    CassetteMissError,
+    Interaction,
+    RecordingBackend,
+    ReplayBackend,
+    fingerprint,
+)
+from nano_banana.api.client import NanoBananaClient
+
+
+def _response(
+    text: str,
+    data: bytes | None = None,
+) -> types.GenerateContentResponse:
+    parts = [types.Part.from_text(text=text)]
+    if data is not None:
+        parts.append(types.Part.from_bytes(data=data, mime_type='image/png'))
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(content=types.Content(role='model', parts=parts)),
+        ],
+    )
+
+
+class TestFingerprint:
+    """Test request fingerprints."""
+
+    def test_same_request_same_fingerprint(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test equal images hash alike even as different objects."""
+        first = fingerprint('m', ['draw', sample_image])
+        second = fingerprint('m', ['draw', sample_image.copy()])
+
+        assert first == second
+
+    def test_request_parts_change_fingerprint(self) -> None:
+        """Test model, prompt and config all feed the fingerprint."""
+        base = fingerprint('m', ['draw'])
+        config = types.GenerateContentConfig(system_instruction='be nice')
+
+        assert fingerprint('other', ['draw']) != base
+        assert fingerprint('m', ['paint']) != base
+        assert fingerprint('m', ['draw'], config) != base
+
+    def test_cached_content_name_ignored(self) -> None:
+        """Test the per-run name of a cached prompt is not fingerprinted."""
+        first = types.GenerateContentConfig(cached_content='cachedContents/a')
+        second = types.GenerateContentConfig(cached_content='cachedContents/b')
+
+        assert fingerprint('m', ['x'], first) == fingerprint('m', ['x'], second)
+
+
+class TestCassette:
+    """Test cassette persistence and lookup."""
+
+    def test_round_trip(self, tmp_path: Path) -> None:
+        """Test interactions survive being written and read back."""
+        path = tmp_path / 'run.jsonl'
+        Cassette(path).append(
+            Interaction('abc', 'm', 1.5, response=_response('hi', b'\x00\xff')),
+        )
+
+        (interaction,) = Cassette(path).interactions
+
+        assert interaction.latency == 1.5
+        assert interaction.result().parts[1].inline_data.data == b'\x00\xff'
+
+    def test_recorded_error_raised_again(self) -> None:
+        """Test recorded API errors are replayed as the same error type."""
+        interaction = Interaction('abc', 'm', 0.1, error_code=429)
+
+        with pytest.raises(errors.ClientError) as exc_info:
+            interaction.result()
+        assert exc_info.value.code == 429
+
+    def test_lookup_cycles_in_order(self, tmp_path: Path) -> None:
+        """Test repeated requests get their recordings in turn."""
+        cassette = Cassette(tmp_path / 'run.jsonl')
+        cassette.append(Interaction('a', 'm', 0, response=_response('1')))
+        cassette.append(Interaction('a', 'm', 0, response=_response('2')))
+
+        texts = [cassette.lookup('a').response.text for _ in range(3)]
+
+        assert texts == ['1', '2', '1']
+
+    def test_lookup_miss(self, tmp_path: Path) -> None:
+        """Test unknown requests fail when strict and fall back otherwise."""
+        cassette = Cassette(tmp_path / 'run.jsonl')
+        cassette.append(Interaction('a', 'm', 0, response=_response('1')))
+
+        with pytest.raises(CassetteMissError):
+            cassette.lookup('b')
+        assert cassette.lookup('b', strict=False).fingerprint == 'a'
+
+
+class TestRecordReplay:
+    """Test recording a client's calls and replaying them."""
+
+    @pytest.mark.asyncio
+    async def test_record_then_replay(self, tmp_path: Path) -> None:
+        """Test a replayed client answers like the recorded one."""
+        path = tmp_path / 'run.jsonl'
+        recorder = NanoBananaClient(api_key='k', model_name='m')
+        backend = AsyncMock()
+        backend.generate_content.return_value = _response('recorded')
+        recorder.key_pool.intercept(
+            lambda _: RecordingBackend(backend, Cassette(path)),
+        )
+        await recorder.generate(prompt='draw')
+
+        player = NanoBananaClient(api_key='k', model_name='m')
+        player.key_pool.intercept(
+            lambda _: ReplayBackend(Cassette(path), time_scale=0, strict=True),
+        )
+        text, _ = await player.generate(prompt='draw')
+
+        assert text == 'recorded'
+
+    @pytest.mark.asyncio
+    async def test_record_api_error(self, tmp_path: Path) -> None:
+        """Test failed calls are recorded with their error code."""
+        cassette = Cassette(tmp_path / 'run.jsonl')
+        backend = AsyncMock()
+        backend.generate_content.side_effect = errors.ServerError(503, {})
+        recording = RecordingBackend(backend, cassette)
+
+        with pytest.raises(errors.ServerError):
+            await recording.generate_content(model='m', contents=['x'])
+
+        assert cassette.interactions[0].error_code == 503
+
+    @pytest.mark.asyncio
+    async def test_replay_scales_latency(self, tmp_path: Path) -> None:
+        """Test replay waits the recorded latency times the scale."""
+        cassette = Cassette(tmp_path / 'run.jsonl')
+        key = fingerprint('m', ['x'])
+        cassette.append(Interaction(key, 'm', 0.1, response=_response('ok')))
+        replay = ReplayBackend(cassette, time_scale=0.5)
+
+        start = time.perf_counter()
+        await replay.generate_content(model='m', contents=['x'])
+
+        assert 0.05 <= time.perf_counter() - start < 0.1
@@ -1,11 +1,38 @@
 """Tests for NanoBananaClient."""
 
-from unittest.mock import MagicMock, patch
+import asyncio
+import io
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from google.genai import errors, types
 from PIL import Image
 
-from nano_banana.api.client import NanoBananaClient
+from nano_banana.api.backends import LocalBackend
+from nano_banana.api.breaker import (
+    BreakerPolicy,
+    BreakerState,
+    CircuitOpenError,
+)
+from nano_banana.api.client import ClientFeatures, NanoBananaClient
+from nano_banana.api.files import FakeFileService, FileUploadCache
+from nano_banana.api.hedging import HedgePolicy
+from nano_banana.api.sessions import ChatSessionStore
+from nano_banana.core.deadline import (
+    DeadlineExceededError,
+    StageBudgets,
+    budget,
+    deadline_scope,
+)
+from nano_banana.core.metrics import metrics
+
+
+def _mock_response(parts: list) -> MagicMock:
+    """Response whose only candidate carries ``parts``."""
+    response = MagicMock()
+    response.parts = parts
+    response.candidates = [MagicMock(content=MagicMock(parts=parts))]
+    return response
 
 
 class TestNanoBananaClient:
@@ -26,6 +53,43 @@ class TestNanoBananaClient:
         with pytest.raises(ValueError, match='Google API key is required'):
             NanoBananaClient(api_key='', model_name='test-model')
 
+    def test_reconfigure_swaps_prompt_and_model(self) -> None:
+        """Test reconfigure applies new values and keeps the key pool."""
+        client = NanoBananaClient(api_key='key-a', model_name='model-a')
+        pool = client.key_pool
+
+        client.reconfigure(
+            api_key=['key-a'],
+            model_name='model-b',
+            system_prompt='New prompt',
+        )
+
+        assert client.model_name == 'model-b'
+        assert client.system_prompt == 'New prompt'
+        assert client.key_pool is pool
+
+    def test_reconfigure_keeps_state_of_retained_keys(self) -> None:
+        """Test a new key list keeps the leases of keys that stay."""
+        client = NanoBananaClient(api_key=['key-a', 'key-b'], model_name='m')
+        kept = client.key_pool.keys[1]
+        kept.outstanding = 1
+        old_pool = client.key_pool
+
+        client.reconfigure(api_key=['key-b', 'key-c'], key_cooldown=5.0)
+
+        assert client.key_pool is not old_pool
+        assert [k.api_key for k in client.key_pool.keys] == ['key-b', 'key-c']
+        assert client.key_pool.keys[0] is kept
+        assert client.key_pool.cooldown == 5.0
+        assert client.client is kept.client
+
+    def test_reconfigure_rejects_empty_keys(self) -> None:
+        """Test reconfigure refuses to drop every key."""
+        client = NanoBananaClient(api_key='key-a', model_name='m')
+
+        with pytest.raises(ValueError, match='Google API key is required'):
+            client.reconfigure(api_key=[''])
+
     @pytest.mark.asyncio
     async def test_generate_text_to_image(
         self,
@@ -43,21 +107,20 @@ class TestNanoBananaClient:
         mock_part.inline_data = MagicMock()
         mock_part.inline_data.data = sample_image_bytes
 
-        mock_response = MagicMock()
-        mock_response.parts = [mock_part]
+        mock_response = _mock_response([mock_part])
 
         with patch.object(
             client.client.aio.models,
             'generate_content',
             return_value=mock_response,
         ) as mock_generate:
-            text, image = await client.generate(
+            text, images = await client.generate(
                 prompt='A beautiful sunset',
             )
 
             assert text == 'Generated image description'
-            assert isinstance(image, Image.Image)
-            assert image.size == (100, 100)
+            assert len(images) == 1
+            assert images[0].size == (100, 100)
             mock_generate.assert_called_once()
 
     @pytest.mark.asyncio
@@ -78,21 +141,20 @@ class TestNanoBananaClient:
         mock_part.inline_data = MagicMock()
         mock_part.inline_data.data = sample_image_bytes
 
-        mock_response = MagicMock()
-        mock_response.parts = [mock_part]
+        mock_response = _mock_response([mock_part])
 
         with patch.object(
             client.client.aio.models,
             'generate_content',
             return_value=mock_response,
         ) as mock_generate:
-            text, image = await client.generate(
+            text, images = await client.generate(
                 prompt='Make it more colorful',
                 images=[sample_image],
             )
 
             assert text == 'Transformed image'
-            assert isinstance(image, Image.Image)
+            assert isinstance(images[0], Image.Image)
             mock_generate.assert_called_once()
 
     @pytest.mark.asyncio
@@ -103,8 +165,7 @@ class TestNanoBananaClient:
             model_name='test-model',
         )
 
-        mock_response = MagicMock()
-        mock_response.parts = []
+        mock_response = _mock_response([])
 
         with (
             patch.object(
@@ -132,18 +193,17 @@ class TestNanoBananaClient:
         mock_part.text = 'Some text'
         mock_part.inline_data = None
 
-        mock_response = MagicMock()
-        mock_response.parts = [mock_part]
+        mock_response = _mock_response([mock_part])
 
         with patch.object(
             client.client.aio.models,
             'generate_content',
             return_value=mock_response,
         ):
-            text, image = await client.generate(prompt='Test prompt')
+            text, images = await client.generate(prompt='Test prompt')
 
             assert text == 'Some text'
-            assert image is None
+            assert images == []
 
     @pytest.mark.asyncio
     async def test_generate_api_exception(self) -> None:
@@ -182,25 +242,25 @@ class TestNanoBananaClient:
         mock_part.inline_data = MagicMock()
         mock_part.inline_data.data = sample_image_bytes
 
-        mock_response = MagicMock()
-        mock_response.parts = [mock_part]
+        mock_response = _mock_response([mock_part])
 
         with patch.object(
             client.client.aio.models,
             'generate_content',
             return_value=mock_response,
         ) as mock_generate:
-            text, image = await client.generate(
+            text, images = await client.generate(
                 prompt='Combine these',
                 images=[image1, image2],
             )
 
             assert text == 'Combined image'
-            assert isinstance(image, Image.Image)
-            # Verify system_prompt, prompt, and both images were passed
+            assert isinstance(images[0], Image.Image)
+            # Verify prompt and both images were passed
             call_args = mock_generate.call_args
-            expected_contents = ['', 'Combine these', image1, image2]
+            expected_contents = ['Combine these', image1, image2]
             assert call_args.kwargs['contents'] == expected_contents
+            assert call_args.kwargs['config'] is None
 
     @pytest.mark.asyncio
     async def test_generate_with_multiple_text_parts(
@@ -223,15 +283,463 @@ class TestNanoBananaClient:
         mock_part2.inline_data = MagicMock()
         mock_part2.inline_data.data = sample_image_bytes
 
-        mock_response = MagicMock()
-        mock_response.parts = [mock_part1, mock_part2]
+        mock_response = _mock_response([mock_part1, mock_part2])
 
         with patch.object(
             client.client.aio.models,
             'generate_content',
             return_value=mock_response,
         ):
-            text, image = await client.generate(prompt='Test')
+            text, images = await client.generate(prompt='Test')
 
             assert text == 'Part 1 Part 2'
-            assert isinstance(image, Image.Image)
+            assert isinstance(images[0], Image.Image)
+
+    @pytest.mark.asyncio
+    async def test_generate_returns_every_candidate_image(
+        self,
+        sample_image_bytes: bytes,
+    ) -> None:
+        """Test all images of all candidates are returned in order."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            system_prompt='Be creative',
+        )
+        image_part = types.Part.from_bytes(
+            data=sample_image_bytes,
+            mime_type='image/png',
+        )
+        response = types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(
+                        role='model',
+                        parts=[
+                            types.Part.from_text(text='first'),
+                            image_part,
+                            image_part,
+                        ],
+                    ),
+                ),
+                types.Candidate(
+                    content=types.Content(
+                        role='model',
+                        parts=[
+                            types.Part.from_text(text='second'),
+                            image_part,
+                        ],
+                    ),
+                ),
+            ],
+        )
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=response,
+        ) as mock_generate:
+            text, images = await client.generate(prompt='Test', candidates=2)
+
+        config = mock_generate.call_args.kwargs['config']
+        assert config.candidate_count == 2
+        assert config.system_instruction == 'Be creative'
+        assert text == 'first'
+        assert len(images) == 3
+
+    @pytest.mark.asyncio
+    async def test_generate_rejects_zero_candidates(self) -> None:
+        """Test asking for no candidates is an error."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+        )
+
+        with pytest.raises(ValueError, match='At least one candidate'):
+            await client.generate(prompt='Test', candidates=0)
+
+    @pytest.mark.asyncio
+    async def test_generate_requires_prompt_or_image(self) -> None:
+        """Test an empty request is an error even with a system prompt."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            system_prompt='Minecraft style',
+        )
+
+        with pytest.raises(ValueError, match='A prompt or an image'):
+            await client.generate(prompt='  ')
+
+    @pytest.mark.asyncio
+    async def test_generate_image_without_prompt(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test an image alone is sent without an empty text part."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+        )
+        mock_part = MagicMock()
+        mock_part.text = 'ok'
+        mock_part.inline_data = None
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=_mock_response([mock_part]),
+        ) as mock_generate:
+            await client.generate(prompt='', images=[sample_image])
+
+        assert mock_generate.call_args.kwargs['contents'] == [sample_image]
+
+    @pytest.mark.asyncio
+    async def test_generate_rotates_rate_limited_key(self) -> None:
+        """Test a request rejected with 429 is retried on another key."""
+        client = NanoBananaClient(
+            api_key=['key-1', 'key-2'],
+            model_name='test-model',
+        )
+        first, second = client.key_pool.keys
+
+        mock_part = MagicMock()
+        mock_part.text = 'ok'
+        mock_part.inline_data = None
+        mock_response = _mock_response([mock_part])
+
+        with (
+            patch.object(
+                first.client.aio.models,
+                'generate_content',
+                side_effect=errors.ClientError(429, {}),
+            ),
+            patch.object(
+                second.client.aio.models,
+                'generate_content',
+                return_value=mock_response,
+            ) as mock_second,
+        ):
+            text, _ = await client.generate(prompt='Test')
+
+            assert text == 'ok'
+            mock_second.assert_called_once()
+        assert first not in client.key_pool.available()
+
+    @pytest.mark.asyncio
+    async def test_generate_raises_when_all_keys_rejected(self) -> None:
+        """Test the error surfaces once every key is out of rotation."""
+        client = NanoBananaClient(
+            api_key=['key-1'],
+            model_name='test-model',
+        )
+
+        with (
+            patch.object(
+                client.client.aio.models,
+                'generate_content',
+                side_effect=errors.ClientError(429, {}),
+            ),
+            pytest.raises(errors.ClientError),
+        ):
+            await client.generate(prompt='Test')
+
+    @pytest.mark.asyncio
+    async def test_rotation_tries_each_key_once(self) -> None:
+        """Test keys without a cooldown are not retried forever."""
+        client = NanoBananaClient(
+            api_key=['key-1', 'key-2'],
+            model_name='test-model',
+            key_cooldown=0,
+        )
+        backend = MagicMock()
+        backend.generate_content = AsyncMock(
+            side_effect=errors.ClientError(429, {}),
+        )
+        client.key_pool.intercept(lambda _: backend)
+
+        with pytest.raises(errors.ClientError):
+            await client.generate(prompt='Test')
+
+        assert backend.generate_content.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_generate_with_hedging(self) -> None:
+        """Test hedged clients keep one hedger per model."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            features=ClientFeatures(hedge=HedgePolicy()),
+        )
+
+        mock_part = MagicMock()
+        mock_part.text = 'ok'
+        mock_part.inline_data = None
+        mock_response = _mock_response([mock_part])
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=mock_response,
+        ):
+            text, _ = await client.generate(prompt='Test')
+
+        assert text == 'ok'
+        assert client.hedgers['test-model'].requests == 1
+
+    @pytest.mark.asyncio
+    async def test_generate_opens_breaker_on_failures(self) -> None:
+        """Test repeated backend errors open the breaker and fail fast."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            features=ClientFeatures(breaker=BreakerPolicy(min_calls=2)),
+        )
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            side_effect=errors.ServerError(503, {}),
+        ) as mock_generate:
+            for _ in range(2):
+                with pytest.raises(errors.ServerError):
+                    await client.generate(prompt='Test')
+            with pytest.raises(CircuitOpenError):
+                await client.generate(prompt='Test')
+
+        assert client.breakers['test-model'].state is BreakerState.OPEN
+        assert client.available('other-model')
+        assert mock_generate.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_does_not_wedge_breaker(self) -> None:
+        """Test cancelling a half-open probe lets the next one through."""
+        client = NanoBananaClient(
+            api_key='',
+            model_name='test-model',
+            features=ClientFeatures(
+                breaker=BreakerPolicy(min_calls=1, open_seconds=0),
+                backend=LocalBackend(latency=10, jitter=0),
+            ),
+        )
+        breaker = client.breaker_for('test-model')
+        assert breaker is not None
+        breaker.record_failure(RuntimeError('down'))
+        assert breaker.state is BreakerState.HALF_OPEN
+
+        task = asyncio.create_task(client.generate(prompt='Test'))
+        await asyncio.sleep(0)
+        assert not breaker.allows()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert breaker.state is BreakerState.HALF_OPEN
+        assert breaker.allows()
+
+    @pytest.mark.asyncio
+    async def test_deadline_hit_during_half_open_reopens(self) -> None:
+        """Test a probe cut off by the generate budget counts as failed."""
+        metrics.reset()
+        client = NanoBananaClient(
+            api_key='',
+            model_name='test-model',
+            features=ClientFeatures(
+                breaker=BreakerPolicy(min_calls=1, open_seconds=0),
+                backend=LocalBackend(latency=10, jitter=0),
+            ),
+        )
+        breaker = client.breaker_for('test-model')
+        assert breaker is not None
+        breaker.record_failure(RuntimeError('down'))
+
+        with (
+            deadline_scope(StageBudgets(generate=0.01)),
+            pytest.raises(DeadlineExceededError),
+        ):
+            async with budget('generate'):
+                await client.generate(prompt='Test')
+
+        reopened = metrics.counter(
+            'breaker.transitions',
+            breaker='test-model',
+            source='half_open',
+            target='open',
+        )
+        assert reopened == 1
+        assert breaker.state is BreakerState.HALF_OPEN
+        assert breaker.allows()
+
+    @pytest.mark.asyncio
+    async def test_generate_in_session_reuses_history(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test follow-up turns are sent on top of the stored history."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            system_prompt='Be nice',
+            features=ClientFeatures(sessions=ChatSessionStore()),
+        )
+
+        reply = types.Content(
+            role='model',
+            parts=[types.Part.from_text(text='done')],
+        )
+        mock_response = MagicMock()
+        mock_response.parts = reply.parts
+        mock_response.candidates = [MagicMock(content=reply)]
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=mock_response,
+        ) as mock_generate:
+            await client.generate(
+                prompt='a cat',
+                images=[sample_image],
+                session='thread:1',
+            )
+            await client.generate(prompt='darker', session='thread:1')
+
+            contents = mock_generate.call_args.kwargs['contents']
+            config = mock_generate.call_args.kwargs['config']
+
+        assert [c.role for c in contents] == ['user', 'model', 'user']
+        assert config.system_instruction == 'Be nice'
+        assert contents[0].parts[0].text == 'a cat'
+        assert contents[0].parts[1].inline_data.mime_type == 'image/png'
+        assert contents[2].parts[-1].text == 'darker'
+        assert len(client.sessions.history('thread:1')) == 4
+
+    @pytest.mark.asyncio
+    async def test_generate_in_session_skips_own_output(self) -> None:
+        """Test an image the model sent earlier in the session is not resent."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            features=ClientFeatures(sessions=ChatSessionStore()),
+        )
+        with io.BytesIO() as bio:
+            Image.new('RGB', (8, 8), 'blue').save(bio, format='PNG')
+            png = bio.getvalue()
+        reply = types.Content(
+            role='model',
+            parts=[types.Part.from_bytes(data=png, mime_type='image/png')],
+        )
+        mock_response = MagicMock()
+        mock_response.parts = reply.parts
+        mock_response.candidates = [MagicMock(content=reply)]
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=mock_response,
+        ) as mock_generate:
+            _, (output,) = await client.generate(
+                prompt='a blue square',
+                session='thread:1',
+            )
+            await client.generate(
+                prompt='darker',
+                images=[output],
+                session='thread:1',
+            )
+
+            contents = mock_generate.call_args.kwargs['contents']
+
+        assert [part.text for part in contents[2].parts] == ['darker']
+        assert metrics.counter('sessions.inputs_skipped') == 1
+
+    @pytest.mark.asyncio
+    async def test_session_turn_needs_sessions(self) -> None:
+        """Test a session turn without a session store names the feature."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+        )
+
+        with pytest.raises(ValueError, match='Chat sessions are not enabled'):
+            await client._generate_in_session('thread:1', 'a cat', [], 'm')
+
+    @pytest.mark.asyncio
+    async def test_generate_session_ignored_without_store(self) -> None:
+        """Test the session argument is a no-op when sessions are off."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+        )
+
+        mock_part = MagicMock()
+        mock_part.text = 'ok'
+        mock_part.inline_data = None
+        mock_response = _mock_response([mock_part])
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=mock_response,
+        ) as mock_generate:
+            await client.generate(prompt='a cat', session='thread:1')
+
+            assert mock_generate.call_args.kwargs['contents'] == ['a cat']
+
+    @pytest.mark.asyncio
+    async def test_generate_refers_to_uploaded_file(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test a reused image is sent as a Files API reference."""
+        service = FakeFileService()
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            features=ClientFeatures(
+                files=FileUploadCache(service=service, min_uses=2),
+            ),
+        )
+
+        mock_part = MagicMock()
+        mock_part.text = 'ok'
+        mock_part.inline_data = None
+        mock_response = _mock_response([mock_part])
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=mock_response,
+        ) as mock_generate:
+            await client.generate(prompt='a', images=[sample_image])
+            first = mock_generate.call_args.kwargs['contents']
+            await client.generate(prompt='b', images=[sample_image])
+            second = mock_generate.call_args.kwargs['contents']
+
+        assert first[-1] is sample_image
+        assert isinstance(second[-1], types.Part)
+        assert second[-1].file_data.file_uri.startswith('https://fake.files')
+        assert len(service.uploads) == 1
+
+    @pytest.mark.asyncio
+    async def test_generate_sends_system_instruction(self) -> None:
+        """Test the system prompt is a system instruction, not content."""
+        client = NanoBananaClient(
+            api_key='test_api_key',
+            model_name='test-model',
+            system_prompt='Minecraft style',
+        )
+
+        mock_part = MagicMock()
+        mock_part.text = 'ok'
+        mock_part.inline_data = None
+        mock_response = _mock_response([mock_part])
+
+        with patch.object(
+            client.client.aio.models,
+            'generate_content',
+            return_value=mock_response,
+        ) as mock_generate:
+            await client.generate(prompt='a cat')
+
+            kwargs = mock_generate.call_args.kwargs
+            assert kwargs['contents'] == ['a cat']
+            assert kwargs['config'].system_instruction == 'Minecraft style'
@@ -1,7 +1,9 @@
 """Tests for demo script."""
 
 import importlib.util
+import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from types import ModuleType
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -92,45 +94,6 @@ class TestDemoUtilities:
         assert nested_dir.exists()
         assert result == nested_dir
 
-    def test_mock_image_path_format(
-        self,
-        demo_module: ModuleType,
-        tmp_path: Path,
-    ) -> None:
-        """Test mock_image_path generates correct format."""
-        output_dir = tmp_path
-
-        result = demo_module.mock_image_path(output_dir)
-
-        assert result.parent == output_dir
-        assert result.name.startswith('nano-banana-')
-        assert result.suffix == '.png'
-
-    def test_mock_image_path_custom_suffix(
-        self,
-        demo_module: ModuleType,
-        tmp_path: Path,
-    ) -> None:
-        """Test mock_image_path with custom suffix."""
-        output_dir = tmp_path
-
-        result = demo_module.mock_image_path(output_dir, suffix='jpg')
-
-        assert result.suffix == '.jpg'
-
-    def test_mock_image_path_unique(
-        self,
-        demo_module: ModuleType,
-        tmp_path: Path,
-    ) -> None:
-        """Test mock_image_path generates unique paths."""
-        output_dir = tmp_path
-
-        path1 = demo_module.mock_image_path(output_dir)
-        path2 = demo_module.mock_image_path(output_dir)
-
-        assert path1 != path2
-
 
 class TestDemoMain:
     """Test demo main function."""
@@ -164,7 +127,7 @@ class TestDemoMain:
             # Setup mocks
             mock_client = MagicMock()
             mock_client.generate = AsyncMock(
-                return_value=('Generated text', sample_image),
+                return_value=('Generated text', [sample_image]),
             )
             mock_client_class.return_value = mock_client
 
@@ -178,10 +141,6 @@ class TestDemoMain:
                     'nano_banana.api.demo.demo.ensure_output_dir',
                     return_value=mock_output_dir,
                 ),
-                patch(
-                    'nano_banana.api.demo.demo.mock_image_path',
-                    return_value=mock_output_dir / 'test.png',
-                ),
             ):
                 await demo_module.amain()
 
@@ -189,6 +148,7 @@ class TestDemoMain:
                 call_kwargs = mock_client.generate.call_args.kwargs
                 assert call_kwargs['prompt'] == 'A beautiful sunset'
                 assert call_kwargs['images'] == []
+                assert len(list(mock_output_dir.glob('*/*.png'))) == 1
 
     @pytest.mark.asyncio
     async def test_main_image_transformation(
@@ -221,7 +181,7 @@ class TestDemoMain:
         ):
             mock_client = MagicMock()
             mock_client.generate = AsyncMock(
-                return_value=('Transformed', sample_image),
+                return_value=('Transformed', [sample_image]),
             )
             mock_client_class.return_value = mock_client
 
@@ -234,10 +194,6 @@ class TestDemoMain:
                     'nano_banana.api.demo.demo.ensure_output_dir',
                     return_value=mock_output_dir,
                 ),
-                patch(
-                    'nano_banana.api.demo.demo.mock_image_path',
-                    return_value=mock_output_dir / 'test.png',
-                ),
             ):
                 await demo_module.amain()
 
@@ -283,7 +239,7 @@ class TestDemoMain:
         ):
             mock_client = MagicMock()
             mock_client.generate = AsyncMock(
-                return_value=('Combined', sample_image),
+                return_value=('Combined', [sample_image]),
             )
             mock_client_class.return_value = mock_client
 
@@ -296,10 +252,6 @@ class TestDemoMain:
                     'nano_banana.api.demo.demo.ensure_output_dir',
                     return_value=mock_output_dir,
                 ),
-                patch(
-                    'nano_banana.api.demo.demo.mock_image_path',
-                    return_value=mock_output_dir / 'test.png',
-                ),
             ):
                 await demo_module.amain()
 
@@ -336,7 +288,7 @@ class TestDemoMain:
         ):
             mock_client = MagicMock()
             mock_client.generate = AsyncMock(
-                return_value=('Text', sample_image),
+                return_value=('Text', [sample_image]),
             )
             mock_client_class.return_value = mock_client
 
@@ -350,17 +302,13 @@ class TestDemoMain:
                     return_value=mock_output_dir,
                 ),
                 patch(
-                    'nano_banana.api.demo.demo.mock_image_path',
-                    return_value=mock_output_dir / 'test.png',
-                ),
-                patch(
-                    'nano_banana.api.demo.demo.Settings',
-                ) as mock_settings_class,
+                    'nano_banana.api.demo.demo.get_settings',
+                ) as mock_get_settings,
             ):
                 mock_settings = MagicMock()
                 mock_settings.GOOGLE_API_KEY = ''
                 mock_settings.MODEL_NAME = 'test-model'
-                mock_settings_class.return_value = mock_settings
+                mock_get_settings.return_value = mock_settings
 
                 await demo_module.amain()
 
@@ -392,12 +340,12 @@ class TestDemoMain:
                 test_args,
             ),
             patch(
-                'nano_banana.api.demo.demo.Settings',
-            ) as mock_settings_class,
+                'nano_banana.api.demo.demo.get_settings',
+            ) as mock_get_settings,
         ):
             mock_settings = MagicMock()
             mock_settings.GOOGLE_API_KEY = ''
-            mock_settings_class.return_value = mock_settings
+            mock_get_settings.return_value = mock_settings
 
             with pytest.raises(ValueError, match='API key is required'):
                 await demo_module.amain()
@@ -423,7 +371,7 @@ class TestDemoMain:
         ):
             mock_client = MagicMock()
             mock_client.generate = AsyncMock(
-                return_value=('Response', sample_image),
+                return_value=('Response', [sample_image]),
             )
             mock_client_class.return_value = mock_client
 
@@ -436,13 +384,71 @@ class TestDemoMain:
                     'nano_banana.api.demo.demo.ensure_output_dir',
                     return_value=mock_output_dir,
                 ),
-                patch(
-                    'nano_banana.api.demo.demo.mock_image_path',
-                    return_value=mock_output_dir / 'test.png',
-                ),
             ):
                 await demo_module.amain()
 
                 # Verify generate was called with empty prompt
                 call_kwargs = mock_client.generate.call_args.kwargs
                 assert call_kwargs['prompt'] == ''
+
+
+class TestDemoEntryPoint:
+    """Test the nano_banana_cli entry point."""
+
+    def test_main_dispatches_bench(self, demo_module: ModuleType) -> None:
+        """Test ``bench`` runs the benchmark with the remaining arguments."""
+        with (
+            patch('sys.argv', ['nano_banana_cli', 'bench', '--fake']),
+            patch.object(demo_module, 'configure_logging'),
+            patch.object(
+                demo_module.asyncio,
+                'run',
+                side_effect=lambda coro: coro.close(),
+            ),
+            patch.object(
+                demo_module.bench,
+                'amain',
+                new_callable=AsyncMock,
+            ) as mock_bench,
+            patch.object(
+                demo_module,
+                'amain',
+                new_callable=AsyncMock,
+            ) as mock_amain,
+        ):
+            demo_module.main()
+
+        mock_bench.assert_called_once_with(['--fake'])
+        mock_amain.assert_not_called()
+
+    def test_offline_bench_needs_no_api_key(
+        self,
+        demo_module: ModuleType,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test ``bench --fake`` runs with the Gemini backend and no key."""
+        monkeypatch.setenv('BACKEND', 'gemini')
+        monkeypatch.setenv('GOOGLE_API_KEY', '')
+
+        argv = [
+            'bench',
+            '--fake',
+            '-n',
+            '2',
+            '--fake-latency',
+            '0',
+            '--fake-size',
+            '8',
+            '--format',
+            'json',
+        ]
+
+        # main() calls asyncio.run, kept off this thread's event loop.
+        with (
+            patch.object(demo_module, 'configure_logging'),
+            ThreadPoolExecutor(max_workers=1) as pool,
+        ):
+            pool.submit(demo_module.main, argv).result()
+
+        assert json.loads(capsys.readouterr().out)['succeeded'] == 2
@@ -0,0 +1,136 @@
+"""Tests for the Files API upload cache."""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+from nano_banana.api.files import FakeFileService, FileUploadCache
+from nano_banana.api.keypool import PooledKey
+from nano_banana.core.metrics import metrics
+
+
+def _key(label: str = 'key-0001') -> PooledKey:
+    return PooledKey(api_key=label, client=MagicMock())
+
+
+class TestFileUploadCache:
+    """Test FileUploadCache upload and reuse."""
+
+    @pytest.mark.asyncio
+    async def test_keys_sharing_a_suffix_keep_own_handles(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test handles are cached per key, not per key label."""
+        service = FakeFileService()
+        cache = FileUploadCache(service=service, min_uses=1)
+        first, second = _key('alpha-0001'), _key('bravo-0001')
+        assert first.label == second.label
+
+        await cache.part_for(sample_image, first)
+        await cache.part_for(sample_image, second)
+
+        assert len(service.uploads) == 2
+
+    @pytest.mark.asyncio
+    async def test_inline_until_reused(self, sample_image: Image.Image) -> None:
+        """Test images are sent inline until they reach min_uses."""
+        service = FakeFileService()
+        cache = FileUploadCache(service=service, min_uses=2)
+
+        assert await cache.part_for(sample_image, _key()) is None
+        part = await cache.part_for(sample_image, _key())
+
+        assert part is not None
+        assert part.file_data.mime_type == 'image/png'
+        assert len(service.uploads) == 1
+
+    @pytest.mark.asyncio
+    async def test_handle_reused(self, sample_image: Image.Image) -> None:
+        """Test a valid handle is reused without uploading again."""
+        metrics.reset()
+        service = FakeFileService()
+        cache = FileUploadCache(service=service, min_uses=1)
+
+        first = await cache.part_for(sample_image, _key())
+        second = await cache.part_for(sample_image, _key())
+
+        assert first == second
+        assert len(service.uploads) == 1
+        assert metrics.counter('files.lookups', result='hit') == 1
+
+    @pytest.mark.asyncio
+    async def test_rescaled_copy_gets_own_upload(self) -> None:
+        """Test only identical pixels share a handle, not look-alikes."""
+        service = FakeFileService()
+        cache = FileUploadCache(service=service, min_uses=1)
+        image = Image.effect_noise((64, 64), 64).convert('RGB')
+
+        first = await cache.part_for(image, _key())
+        second = await cache.part_for(image.resize((128, 128)), _key())
+
+        assert first != second
+        assert len(service.uploads) == 2
+
+    @pytest.mark.asyncio
+    async def test_reupload_near_expiry(
+        self, sample_image: Image.Image
+    ) -> None:
+        """Test handles close to expiry are uploaded again."""
+        service = FakeFileService(ttl=60)
+        cache = FileUploadCache(
+            service=service,
+            min_uses=1,
+            refresh_margin=120,
+        )
+
+        await cache.part_for(sample_image, _key())
+        await cache.part_for(sample_image, _key())
+
+        assert len(service.uploads) == 2
+
+    @pytest.mark.asyncio
+    async def test_handles_scoped_per_key(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test each API key gets its own upload."""
+        service = FakeFileService()
+        cache = FileUploadCache(service=service, min_uses=1)
+
+        await cache.part_for(sample_image, _key('key-aaaa'))
+        await cache.part_for(sample_image, _key('key-bbbb'))
+
+        assert len(service.uploads) == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_uploads_shared(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test concurrent requests for one image share a single upload."""
+        service = FakeFileService()
+        cache = FileUploadCache(service=service, min_uses=1)
+        key = _key()
+
+        parts = await asyncio.gather(
+            cache.part_for(sample_image, key),
+            cache.part_for(sample_image, key),
+        )
+
+        assert parts[0] == parts[1]
+        assert len(service.uploads) == 1
+
+    @pytest.mark.asyncio
+    async def test_upload_failure_falls_back_inline(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test a failed upload sends the image inline."""
+        service = FakeFileService()
+        service.upload = MagicMock(side_effect=RuntimeError('down'))
+        cache = FileUploadCache(service=service, min_uses=1)
+
+        assert await cache.part_for(sample_image, _key()) is None
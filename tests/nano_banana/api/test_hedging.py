@@ -0,0 +1,121 @@
+"""Tests for hedged requests."""
+
+import asyncio
+
+import pytest
+
+from nano_banana.api.hedging import HedgePolicy, Hedger
+from nano_banana.core.metrics import metrics
+
+POLICY = HedgePolicy(percentile=50, budget_ratio=1.0, min_delay=0.01)
+
+
+def _warm(hedger: Hedger, latency: float = 0.01) -> None:
+    for _ in range(hedger.policy.min_samples):
+        hedger.latency.add(latency)
+    hedger.requests = hedger.policy.min_samples
+
+
+class TestHedger:
+    """Test Hedger racing and budgeting."""
+
+    def test_no_delay_while_warming_up(self) -> None:
+        """Test hedging stays off until enough latency samples exist."""
+        assert Hedger(POLICY).delay() is None
+
+    def test_delay_respects_minimum(self) -> None:
+        """Test the hedge delay never drops below min_delay."""
+        hedger = Hedger(HedgePolicy(min_delay=1.0))
+        _warm(hedger, latency=0.1)
+
+        assert hedger.delay() == 1.0
+
+    @pytest.mark.asyncio
+    async def test_fast_call_not_hedged(self) -> None:
+        """Test a call finishing before the delay is not duplicated."""
+        hedger = Hedger(POLICY)
+        _warm(hedger, latency=1.0)
+        calls = 0
+
+        async def call() -> str:
+            nonlocal calls
+            calls += 1
+            return 'ok'
+
+        assert await hedger.run(call) == 'ok'
+        assert calls == 1
+        assert hedger.hedges == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_call_hedged_and_cancelled(self) -> None:
+        """Test a stuck primary is hedged and the loser is cancelled."""
+        metrics.reset()
+        hedger = Hedger(POLICY, name='m')
+        _warm(hedger)
+        cancelled = asyncio.Event()
+        calls = 0
+
+        async def call() -> str:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+            return f'call-{calls}'
+
+        assert await hedger.run(call) == 'call-2'
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert hedger.hedges == 1
+        assert metrics.counter('hedge.issued', model='m') == 1
+        assert metrics.counter('hedge.wins', model='m', winner='hedge') == 1
+
+    @pytest.mark.asyncio
+    async def test_budget_caps_hedges(self) -> None:
+        """Test no hedge is sent once the budget is spent."""
+        hedger = Hedger(
+            HedgePolicy(percentile=50, budget_ratio=0.0, min_delay=0.01),
+        )
+        _warm(hedger)
+        calls = 0
+
+        async def call() -> str:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return 'ok'
+
+        assert await hedger.run(call) == 'ok'
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_hedge_falls_back_to_primary(self) -> None:
+        """Test a failing hedge does not mask a successful primary."""
+        hedger = Hedger(POLICY)
+        _warm(hedger)
+        calls = 0
+
+        async def call() -> str:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await asyncio.sleep(0.05)
+                return 'primary'
+            msg = 'hedge failed'
+            raise RuntimeError(msg)
+
+        assert await hedger.run(call) == 'primary'
+
+    @pytest.mark.asyncio
+    async def test_all_failures_raise(self) -> None:
+        """Test the error surfaces when no call succeeds."""
+        hedger = Hedger(POLICY)
+
+        async def call() -> str:
+            msg = 'boom'
+            raise RuntimeError(msg)
+
+        with pytest.raises(RuntimeError, match='boom'):
+            await hedger.run(call)
@@ -0,0 +1,136 @@
+"""Tests for the API key pool."""
+
+import pytest
+from google.genai import errors
+
+from nano_banana.api.backends import GeminiBackend, ImageBackend, LocalBackend
+from nano_banana.api.keypool import KeyPool
+from nano_banana.core.metrics import metrics
+
+
+class TestKeyPool:
+    """Test KeyPool balancing and rotation."""
+
+    def test_requires_keys(self) -> None:
+        """Test an empty pool is rejected."""
+        with pytest.raises(ValueError, match='At least one API key'):
+            KeyPool([])
+
+    def test_deduplicates_keys(self) -> None:
+        """Test repeated keys share one pool entry."""
+        pool = KeyPool(['key-1', 'key-2', 'key-1'])
+
+        assert [key.api_key for key in pool.keys] == ['key-1', 'key-2']
+
+    def test_keys_default_to_gemini(self) -> None:
+        """Test each key calls Gemini through its own client."""
+        pool = KeyPool(['key-1'])
+
+        key = pool.keys[0]
+
+        assert isinstance(key.backend, GeminiBackend)
+        assert key.backend.client is key.client
+
+    def test_intercept_replaces_backend(self) -> None:
+        """Test intercepted keys route model calls through the wrapper."""
+        pool = KeyPool(['key-1', 'key-2'])
+        originals = [key.backend for key in pool.keys]
+        wrappers = []
+
+        def wrap(backend: ImageBackend) -> ImageBackend:
+            wrappers.append(backend)
+            return LocalBackend()
+
+        pool.intercept(wrap)
+
+        assert wrappers == originals
+        assert all(isinstance(key.backend, LocalBackend) for key in pool.keys)
+        assert pool.keys[0].client.files is not None
+
+    @pytest.mark.asyncio
+    async def test_least_outstanding(self) -> None:
+        """Test a busy key is skipped in favour of an idle one."""
+        pool = KeyPool(['key-1', 'key-2'])
+
+        async with pool.lease() as first:
+            second = pool.pick()
+
+        assert first is not second
+        assert first.outstanding == 0
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_key_benched(self) -> None:
+        """Test a 429 takes the key out of rotation."""
+        pool = KeyPool(['key-1', 'key-2'])
+
+        with pytest.raises(errors.APIError):
+            async with pool.lease() as key:
+                raise errors.ClientError(429, {})
+
+        assert key not in pool.available()
+        assert pool.pick() is not key
+
+    @pytest.mark.asyncio
+    async def test_auth_error_benched(self) -> None:
+        """Test an auth error takes the key out of rotation."""
+        pool = KeyPool(['key-1'])
+
+        with pytest.raises(errors.APIError):
+            async with pool.lease():
+                raise errors.ClientError(403, {})
+
+        with pytest.raises(RuntimeError, match='cooling down'):
+            pool.pick()
+
+    @pytest.mark.asyncio
+    async def test_server_error_not_benched(self) -> None:
+        """Test a server error keeps the key in rotation."""
+        pool = KeyPool(['key-1'])
+
+        with pytest.raises(errors.APIError):
+            async with pool.lease():
+                raise errors.ServerError(500, {})
+
+        assert len(pool.available()) == 1
+
+    @pytest.mark.asyncio
+    async def test_per_key_metrics(self) -> None:
+        """Test requests and errors are recorded per key."""
+        metrics.reset()
+        pool = KeyPool(['key-1234'])
+
+        async with pool.lease():
+            pass
+        with pytest.raises(errors.APIError):
+            async with pool.lease():
+                raise errors.ClientError(429, {})
+
+        key = pool.keys[0].metric_id
+        assert metrics.counter('keypool.requests', key=key) == 2
+        assert metrics.counter('keypool.errors', key=key, code=429) == 1
+        assert len(metrics.histogram('keypool.latency', key=key)) == 2
+
+    @pytest.mark.asyncio
+    async def test_keys_sharing_a_suffix_keep_their_metrics(self) -> None:
+        """Test metrics of keys that end alike are not merged."""
+        metrics.reset()
+        pool = KeyPool(['first-1234', 'second-1234'])
+        first, second = pool.keys
+
+        async with pool.lease(), pool.lease():
+            outstanding = [
+                metrics.gauge('keypool.outstanding', key=key.metric_id)
+                for key in pool.keys
+            ]
+
+        assert first.label == second.label
+        assert first.metric_id != second.metric_id
+        assert outstanding == [1, 1]
+        assert metrics.counter('keypool.requests', key=first.metric_id) == 1
+
+    def test_should_rotate(self) -> None:
+        """Test only quota and auth errors trigger rotation."""
+        assert KeyPool.should_rotate(errors.ClientError(429, {}))
+        assert KeyPool.should_rotate(errors.ClientError(401, {}))
+        assert not KeyPool.should_rotate(errors.ServerError(503, {}))
+        assert not KeyPool.should_rotate(ValueError('nope'))
@@ -0,0 +1,95 @@
+"""Tests for system prompt context caching."""
+
+import time
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from nano_banana.api.keypool import PooledKey
+from nano_banana.api.prompt_cache import SystemPromptCache
+from nano_banana.core.metrics import metrics
+
+LONG_PROMPT = 'Always draw in Minecraft style. ' * 10
+
+
+def _cached(name: str, expires_in: float) -> MagicMock:
+    cached = MagicMock()
+    cached.name = name
+    cached.expire_time = datetime.fromtimestamp(time.time() + expires_in, UTC)
+    return cached
+
+
+@pytest.fixture
+def key() -> PooledKey:
+    """Pooled key with a mocked caches API."""
+    client = MagicMock()
+    client.aio.caches.create = AsyncMock(
+        return_value=_cached('cachedContents/1', 3600),
+    )
+    client.aio.caches.update = AsyncMock(
+        return_value=_cached('cachedContents/1', 3600),
+    )
+    return PooledKey(api_key='key-0001', client=client)
+
+
+class TestSystemPromptCache:
+    """Test SystemPromptCache create, hit and refresh."""
+
+    @pytest.mark.asyncio
+    async def test_short_prompt_not_cached(self, key: PooledKey) -> None:
+        """Test short prompts are sent as a plain system instruction."""
+        cache = SystemPromptCache(min_chars=1000)
+
+        config = await cache.config_for('short', key, 'model')
+
+        assert config.system_instruction == 'short'
+        assert config.cached_content is None
+        key.client.aio.caches.create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_long_prompt_cached_once(self, key: PooledKey) -> None:
+        """Test a long prompt is cached once and then reused."""
+        metrics.reset()
+        cache = SystemPromptCache(min_chars=10)
+
+        first = await cache.config_for(LONG_PROMPT, key, 'model')
+        second = await cache.config_for(LONG_PROMPT, key, 'model')
+
+        assert first.cached_content == 'cachedContents/1'
+        assert second.cached_content == 'cachedContents/1'
+        assert first.system_instruction is None
+        key.client.aio.caches.create.assert_called_once()
+        assert metrics.counter('prompt_cache.events', event='create') == 1
+        assert metrics.counter('prompt_cache.hit', model='model') == 1
+        assert metrics.counter('prompt_cache.miss', model='model') == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_before_expiry(self, key: PooledKey) -> None:
+        """Test a cache close to expiry gets its TTL extended."""
+        key.client.aio.caches.create.return_value = _cached(
+            'cachedContents/1',
+            60,
+        )
+        cache = SystemPromptCache(min_chars=10, refresh_margin=120)
+
+        await cache.config_for(LONG_PROMPT, key, 'model')
+        config = await cache.config_for(LONG_PROMPT, key, 'model')
+
+        assert config.cached_content == 'cachedContents/1'
+        key.client.aio.caches.update.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_failure_falls_back(self, key: PooledKey) -> None:
+        """Test caching errors fall back and are not retried at once."""
+        metrics.reset()
+        key.client.aio.caches.create.side_effect = RuntimeError('no cache')
+        cache = SystemPromptCache(min_chars=10)
+
+        config = await cache.config_for(LONG_PROMPT, key, 'model')
+        await cache.config_for(LONG_PROMPT, key, 'model')
+
+        assert config.system_instruction == LONG_PROMPT
+        assert config.cached_content is None
+        key.client.aio.caches.create.assert_called_once()
+        assert metrics.counter('prompt_cache.miss', model='model') == 2
@@ -0,0 +1,133 @@
+"""Tests for the model router."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from PIL import Image
+
+from nano_banana.api.router import ModelHealth, ModelRouter, RoutingPolicy
+from nano_banana.core.metrics import metrics
+
+FAST = 'gemini-2.5-flash-image'
+PRO = 'gemini-3-pro-image-preview'
+
+
+@pytest.fixture
+def mock_client(sample_image: Image.Image) -> MagicMock:
+    """Mock NanoBananaClient."""
+    client = MagicMock()
+    client.generate = AsyncMock(return_value=('ok', [sample_image]))
+    return client
+
+
+class TestModelHealth:
+    """Test ModelHealth thresholds."""
+
+    def test_healthy_without_enough_samples(self) -> None:
+        """Test a model is healthy until there is enough evidence."""
+        health = ModelHealth(window_seconds=60)
+        policy = RoutingPolicy(min_samples=3)
+        health.record(ok=False, latency=1.0)
+
+        assert health.is_healthy(policy)
+
+    def test_unhealthy_on_error_rate(self) -> None:
+        """Test a high error rate marks the model unhealthy."""
+        health = ModelHealth(window_seconds=60)
+        policy = RoutingPolicy(min_samples=2, max_error_rate=0.5)
+        for ok in (False, False, True):
+            health.record(ok=ok, latency=1.0)
+
+        assert health.error_rate == pytest.approx(2 / 3)
+        assert not health.is_healthy(policy)
+
+    def test_unhealthy_on_latency(self) -> None:
+        """Test a slow p95 marks the model unhealthy."""
+        health = ModelHealth(window_seconds=60)
+        policy = RoutingPolicy(min_samples=2, max_p95_seconds=5.0)
+        for latency in (1.0, 10.0):
+            health.record(ok=True, latency=latency)
+
+        assert health.p95 == 10.0
+        assert not health.is_healthy(policy)
+
+
+class TestModelRouter:
+    """Test ModelRouter decisions."""
+
+    def test_text_only_uses_fast_model(self, mock_client: MagicMock) -> None:
+        """Test text-only prompts go to the fast model."""
+        router = ModelRouter(mock_client)
+
+        assert router.choose(0) == (FAST, 'text')
+
+    def test_many_images_use_pro_model(self, mock_client: MagicMock) -> None:
+        """Test prompts with many images go to the pro model."""
+        router = ModelRouter(mock_client, RoutingPolicy(pro_min_images=2))
+
+        assert router.choose(2) == (PRO, 'images')
+
+    def test_over_capacity_forces_pro(self, mock_client: MagicMock) -> None:
+        """Test the fast model is skipped when it cannot take the images."""
+        router = ModelRouter(mock_client, RoutingPolicy(pro_min_images=10))
+
+        assert router.choose(5) == (PRO, 'capacity')
+
+    def test_fallback_when_unhealthy(self, mock_client: MagicMock) -> None:
+        """Test an unhealthy preferred model falls back to the other one."""
+        router = ModelRouter(mock_client, RoutingPolicy(min_samples=1))
+        router.health[FAST].record(ok=False, latency=1.0)
+
+        assert router.choose(0) == (PRO, 'fallback')
+
+    def test_fallback_when_circuit_open(self, mock_client: MagicMock) -> None:
+        """Test an open circuit on one model sends requests to the other."""
+        mock_client.available.side_effect = lambda model: model != PRO
+        router = ModelRouter(mock_client, RoutingPolicy(pro_min_images=2))
+
+        assert router.choose(2) == (FAST, 'fallback')
+
+    def test_no_fallback_beyond_capacity(
+        self,
+        mock_client: MagicMock,
+    ) -> None:
+        """Test fallback never sends more images than a model accepts."""
+        router = ModelRouter(mock_client, RoutingPolicy(min_samples=1))
+        router.health[PRO].record(ok=False, latency=1.0)
+
+        assert router.choose(5) == (PRO, 'images')
+
+    @pytest.mark.asyncio
+    async def test_generate_passes_model(
+        self,
+        mock_client: MagicMock,
+    ) -> None:
+        """Test generate forwards the chosen model and records metrics."""
+        metrics.reset()
+        router = ModelRouter(mock_client)
+
+        await router.generate(prompt='a cat')
+
+        mock_client.generate.assert_called_once_with(
+            prompt='a cat',
+            images=None,
+            model_name=FAST,
+            session=None,
+            candidates=1,
+        )
+        assert metrics.counter('router.decisions', model=FAST, reason='text')
+        assert router.health[FAST].samples == 1
+
+    @pytest.mark.asyncio
+    async def test_generate_records_failure(
+        self,
+        mock_client: MagicMock,
+    ) -> None:
+        """Test failures count against the model's health."""
+        router = ModelRouter(mock_client)
+        mock_client.generate.side_effect = RuntimeError('boom')
+
+        with pytest.raises(RuntimeError):
+            await router.generate(prompt='a cat')
+
+        assert router.health[FAST].error_rate == 1.0
@@ -0,0 +1,87 @@
+"""Tests for the chat session store."""
+
+from google.genai import types
+
+from nano_banana.api.sessions import ChatSessionStore
+from nano_banana.core.metrics import metrics
+
+
+def _turn(role: str, text: str) -> types.Content:
+    return types.Content(role=role, parts=[types.Part.from_text(text=text)])
+
+
+class TestChatSessionStore:
+    """Test ChatSessionStore windows and eviction."""
+
+    def test_unknown_session_is_empty(self) -> None:
+        """Test a new session starts without history."""
+        assert ChatSessionStore().history('thread:1') == []
+
+    def test_history_window(self) -> None:
+        """Test only the last max_turns exchanges are kept."""
+        store = ChatSessionStore(max_turns=2)
+        for i in range(3):
+            store.append('s', _turn('user', f'u{i}'), _turn('model', f'm{i}'))
+
+        history = store.history('s')
+
+        assert [c.parts[0].text for c in history] == ['u1', 'm1', 'u2', 'm2']
+
+    def test_lru_session_limit(self) -> None:
+        """Test the least recently used session is evicted."""
+        store = ChatSessionStore(max_sessions=1)
+        store.append('a', _turn('user', 'a'), _turn('model', 'a'))
+        store.append('b', _turn('user', 'b'), _turn('model', 'b'))
+
+        assert store.history('a') == []
+        assert len(store.history('b')) == 2
+
+    def test_memory_cap(self) -> None:
+        """Test sessions are evicted to stay within max_bytes."""
+        store = ChatSessionStore(max_bytes=10)
+        store.append('a', _turn('user', 'aaaa'), _turn('model', 'aaaa'))
+        store.append('b', _turn('user', 'bbbb'), _turn('model', 'bbbb'))
+
+        assert store.history('a') == []
+        assert store.nbytes == 8
+
+    def test_history_trimmed_to_memory_cap(self) -> None:
+        """Test a growing history drops its oldest exchanges to fit."""
+        metrics.reset()
+        store = ChatSessionStore(max_bytes=10)
+        store.append('a', _turn('user', 'aa'), _turn('model', 'aa'))
+        store.append('a', _turn('user', 'bbbb'), _turn('model', 'bbbb'))
+
+        history = store.history('a')
+
+        assert [c.parts[0].text for c in history] == ['bbbb', 'bbbb']
+        assert metrics.counter('sessions.trimmed') == 1
+
+    def test_oversized_exchange_ends_session(self) -> None:
+        """Test an exchange over the cap drops the stale history with it."""
+        metrics.reset()
+        store = ChatSessionStore(max_bytes=10)
+        store.append('a', _turn('user', 'aa'), _turn('model', 'aa'))
+        store.append('a', _turn('user', 'a' * 8), _turn('model', 'a' * 8))
+
+        assert store.history('a') == []
+        assert store.nbytes == 0
+        assert metrics.counter('sessions.dropped') == 1
+
+    def test_outputs_follow_window(self) -> None:
+        """Test output keys are forgotten with the exchange carrying them."""
+        store = ChatSessionStore(max_turns=1)
+        store.append('s', _turn('user', 'u0'), _turn('model', 'm0'), ['k0'])
+        assert store.outputs('s') == {'k0'}
+
+        store.append('s', _turn('user', 'u1'), _turn('model', 'm1'), ['k1'])
+
+        assert store.outputs('s') == {'k1'}
+
+    def test_reset(self) -> None:
+        """Test a session can be dropped explicitly."""
+        store = ChatSessionStore()
+        store.append('a', _turn('user', 'a'), _turn('model', 'a'))
+        store.reset('a')
+
+        assert len(store) == 0
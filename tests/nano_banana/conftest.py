@@ -17,6 +17,7 @@ def mock_env_vars(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv('LOG_LEVEL', 'INFO')
     monkeypatch.setenv('MODEL_NAME', 'gemini-2.5-flash-image')
     monkeypatch.setenv('SYSTEM_PROMPT', 'Test prompt')
+    monkeypatch.setenv('JOURNAL_PATH', ':memory:')
 
 
 @pytest.fixture
@@ -62,6 +63,7 @@ def mock_discord_context() -> MagicMock:
 def mock_discord_message() -> MagicMock:
     """Mock Discord message."""
     mock_msg = MagicMock()
+    mock_msg.id = 1001
     mock_msg.author = MagicMock()
     mock_msg.author.bot = False
     mock_msg.author.name = 'test_user'
@@ -70,4 +72,5 @@ def mock_discord_message() -> MagicMock:
     mock_msg.guild = MagicMock()
     mock_msg.guild.id = 123456789
     mock_msg.channel = MagicMock()
+    mock_msg.channel.id = 2002
     return mock_msg
@@ -0,0 +1,158 @@
+"""Tests for admission control and load shedding."""
+
+import asyncio
+
+import pytest
+
+from nano_banana.core.admission import (
+    AdmissionController,
+    AdmissionPolicy,
+    Priority,
+)
+from nano_banana.core.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics() -> None:
+    metrics.reset()
+
+
+class TestAdmissionController:
+    """Test queueing, shedding and priorities."""
+
+    @pytest.mark.asyncio
+    async def test_runs_up_to_concurrency(self) -> None:
+        """Test tickets run immediately while slots are free."""
+        controller = AdmissionController(AdmissionPolicy(max_concurrent=2))
+
+        async with controller.admit(), controller.admit():
+            assert controller.running == 2
+            assert controller.queued == 0
+
+        assert controller.running == 0
+
+    def test_sheds_when_queue_full(self) -> None:
+        """Test passive requests are shed past the queue limit."""
+        controller = AdmissionController(
+            AdmissionPolicy(max_queue=2, max_wait_seconds=1e9),
+        )
+        controller.admit()
+        controller.admit()
+
+        assert controller.admit() is None
+        assert (
+            metrics.counter(
+                'admission.shed',
+                reason='queue',
+                priority='passive',
+            )
+            == 1
+        )
+
+    def test_commands_use_reserve(self) -> None:
+        """Test commands still get in when passive messages are shed."""
+        controller = AdmissionController(
+            AdmissionPolicy(
+                max_queue=1,
+                command_reserve=1,
+                max_wait_seconds=1e9,
+            ),
+        )
+        controller.admit()
+
+        assert controller.admit(Priority.PASSIVE) is None
+        assert controller.admit(Priority.COMMAND) is not None
+
+    @pytest.mark.asyncio
+    async def test_sheds_on_estimated_wait(self) -> None:
+        """Test requests are shed once the estimated wait is too long."""
+        controller = AdmissionController(
+            AdmissionPolicy(
+                max_concurrent=1,
+                max_wait_seconds=10,
+                default_service_seconds=30,
+            ),
+        )
+
+        async with controller.admit():
+            assert controller.estimated_wait() == 30
+            assert controller.rejects() == 'wait'
+
+    @pytest.mark.asyncio
+    async def test_commands_served_first(self) -> None:
+        """Test a queued command gets the next slot before messages."""
+        controller = AdmissionController(
+            AdmissionPolicy(max_concurrent=1, max_wait_seconds=1e9),
+        )
+        order: list[str] = []
+
+        async def job(name: str, priority: Priority) -> None:
+            async with controller.reserve(priority):
+                order.append(name)
+
+        async with controller.admit():
+            passive = asyncio.create_task(job('passive', Priority.PASSIVE))
+            await asyncio.sleep(0)
+            command = asyncio.create_task(job('command', Priority.COMMAND))
+            await asyncio.sleep(0)
+        await asyncio.gather(passive, command)
+
+        assert order == ['command', 'passive']
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_frees_place(self) -> None:
+        """Test cancelling a queued request gives back its place."""
+        controller = AdmissionController(AdmissionPolicy(max_concurrent=1))
+
+        async def job() -> None:
+            async with controller.reserve():
+                await asyncio.sleep(10)
+
+        async with controller.admit():
+            waiter = asyncio.create_task(job())
+            await asyncio.sleep(0)
+            assert controller.queued == 1
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+
+        assert (controller.running, controller.queued) == (0, 0)
+
+    def test_unused_ticket_released(self) -> None:
+        """Test a ticket that never ran returns its queue place."""
+        controller = AdmissionController()
+        ticket = controller.admit()
+        assert ticket is not None
+
+        ticket.release()
+        ticket.release()
+
+        assert controller.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_borrow_takes_only_free_slots(self) -> None:
+        """Test a fan-out is charged for its extra calls, up to capacity."""
+        controller = AdmissionController(AdmissionPolicy(max_concurrent=3))
+
+        async with controller.admit():
+            with controller.borrow(5) as taken:
+                assert taken == 2
+                assert controller.running == 3
+                assert controller.estimated_wait() > 0
+            assert controller.running == 1
+
+    @pytest.mark.asyncio
+    async def test_borrow_yields_to_waiters(self) -> None:
+        """Test no slots are lent while others queue for one."""
+        controller = AdmissionController(AdmissionPolicy(max_concurrent=1))
+        waiter = controller.reserve()
+
+        async with controller.admit():
+            task = asyncio.create_task(waiter.__aenter__())
+            await asyncio.sleep(0)
+            with controller.borrow(2) as taken:
+                assert taken == 0
+
+        await task
+        assert controller.running == 1
+        waiter.release()
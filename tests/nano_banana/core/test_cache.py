@@ -0,0 +1,70 @@
+"""Tests for the LRU cache."""
+
+from unittest.mock import patch
+
+from nano_banana.core.cache import LRUCache
+
+
+class TestLRUCache:
+    """Test LRUCache eviction policies."""
+
+    def test_get_missing(self) -> None:
+        """Test missing keys return None."""
+        assert LRUCache[str, int](maxsize=2).get('a') is None
+
+    def test_evicts_least_recently_used(self) -> None:
+        """Test the least recently used entry goes first."""
+        cache = LRUCache[str, int](maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_byte_budget(self) -> None:
+        """Test entries are evicted to stay within max_bytes."""
+        cache = LRUCache[str, bytes](maxsize=10, max_bytes=5, sizeof=len)
+        cache.put('a', b'abc')
+        cache.put('b', b'de')
+        cache.put('c', b'f')
+
+        assert cache.get('a') is None
+        assert cache.nbytes == 3
+
+    def test_oversized_entry_not_stored(self) -> None:
+        """Test a single entry larger than the budget is skipped."""
+        cache = LRUCache[str, bytes](maxsize=10, max_bytes=2, sizeof=len)
+        cache.put('a', b'abc')
+
+        assert len(cache) == 0
+
+    def test_oversized_replacement_drops_stale_value(self) -> None:
+        """Test a key is not left with its old value when the new is too big."""
+        cache = LRUCache[str, bytes](maxsize=10, max_bytes=2, sizeof=len)
+        cache.put('a', b'ab')
+        cache.put('a', b'abc')
+
+        assert cache.get('a') is None
+        assert cache.nbytes == 0
+
+    def test_ttl_expiry(self) -> None:
+        """Test entries older than the TTL are dropped."""
+        cache = LRUCache[str, int](maxsize=2, ttl=10)
+        with patch('nano_banana.core.cache.time.monotonic', return_value=0):
+            cache.put('a', 1)
+        with patch('nano_banana.core.cache.time.monotonic', return_value=11):
+            assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_replace_updates_size(self) -> None:
+        """Test replacing a key does not double count its size."""
+        cache = LRUCache[str, bytes](maxsize=10, max_bytes=10, sizeof=len)
+        cache.put('a', b'abcd')
+        cache.put('a', b'ab')
+
+        assert cache.nbytes == 2
+        assert cache.pop('a') == b'ab'
+        assert cache.nbytes == 0
@@ -1,10 +1,11 @@
 """Tests for configuration module."""
 
 import logging
+from unittest.mock import MagicMock
 
 import pytest
 
-from nano_banana.core.config import Settings
+from nano_banana.core.config import Settings, SettingsProvider
 
 
 class TestSettings:
@@ -119,9 +120,201 @@ class TestSettings:
 
         assert not hasattr(settings, 'EXTRA_VAR')
 
+    def test_settings_google_api_keys(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test GOOGLE_API_KEYS extends the primary key without duplicates."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'key-1')
+        monkeypatch.setenv('GOOGLE_API_KEYS', 'key-2, key-1,,key-3')
+
+        settings = Settings()
+
+        assert settings.google_api_keys == ['key-1', 'key-2', 'key-3']
+
+    def test_settings_router_raises_image_limit(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test routing allows as many images as the largest routed model."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        monkeypatch.setenv('MODEL_NAME', 'gemini-2.5-flash-image')
+        monkeypatch.setenv('ROUTER_ENABLED', 'true')
+
+        settings = Settings()
+
+        assert settings.MAX_IMAGE_PER_REQUEST == 14
+
+    def test_settings_router_unsupported_model(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test routing to an unknown model is rejected."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        monkeypatch.setenv('ROUTER_ENABLED', 'true')
+        monkeypatch.setenv('ROUTER_PRO_MODEL', 'unknown-model')
+
+        with pytest.raises(ValueError, match='Unsupported MODEL_NAME'):
+            Settings()
+
+    def test_settings_local_backend_needs_no_key(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test the local backend runs without GOOGLE_API_KEY."""
+        monkeypatch.setenv('GOOGLE_API_KEY', '')
+        monkeypatch.setenv('BACKEND', 'local')
+
+        settings = Settings()
+
+        assert settings.BACKEND == 'local'
+        assert settings.google_api_keys == ['']
+
+    def test_settings_unsupported_backend(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test an unknown backend is rejected."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        monkeypatch.setenv('BACKEND', 'dall-e')
+
+        with pytest.raises(ValueError, match='Unsupported BACKEND'):
+            Settings()
+
+    def test_settings_attachment_limits(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test per-model and per-guild attachment limits are parsed."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        monkeypatch.setenv(
+            'ATTACHMENT_MODEL_LIMITS',
+            '{"gemini-2.5-flash-image": {"max_side": 4096}}',
+        )
+        monkeypatch.setenv(
+            'ATTACHMENT_GUILD_LIMITS', '{"42": {"max_bytes": 1}}'
+        )
+
+        settings = Settings()
+
+        assert settings.ATTACHMENT_MODEL_LIMITS == {
+            'gemini-2.5-flash-image': {'max_side': 4096},
+        }
+        assert settings.ATTACHMENT_GUILD_LIMITS == {42: {'max_bytes': 1}}
+
+    def test_settings_unknown_attachment_limit(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test a misspelled attachment limit is rejected."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        monkeypatch.setenv('ATTACHMENT_GUILD_LIMITS', '{"42": {"max_mb": 1}}')
+
+        with pytest.raises(ValueError, match='Unsupported attachment limits'):
+            Settings()
+
+    def test_settings_unsupported_log_level(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test an unknown log level is rejected before it is applied."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        monkeypatch.setenv('LOG_LEVEL', 'VERBOSE')
+
+        with pytest.raises(ValueError, match='Unsupported LOG_LEVEL'):
+            Settings()
+
+    def test_settings_trigger_ids(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test trigger channel and role IDs are parsed from CSV."""
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        monkeypatch.setenv('TRIGGER_CHANNEL_IDS', '1, 2')
+        monkeypatch.setenv('TRIGGER_ROLE_IDS', '')
+
+        settings = Settings()
+
+        assert settings.trigger_channel_ids == frozenset({1, 2})
+        assert settings.trigger_role_ids == frozenset()
+
     def test_logging_configured(self) -> None:
         """Test that logging is properly configured."""
         logger = logging.getLogger(__name__)
 
         # Verify logger has handlers
         assert len(logger.handlers) > 0 or len(logging.getLogger().handlers) > 0
+
+
+class TestSettingsProvider:
+    """Test the cached settings provider."""
+
+    @pytest.mark.usefixtures('mock_env_vars')
+    def test_get_loads_once(self) -> None:
+        """Test settings are parsed once and then reused."""
+        factory = MagicMock(side_effect=Settings)
+        provider = SettingsProvider(factory)
+
+        first = provider.get()
+
+        assert provider.get() is first
+        factory.assert_called_once()
+
+    def test_reload_swaps_and_notifies(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        mock_env_vars: None,
+    ) -> None:
+        """Test a reload replaces the settings and calls subscribers."""
+        provider = SettingsProvider()
+        old = provider.get()
+        seen: list[Settings] = []
+        provider.subscribe(seen.append)
+        monkeypatch.setenv('SYSTEM_PROMPT', 'New prompt')
+
+        new = provider.reload()
+
+        assert provider.get() is new
+        assert new is not old
+        assert new.SYSTEM_PROMPT == 'New prompt'
+        assert seen == [new]
+
+    def test_invalid_reload_keeps_current(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        mock_env_vars: None,
+    ) -> None:
+        """Test settings that fail validation are not swapped in."""
+        provider = SettingsProvider()
+        old = provider.get()
+        callback = MagicMock()
+        provider.subscribe(callback)
+        monkeypatch.setenv('MODEL_NAME', 'unknown-model')
+
+        with pytest.raises(ValueError, match='Unsupported MODEL_NAME'):
+            provider.reload()
+
+        assert provider.get() is old
+        callback.assert_not_called()
+
+    def test_failing_subscriber_rolls_back(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        mock_env_vars: None,
+    ) -> None:
+        """Test a failing subscriber undoes the reload everywhere."""
+        provider = SettingsProvider()
+        old = provider.get()
+        seen: list[Settings] = []
+        later = MagicMock()
+        provider.subscribe(seen.append)
+        provider.subscribe(MagicMock(side_effect=RuntimeError('boom')))
+        provider.subscribe(later)
+        monkeypatch.setenv('SYSTEM_PROMPT', 'New prompt')
+
+        with pytest.raises(RuntimeError, match='boom'):
+            provider.reload()
+
+        assert provider.get() is old
+        assert [s.SYSTEM_PROMPT for s in seen] == ['New prompt', 'Test prompt']
+        later.assert_not_called()
@@ -0,0 +1,55 @@
+"""Tests for contact sheet compositing."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from nano_banana.core.contactsheet import contact_sheet
+
+
+def _solid(color: tuple[int, int, int], size: tuple[int, int]) -> Image.Image:
+    return Image.new('RGB', size, color)
+
+
+class TestContactSheet:
+    """Test laying images out in a grid."""
+
+    def test_square_grid_with_gaps(self) -> None:
+        """Test four images form a 2x2 grid separated by the gap."""
+        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (0, 0, 0)]
+        images = [_solid(color, (10, 6)) for color in colors]
+
+        sheet = np.asarray(contact_sheet(images, gap=2))
+
+        assert sheet.shape == (14, 22, 3)
+        assert tuple(sheet[0, 0]) == colors[0]
+        assert tuple(sheet[0, 12]) == colors[1]
+        assert tuple(sheet[8, 0]) == colors[2]
+        assert tuple(sheet[13, 21]) == colors[3]
+        assert tuple(sheet[6, 0]) == (255, 255, 255)
+
+    def test_missing_cells_are_background(self) -> None:
+        """Test an incomplete last row is filled with the background."""
+        images = [_solid((255, 0, 0), (4, 4))] * 3
+
+        sheet = np.asarray(
+            contact_sheet(images, gap=0, background=(9, 9, 9)),
+        )
+
+        assert sheet.shape == (8, 8, 3)
+        assert tuple(sheet[7, 7]) == (9, 9, 9)
+
+    def test_columns_and_letterboxing(self) -> None:
+        """Test one row is laid out and odd sizes are fitted to the cell."""
+        images = [_solid((255, 0, 0), (8, 8)), _solid((0, 255, 0), (4, 8))]
+
+        sheet = np.asarray(contact_sheet(images, columns=4, gap=0))
+
+        assert sheet.shape == (8, 16, 3)
+        assert tuple(sheet[4, 12]) == (0, 255, 0)
+        assert tuple(sheet[4, 8]) == (255, 255, 255)
+
+    def test_requires_images(self) -> None:
+        """Test an empty sheet is rejected."""
+        with pytest.raises(ValueError, match='At least one image'):
+            contact_sheet([])
@@ -0,0 +1,84 @@
+"""Tests for request deadlines and stage budgets."""
+
+import asyncio
+
+import pytest
+
+from nano_banana.core.deadline import (
+    DeadlineExceededError,
+    StageBudgets,
+    budget,
+    current_deadline,
+    deadline_scope,
+)
+from nano_banana.core.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics() -> None:
+    metrics.reset()
+
+
+class TestDeadline:
+    """Test deadline scopes and per-stage budgets."""
+
+    def test_scope_sets_and_restores_deadline(self) -> None:
+        """Test the deadline is only visible inside its scope."""
+        with deadline_scope() as deadline:
+            assert current_deadline() is deadline
+
+        assert current_deadline() is None
+
+    def test_stage_budget_capped_by_total(self) -> None:
+        """Test a stage never gets more time than the request has left."""
+        with deadline_scope(StageBudgets(total=5, generate=60)) as deadline:
+            assert deadline.budget_for('generate') <= 5
+            assert deadline.budget_for('fetch') <= 5
+
+    @pytest.mark.asyncio
+    async def test_budget_unbounded_outside_scope(self) -> None:
+        """Test stages run without a timeout when no deadline is set."""
+        async with budget('generate'):
+            await asyncio.sleep(0)
+
+    @pytest.mark.asyncio
+    async def test_budget_cancels_slow_stage(self) -> None:
+        """Test a stage over its budget is cancelled and reported."""
+        cancelled = False
+
+        async def hang() -> None:
+            nonlocal cancelled
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        with deadline_scope(StageBudgets(download=0.01)):
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                async with budget('download'):
+                    await hang()
+
+        assert exc_info.value.stage == 'download'
+        assert cancelled
+        assert metrics.counter('deadline.hits', stage='download') == 1
+
+    @pytest.mark.asyncio
+    async def test_budget_passes_other_timeouts_through(self) -> None:
+        """Test a TimeoutError raised by the work itself is not relabelled."""
+        with deadline_scope(), pytest.raises(TimeoutError) as exc_info:
+            async with budget('upload'):
+                raise TimeoutError
+
+        assert not isinstance(exc_info.value, DeadlineExceededError)
+        assert metrics.counter('deadline.hits', stage='upload') == 0
+
+    @pytest.mark.asyncio
+    async def test_spent_deadline_fails_next_stage(self) -> None:
+        """Test later stages share what is left of the total deadline."""
+        with deadline_scope(StageBudgets(total=0.02)):
+            await asyncio.sleep(0.03)
+
+            with pytest.raises(DeadlineExceededError):
+                async with budget('encode'):
+                    await asyncio.sleep(1)
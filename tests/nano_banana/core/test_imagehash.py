@@ -0,0 +1,135 @@
+"""Tests for exact and perceptual image hashing."""
+
+import io
+from collections.abc import Callable
+
+import numpy as np
+import pytest
+from PIL import Image, ImageEnhance, ImageOps
+
+from nano_banana.core.imagehash import (
+    content_key,
+    dedupe,
+    hamming,
+    phash,
+    phash_many,
+)
+from nano_banana.core.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics() -> None:
+    metrics.reset()
+
+
+def _noise_image(seed: int, size: int = 64) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(
+        rng.integers(0, 256, (size, size, 3), dtype=np.uint8),
+    )
+
+
+class TestContentKey:
+    """Test content hashing."""
+
+    def test_same_pixels_same_key(self) -> None:
+        """Test identical images hash the same."""
+        assert content_key(Image.new('RGB', (4, 4), 'red')) == content_key(
+            Image.new('RGB', (4, 4), 'red'),
+        )
+
+    def test_different_pixels_different_key(self) -> None:
+        """Test different images hash differently."""
+        assert content_key(Image.new('RGB', (4, 4), 'red')) != content_key(
+            Image.new('RGB', (4, 4), 'blue'),
+        )
+
+
+class TestPhash:
+    """Test hashing of single images and batches."""
+
+    def test_resized_copy_hashes_close(self) -> None:
+        """Test a rescaled copy keeps (almost) the same hash."""
+        image = _noise_image(0)
+
+        distance = hamming(phash(image), phash(image.resize((160, 160))))
+
+        assert distance <= 4
+
+    def test_different_images_hash_apart(self) -> None:
+        """Test unrelated images are far apart."""
+        distance = hamming(phash(_noise_image(0)), phash(_noise_image(1)))
+
+        assert distance > 10
+
+    def test_batch_matches_single(self) -> None:
+        """Test the vectorized batch agrees with per-image hashing."""
+        images = [_noise_image(seed) for seed in range(5)]
+
+        hashes = phash_many(images)
+
+        assert hashes.dtype == np.uint64
+        assert [int(h) for h in hashes] == [phash(img) for img in images]
+
+    def test_empty_batch(self) -> None:
+        """Test hashing no images returns an empty array."""
+        assert phash_many([]).shape == (0,)
+
+
+class TestDedupe:
+    """Test near-duplicate removal."""
+
+    def test_keeps_first_occurrence_in_order(self) -> None:
+        """Test duplicates are dropped and the order is preserved."""
+        a, b = _noise_image(0), _noise_image(1)
+        a_copy = a.resize((128, 128))
+
+        result = dedupe([a, b, a_copy, b])
+
+        assert result == [a, b]
+        assert metrics.counter('images.duplicates') == 2
+
+    def test_zero_distance_only_drops_exact_hashes(self) -> None:
+        """Test a threshold of zero still drops identical pictures."""
+        a = _noise_image(0)
+
+        result = dedupe([a, a.copy(), _noise_image(1)], max_distance=0)
+
+        assert len(result) == 2
+
+    def test_single_image_untouched(self) -> None:
+        """Test a single image is returned without hashing."""
+        image = _noise_image(0)
+
+        assert dedupe([image]) == [image]
+        assert metrics.counter('images.duplicates') == 0
+
+    def test_reencoded_copy_dropped(self) -> None:
+        """Test a JPEG re-encode of the same picture is a duplicate."""
+        a = _noise_image(0)
+        with io.BytesIO() as bio:
+            a.save(bio, format='JPEG', quality=80)
+            bio.seek(0)
+            jpeg = Image.open(bio)
+            jpeg.load()
+
+        assert dedupe([a, jpeg]) == [a]
+
+    @pytest.mark.parametrize(
+        'edit',
+        [
+            lambda img: ImageEnhance.Brightness(img).enhance(0.9),
+            lambda img: ImageOps.grayscale(img).convert('RGB'),
+            lambda img: Image.fromarray(np.asarray(img)[..., ::-1]),
+        ],
+        ids=['darkened', 'grayscale', 'recoloured'],
+    )
+    def test_deliberate_edits_kept(
+        self,
+        edit: Callable[[Image.Image], Image.Image],
+    ) -> None:
+        """Test edits the hash cannot see are kept apart from the source."""
+        a = _noise_image(0)
+        edited = edit(a)
+
+        assert dedupe([a, edited]) == [a, edited]
@@ -0,0 +1,52 @@
+"""Tests for in-flight job tracking and draining."""
+
+import asyncio
+
+import pytest
+
+from nano_banana.core.inflight import DrainReport, InFlightTracker
+
+
+async def _job(tracker: InFlightTracker, seconds: float) -> None:
+    with tracker.track():
+        await asyncio.sleep(seconds)
+
+
+class TestInFlightTracker:
+    """Test InFlightTracker bookkeeping."""
+
+    @pytest.mark.asyncio
+    async def test_tracks_running_jobs(self) -> None:
+        """Test jobs are counted while they run."""
+        tracker = InFlightTracker()
+        task = asyncio.create_task(_job(tracker, 0.01))
+        await asyncio.sleep(0)
+
+        assert len(tracker) == 1
+        await task
+        assert len(tracker) == 0
+
+    @pytest.mark.asyncio
+    async def test_drain_idle(self) -> None:
+        """Test draining with nothing running returns immediately."""
+        tracker = InFlightTracker()
+
+        report = await tracker.drain(deadline=1)
+
+        assert report == DrainReport(completed=0, abandoned=0)
+        assert not tracker.accepting
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_then_cancels(self) -> None:
+        """Test quick jobs complete and slow ones are abandoned."""
+        tracker = InFlightTracker()
+        quick = asyncio.create_task(_job(tracker, 0.01))
+        slow = asyncio.create_task(_job(tracker, 10))
+        await asyncio.sleep(0)
+
+        report = await tracker.drain(deadline=0.1)
+
+        assert report == DrainReport(completed=1, abandoned=1)
+        assert quick.done()
+        assert not quick.cancelled()
+        assert slow.cancelled()
@@ -0,0 +1,67 @@
+"""Tests for the SQLite job journal."""
+
+from pathlib import Path
+
+from nano_banana.core.journal import JobJournal, JobState
+
+
+class TestJobJournal:
+    """Test JobJournal persistence."""
+
+    def test_add_and_list_unfinished(self, tmp_path: Path) -> None:
+        """Test added jobs are listed as pending."""
+        with JobJournal(tmp_path / 'jobs.db') as journal:
+            job_id = journal.add(1, 2, 'a cat', ['https://example.com/a.png'])
+
+            jobs = journal.unfinished()
+
+        assert len(jobs) == 1
+        assert jobs[0].id == job_id
+        assert jobs[0].channel_id == 1
+        assert jobs[0].message_id == 2
+        assert jobs[0].prompt == 'a cat'
+        assert jobs[0].image_urls == ['https://example.com/a.png']
+        assert jobs[0].state is JobState.PENDING
+        assert jobs[0].attempts == 0
+
+    def test_start_marks_running(self, tmp_path: Path) -> None:
+        """Test starting a job marks it running and counts the attempt."""
+        with JobJournal(tmp_path / 'jobs.db') as journal:
+            job_id = journal.add(1, 2, 'a cat', [])
+            journal.start(job_id)
+
+            (job,) = journal.unfinished()
+
+        assert job.state is JobState.RUNNING
+        assert job.attempts == 1
+
+    def test_finish_removes_job(self, tmp_path: Path) -> None:
+        """Test finished jobs are dropped from the journal."""
+        with JobJournal(tmp_path / 'jobs.db') as journal:
+            job_id = journal.add(1, 2, 'a cat', [])
+            journal.finish(job_id)
+
+            assert journal.unfinished() == []
+
+    def test_jobs_survive_reopen(self, tmp_path: Path) -> None:
+        """Test unfinished jobs are visible after reopening the journal."""
+        path = tmp_path / 'jobs.db'
+        with JobJournal(path) as journal:
+            journal.start(journal.add(1, 2, 'first', []))
+            journal.add(3, 4, 'second', [])
+
+        with JobJournal(path) as journal:
+            jobs = journal.unfinished()
+
+        assert [job.prompt for job in jobs] == ['first', 'second']
+        assert [job.state for job in jobs] == [
+            JobState.RUNNING,
+            JobState.PENDING,
+        ]
+
+    def test_uses_wal_mode(self, tmp_path: Path) -> None:
+        """Test the journal enables SQLite write-ahead logging."""
+        with JobJournal(tmp_path / 'jobs.db') as journal:
+            (mode,) = journal._conn.execute('PRAGMA journal_mode').fetchone()
+
+        assert mode == 'wal'
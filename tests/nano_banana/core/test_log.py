@@ -0,0 +1,171 @@
+"""Tests for the logging subsystem."""
+
+import json
+import logging
+import logging.handlers
+from collections.abc import Iterator
+
+import pytest
+
+from nano_banana.core.log import (
+    SAMPLED,
+    ContextFilter,
+    JsonFormatter,
+    SamplingFilter,
+    configure_logging,
+    current_request_id,
+    request_scope,
+    shutdown_logging,
+    stage,
+)
+
+
+@pytest.fixture
+def restore_root() -> Iterator[None]:
+    root = logging.getLogger()
+    level = root.level
+    yield
+    shutdown_logging()
+    root.setLevel(level)
+
+
+def _record(
+    msg: str = 'hello %s',
+    level: int = logging.INFO,
+    **extra: object,
+) -> logging.LogRecord:
+    record = logging.LogRecord('test', level, __file__, 1, msg, ('x',), None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestRequestContext:
+    """Test request IDs and stage timings."""
+
+    def test_scope_sets_and_resets_id(self) -> None:
+        """Test the request ID only applies inside the scope."""
+        with request_scope('req-1') as request_id:
+            assert request_id == 'req-1'
+            assert current_request_id() == 'req-1'
+
+        assert current_request_id() is None
+
+    def test_scope_generates_id(self) -> None:
+        """Test a request ID is generated when none is given."""
+        with request_scope() as request_id:
+            assert request_id
+
+    def test_filter_attaches_context(self) -> None:
+        """Test records carry the request ID and finished stages."""
+        record = _record()
+
+        with request_scope('req-2'):
+            with stage('download'):
+                pass
+            ContextFilter().filter(record)
+
+        assert record.request_id == 'req-2'
+        assert set(record.stages) == {'download'}
+
+    def test_stage_outside_scope_is_noop(self) -> None:
+        """Test stages outside a request are not recorded."""
+        record = _record()
+
+        with stage('download'):
+            pass
+        ContextFilter().filter(record)
+
+        assert record.request_id == '-'
+        assert record.stages == {}
+
+
+class TestSamplingFilter:
+    """Test sampling of noisy records."""
+
+    def test_unmarked_records_always_pass(self) -> None:
+        """Test records without the sampled marker are kept."""
+        assert SamplingFilter(0.0, rand=lambda: 0.5).filter(_record())
+
+    def test_marked_records_sampled(self) -> None:
+        """Test marked records are kept at the configured rate."""
+        keep = SamplingFilter(0.1, rand=lambda: 0.05)
+        drop = SamplingFilter(0.1, rand=lambda: 0.5)
+
+        assert keep.filter(_record(**SAMPLED))
+        assert not drop.filter(_record(**SAMPLED))
+
+    def test_warnings_never_sampled(self) -> None:
+        """Test warnings pass even when marked as sampled."""
+        drop = SamplingFilter(0.0, rand=lambda: 0.5)
+
+        assert drop.filter(_record(level=logging.WARNING, **SAMPLED))
+
+
+class TestJsonFormatter:
+    """Test JSON rendering of records."""
+
+    def test_renders_fields(self) -> None:
+        """Test the message, request ID and stages are rendered."""
+        record = _record(request_id='req-3', stages={'generate': 1.5})
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry['message'] == 'hello x'
+        assert entry['level'] == 'INFO'
+        assert entry['request_id'] == 'req-3'
+        assert entry['stages'] == {'generate': 1.5}
+
+    def test_omits_empty_context(self) -> None:
+        """Test records outside a request have no request fields."""
+        entry = json.loads(JsonFormatter().format(_record(request_id='-')))
+
+        assert 'request_id' not in entry
+        assert 'stages' not in entry
+
+
+class TestConfigureLogging:
+    """Test queue-based logging setup."""
+
+    @pytest.mark.usefixtures('restore_root')
+    def test_installs_queue_handler_and_level(self) -> None:
+        """Test the root logger gets a queue handler and LOG_LEVEL."""
+        listener = configure_logging('warning')
+        root = logging.getLogger()
+
+        queue_handlers = [
+            h
+            for h in root.handlers
+            if isinstance(h, logging.handlers.QueueHandler)
+        ]
+        assert len(queue_handlers) == 1
+        assert root.level == logging.WARNING
+        assert listener.handlers
+
+    @pytest.mark.usefixtures('restore_root')
+    def test_reconfigure_replaces_handler(self) -> None:
+        """Test configuring twice does not stack queue handlers."""
+        configure_logging('INFO')
+        configure_logging('DEBUG', fmt='text')
+
+        queue_handlers = [
+            h
+            for h in logging.getLogger().handlers
+            if isinstance(h, logging.handlers.QueueHandler)
+        ]
+        assert len(queue_handlers) == 1
+
+    @pytest.mark.usefixtures('restore_root')
+    def test_records_written_by_listener(
+        self,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """Test records reach stderr as JSON once the queue is drained."""
+        configure_logging('INFO')
+
+        with request_scope('req-4'):
+            logging.getLogger('test.log').info('queued %d', 1)
+        shutdown_logging()
+
+        entry = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+        assert entry['message'] == 'queued 1'
+        assert entry['request_id'] == 'req-4'
@@ -0,0 +1,105 @@
+"""Tests for the metrics registry."""
+
+import asyncio
+import json
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from nano_banana.core.metrics import LatencyWindow, Metrics, MetricsReporter
+
+
+class TestLatencyWindow:
+    """Test LatencyWindow percentiles."""
+
+    def test_percentile_empty(self) -> None:
+        """Test an empty window has no percentile."""
+        assert LatencyWindow().percentile(95) is None
+
+    def test_percentile_nearest_rank(self) -> None:
+        """Test percentiles use the nearest-rank method."""
+        window = LatencyWindow()
+        for value in range(1, 101):
+            window.add(float(value))
+
+        assert window.percentile(50) == 50.0
+        assert window.percentile(95) == 95.0
+        assert window.percentile(100) == 100.0
+
+    def test_window_is_bounded(self) -> None:
+        """Test old samples fall out of the window."""
+        window = LatencyWindow(size=3)
+        for value in (100.0, 1.0, 2.0, 3.0):
+            window.add(value)
+
+        assert len(window) == 3
+        assert window.percentile(100) == 3.0
+
+
+class TestMetrics:
+    """Test Metrics registry."""
+
+    def test_counters_by_label(self) -> None:
+        """Test counters are tracked per label set."""
+        registry = Metrics()
+        registry.incr('requests', key='a')
+        registry.incr('requests', key='a')
+        registry.incr('requests', key='b')
+
+        assert registry.counter('requests', key='a') == 2
+        assert registry.counter('requests', key='b') == 1
+        assert registry.counter('requests', key='c') == 0
+
+    def test_snapshot(self) -> None:
+        """Test snapshot flattens counters, gauges and histograms."""
+        registry = Metrics()
+        registry.incr('requests')
+        registry.set('inflight', 3, model='m')
+        registry.observe('latency', 0.5)
+
+        snapshot = registry.snapshot()
+
+        assert snapshot['requests'] == 1
+        assert snapshot['inflight{model=m}'] == 3
+        assert snapshot['latency.count'] == 1
+        assert snapshot['latency.p95'] == 0.5
+
+    def test_reset(self) -> None:
+        """Test reset clears every metric."""
+        registry = Metrics()
+        registry.incr('requests')
+        registry.reset()
+
+        assert registry.snapshot() == {}
+
+
+class TestMetricsReporter:
+    """Test periodic metric reports."""
+
+    def test_report_logs_snapshot(
+        self, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Test a report carries every metric as JSON."""
+        registry = Metrics()
+        registry.incr('keypool.requests', key='...abcd')
+        reporter = MetricsReporter(registry)
+
+        with caplog.at_level(logging.INFO, logger='nano_banana.core.metrics'):
+            reporter.report()
+
+        (record,) = caplog.records
+        payload = record.getMessage().removeprefix('Metrics ')
+        assert json.loads(payload) == {'keypool.requests{key=...abcd}': 1}
+
+    @pytest.mark.asyncio
+    async def test_reports_periodically(self) -> None:
+        """Test reports repeat until stopped, with a final one on stop."""
+        reporter = MetricsReporter(Metrics(), interval=0.01)
+
+        with patch.object(reporter, 'report') as mock_report:
+            reporter.start()
+            await asyncio.sleep(0.05)
+            reporter.stop()
+
+        assert mock_report.call_count >= 2
@@ -0,0 +1,73 @@
+"""Tests for settings reload triggers."""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from nano_banana.core.metrics import metrics
+from nano_banana.core.reload import SettingsWatcher
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics() -> None:
+    metrics.reset()
+
+
+class TestSettingsWatcher:
+    """Test change detection and reloads."""
+
+    def test_detects_file_changes(self, tmp_path: Path) -> None:
+        """Test edits, creation and removal of watched files are seen."""
+        env = tmp_path / '.env'
+        env.write_text('SYSTEM_PROMPT=a\n')
+        watcher = SettingsWatcher(MagicMock(), paths=[env])
+
+        assert not watcher.changed()
+        env.write_text('SYSTEM_PROMPT=longer\n')
+        assert watcher.changed()
+        assert not watcher.changed()
+        env.unlink()
+        assert watcher.changed()
+
+    @pytest.mark.asyncio
+    async def test_reload_success(self, tmp_path: Path) -> None:
+        """Test a successful reload is counted by trigger."""
+        provider = MagicMock()
+        watcher = SettingsWatcher(provider, paths=[tmp_path / '.env'])
+
+        assert await watcher.reload('signal')
+
+        provider.apply.assert_called_once_with(provider.load.return_value)
+        assert (
+            metrics.counter('settings.reloads', trigger='signal', ok=True) == 1
+        )
+
+    @pytest.mark.asyncio
+    async def test_rejected_reload_is_contained(self, tmp_path: Path) -> None:
+        """Test a reload that fails validation is logged, not raised."""
+        provider = MagicMock()
+        provider.load.side_effect = ValueError('bad settings')
+        watcher = SettingsWatcher(provider, paths=[tmp_path / '.env'])
+
+        assert not await watcher.reload('file')
+
+        assert (
+            metrics.counter('settings.reloads', trigger='file', ok=False) == 1
+        )
+
+    @pytest.mark.asyncio
+    async def test_failed_apply_is_not_counted_ok(
+        self,
+        tmp_path: Path,
+    ) -> None:
+        """Test a reload a subscriber could not apply is reported failed."""
+        provider = MagicMock()
+        provider.apply.side_effect = RuntimeError('cannot apply')
+        watcher = SettingsWatcher(provider, paths=[tmp_path / '.env'])
+
+        assert not await watcher.reload('file')
+
+        assert (
+            metrics.counter('settings.reloads', trigger='file', ok=False) == 1
+        )
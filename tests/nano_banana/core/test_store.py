@@ -0,0 +1,164 @@
+"""Tests for the content-addressed output store."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from nano_banana.core.imagehash import content_key
+from nano_banana.core.store import OutputStore
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> Iterator[OutputStore]:
+    with OutputStore(tmp_path / 'outputs') as output_store:
+        yield output_store
+
+
+def _image(color: str) -> Image.Image:
+    return Image.new('RGB', (32, 16), color=color)
+
+
+class TestOutputStore:
+    """Test OutputStore writes, deduplication and queries."""
+
+    def test_put_writes_by_content_hash(self, store: OutputStore) -> None:
+        """Test images are stored under their SHA-256 and indexed."""
+        stored = store.put(
+            _image('red'),
+            prompt='a red square',
+            model='fast',
+            timings={'generate': 1.5},
+        )
+
+        assert stored.path == store.root / stored.digest[:2] / (
+            f'{stored.digest}.png'
+        )
+        assert stored.path.stat().st_size == stored.size
+        assert (stored.width, stored.height) == (32, 16)
+        assert store.get(stored.digest) == stored
+
+    def test_identical_outputs_stored_once(self, store: OutputStore) -> None:
+        """Test two generations of the same image share one file."""
+        first = store.put(_image('red'), prompt='one', model='fast')
+        second = store.put(_image('red'), prompt='two', model='fast')
+
+        assert first.path == second.path
+        assert first.id != second.id
+        assert len(list(store.root.glob('*/*.png'))) == 1
+
+    def test_find_matches_prompt_model_and_inputs(
+        self,
+        store: OutputStore,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test a result is found again only for the same request."""
+        stored = store.put(
+            _image('red'),
+            prompt='make it red',
+            model='fast',
+            inputs=[sample_image],
+        )
+
+        assert store.find('make it red', 'fast', [sample_image]) == stored
+        assert store.find('make it red', 'pro', [sample_image]) is None
+        assert store.find('make it red', 'fast') is None
+
+    def test_find_needs_identical_inputs(
+        self,
+        store: OutputStore,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test a merely similar input does not reuse a stored result."""
+        store.put(
+            _image('red'),
+            prompt='make it red',
+            model='fast',
+            inputs=[sample_image],
+        )
+        similar = sample_image.copy()
+        similar.putpixel((0, 0), (0, 0, 0))
+
+        assert store.find('make it red', 'fast', [similar]) is None
+
+    def test_failed_put_rolls_back(self, store: OutputStore) -> None:
+        """Test a failing insert leaves no rows and later puts succeed."""
+        with pytest.raises(TypeError):
+            store.put(
+                _image('red'),
+                prompt='broken',
+                model='fast',
+                timings={'generate': object()},  # type: ignore[dict-item]
+            )
+
+        stored = store.put(_image('red'), prompt='fine', model='fast')
+
+        assert store.query() == [stored]
+
+    def test_query_filters(
+        self,
+        store: OutputStore,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test queries filter by model, prompt text and input hash."""
+        red = store.put(
+            _image('red'),
+            prompt='100% red',
+            model='fast',
+            inputs=[sample_image],
+        )
+        blue = store.put(_image('blue'), prompt='blue', model='pro')
+
+        assert store.query() == [blue, red]
+        assert store.query(model='pro') == [blue]
+        assert store.query(prompt_contains='100%') == [red]
+        assert store.query(prompt_contains='_') == []
+        assert store.query(input_hash=content_key(sample_image)) == [red]
+        assert store.query(since=blue.created_at) == [blue]
+        assert store.query(limit=1) == [blue]
+
+    def test_summary_per_model(self, store: OutputStore) -> None:
+        """Test per-model totals count generations and distinct outputs."""
+        red = store.put(
+            _image('red'),
+            prompt='a',
+            model='fast',
+            timings={'generate': 1.0},
+        )
+        store.put(
+            _image('red'),
+            prompt='b',
+            model='fast',
+            timings={'generate': 3.0},
+        )
+
+        (summary,) = store.summary()
+
+        assert summary.model == 'fast'
+        assert (summary.generations, summary.outputs) == (2, 1)
+        assert summary.total_bytes == 2 * red.size
+        assert summary.mean_generate_seconds == 2.0
+
+    def test_open_reads_image_back(self, store: OutputStore) -> None:
+        """Test a stored image decodes to the same pixels."""
+        stored = store.put(_image('red'), prompt='red', model='fast')
+
+        image = store.open(stored)
+
+        assert image.getpixel((0, 0)) == (255, 0, 0)
+
+    def test_index_survives_reopen(self, tmp_path: Path) -> None:
+        """Test the index is persisted in SQLite."""
+        with OutputStore(tmp_path) as first:
+            stored = first.put(_image('red'), prompt='red', model='fast')
+
+        with OutputStore(tmp_path) as second:
+            assert second.get(stored.digest) == stored
+
+    @pytest.mark.asyncio
+    async def test_async_put_and_find(self, store: OutputStore) -> None:
+        """Test the async wrappers run the blocking calls off the loop."""
+        stored = await store.aput(_image('red'), prompt='red', model='fast')
+
+        assert await store.afind('red', 'fast') == stored
@@ -0,0 +1,121 @@
+"""Tests for screening attachments by their metadata."""
+
+from unittest.mock import MagicMock
+
+from nano_banana.core.metrics import metrics
+from nano_banana.discord.attachments import (
+    AttachmentLimits,
+    ImageAttachment,
+    image_attachments,
+    rejection,
+    screen,
+)
+
+
+def _attachment(
+    content_type: str | None = 'image/png',
+    size: object = 1024,
+    width: object = 640,
+    height: object = 480,
+) -> MagicMock:
+    attachment = MagicMock()
+    attachment.url = 'https://example.com/image.png'
+    attachment.content_type = content_type
+    attachment.size = size
+    attachment.width = width
+    attachment.height = height
+    return attachment
+
+
+class TestImageAttachment:
+    """Test reading attachment metadata."""
+
+    def test_metadata_is_read(self) -> None:
+        """Test size and dimensions come from the attachment."""
+        image = ImageAttachment.of(_attachment())
+
+        assert image == ImageAttachment(
+            'https://example.com/image.png',
+            1024,
+            640,
+            480,
+        )
+        assert image.longest_side == 640
+
+    def test_missing_metadata_is_unknown(self) -> None:
+        """Test dimensions Discord did not report stay unknown."""
+        image = ImageAttachment.of(_attachment(width=None, height=MagicMock()))
+
+        assert image.width is None
+        assert image.height is None
+        assert image.longest_side is None
+
+    def test_only_images_are_kept(self) -> None:
+        """Test attachments that are not images are left out."""
+        attachments = [
+            _attachment('application/pdf'),
+            _attachment(None),
+            _attachment('image/jpeg'),
+        ]
+
+        images = image_attachments(attachments)
+
+        assert len(images) == 1
+
+
+class TestAttachmentLimits:
+    """Test combining limits."""
+
+    def test_tightened_keeps_the_stricter_value(self) -> None:
+        """Test overrides only ever lower a limit."""
+        limits = AttachmentLimits(max_bytes=100, max_side=50)
+
+        tightened = limits.tightened({'max_bytes': 10, 'max_side': 500})
+
+        assert tightened.max_bytes == 10
+        assert tightened.max_side == 50
+        assert tightened.max_pixels == limits.max_pixels
+
+
+class TestScreen:
+    """Test screening attachments before download."""
+
+    def test_rejection_reasons(self) -> None:
+        """Test each limit is reported as its own reason."""
+        limits = AttachmentLimits(
+            max_bytes=1000,
+            max_side=100,
+            max_pixels=5000,
+        )
+
+        assert rejection(ImageAttachment('a', 2000, 10, 10), limits) == 'size'
+        assert (
+            rejection(ImageAttachment('b', 10, 200, 10), limits) == 'dimensions'
+        )
+        assert rejection(ImageAttachment('c', 10, 100, 100), limits) == 'pixels'
+        assert rejection(ImageAttachment('d', 10, 50, 50), limits) is None
+
+    def test_unknown_metadata_is_accepted(self) -> None:
+        """Test an attachment without metadata is let through."""
+        limits = AttachmentLimits(max_bytes=1, max_side=1, max_pixels=1)
+
+        assert rejection(ImageAttachment('a'), limits) is None
+
+    def test_screen_counts_rejections_and_downscales(self) -> None:
+        """Test outcomes are tallied per reason and in metrics."""
+        metrics.reset()
+        limits = AttachmentLimits(max_bytes=1000, downscale_side=100)
+        attachments = [
+            ImageAttachment('big', 2000, 10, 10),
+            ImageAttachment('huge', 5000, 10, 10),
+            ImageAttachment('wide', 10, 400, 100),
+            ImageAttachment('small', 10, 50, 50),
+        ]
+
+        screening = screen(attachments, limits)
+
+        assert [image.url for image in screening.accepted] == ['wide', 'small']
+        assert screening.rejected == {'size': 2}
+        assert screening.downscaled == 1
+        assert metrics.counter('attachments.rejected', reason='size') == 2
+        assert metrics.counter('attachments.downscaled') == 1
@@ -1,12 +1,15 @@
 """Tests for Discord bot commands and event handlers."""
 
+import asyncio
 import importlib.util
 import sys
+from collections.abc import Awaitable
 from pathlib import Path
 from types import ModuleType
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import discord
+import numpy as np
 import pytest
 from PIL import Image
 
@@ -50,10 +53,16 @@ def bot_module(mock_env_vars: None) -> ModuleType:
     return _load_bot_module()
 
 
-class TestExtractImageUrls:
-    """Test _extract_image_urls function."""
+def _noise_image(seed: int) -> Image.Image:
+    """Random RGB image that is perceptually distinct per seed."""
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
 
-    def test_extract_image_urls_with_images(
+
+class TestExtractImages:
+    """Test _extract_images function."""
+
+    def test_extract_images_with_images(
         self,
         bot_module: ModuleType,
     ) -> None:
@@ -69,22 +78,22 @@ class TestExtractImageUrls:
         mock_message = MagicMock()
         mock_message.attachments = [mock_attachment_1, mock_attachment_2]
 
-        urls = bot_module._extract_image_urls(mock_message)
+        urls = [image.url for image in bot_module._extract_images(mock_message)]
 
         assert len(urls) == 2
         assert 'https://example.com/image1.png' in urls
         assert 'https://example.com/image2.jpg' in urls
 
-    def test_extract_image_urls_no_images(self, bot_module: ModuleType) -> None:
+    def test_extract_images_no_images(self, bot_module: ModuleType) -> None:
         """Test extracting URLs from message without attachments."""
         mock_message = MagicMock()
         mock_message.attachments = []
 
-        urls = bot_module._extract_image_urls(mock_message)
+        urls = [image.url for image in bot_module._extract_images(mock_message)]
 
         assert urls == []
 
-    def test_extract_image_urls_non_image_attachments(
+    def test_extract_images_non_image_attachments(
         self,
         bot_module: ModuleType,
     ) -> None:
@@ -100,12 +109,12 @@ class TestExtractImageUrls:
         mock_message = MagicMock()
         mock_message.attachments = [mock_attachment_1, mock_attachment_2]
 
-        urls = bot_module._extract_image_urls(mock_message)
+        urls = [image.url for image in bot_module._extract_images(mock_message)]
 
         assert len(urls) == 1
         assert 'https://example.com/image.png' in urls
 
-    def test_extract_image_urls_none_content_type(
+    def test_extract_images_none_content_type(
         self,
         bot_module: ModuleType,
     ) -> None:
@@ -117,7 +126,7 @@ class TestExtractImageUrls:
         mock_message = MagicMock()
         mock_message.attachments = [mock_attachment]
 
-        urls = bot_module._extract_image_urls(mock_message)
+        urls = [image.url for image in bot_module._extract_images(mock_message)]
 
         assert urls == []
 
@@ -148,7 +157,10 @@ class TestFetchReferenceImages:
         mock_message.reference = mock_reference
         mock_message.channel = mock_channel
 
-        urls = await bot_module._fetch_reference_images(mock_message)
+        urls = [
+            image.url
+            for image in await bot_module._fetch_reference_images(mock_message)
+        ]
 
         assert len(urls) == 1
         assert 'https://example.com/ref_image.png' in urls
@@ -251,7 +263,7 @@ class TestGenerateResponse:
                 bot_module.banana,
                 'generate',
                 new_callable=AsyncMock,
-                return_value=('Generated text', sample_image),
+                return_value=('Generated text', [sample_image]),
             ),
             patch.object(
                 bot_module.utils,
@@ -268,9 +280,82 @@ class TestGenerateResponse:
             mock_respond.assert_called_once_with(
                 mock_message.reply,
                 'Generated text',
-                sample_image,
+                [sample_image],
+            )
+
+    @pytest.mark.asyncio
+    async def test_generate_response_stores_output(
+        self,
+        bot_module: ModuleType,
+        sample_image: Image.Image,
+        tmp_path: Path,
+    ) -> None:
+        """Test delivered images are indexed in the output store."""
+        mock_message = MagicMock()
+        mock_message.reply = AsyncMock()
+        mock_message.channel = AsyncMock()
+        bot_module.store = bot_module.OutputStore(tmp_path)
+
+        with (
+            patch.object(
+                bot_module.banana,
+                'generate',
+                new_callable=AsyncMock,
+                return_value=('Generated text', [sample_image]),
+            ),
+            patch.object(bot_module.utils, 'respond', new_callable=AsyncMock),
+        ):
+            await bot_module._generate_response(
+                mock_message,
+                'test prompt',
+                [sample_image],
             )
 
+        (stored,) = bot_module.store.query()
+        bot_module.store.close()
+        assert stored.prompt == 'test prompt'
+        assert stored.model == bot_module.banana.model_name
+        assert len(stored.input_hashes) == 1
+        assert set(stored.timings) == {'generate', 'deliver'}
+
+    @pytest.mark.asyncio
+    async def test_generate_response_sends_every_candidate(
+        self,
+        bot_module: ModuleType,
+        tmp_path: Path,
+    ) -> None:
+        """Test all candidates go out in one reply and are all stored."""
+        mock_message = MagicMock()
+        mock_message.reply = AsyncMock()
+        bot_module.store = bot_module.OutputStore(tmp_path)
+        bot_module.settings.CANDIDATE_COUNT = 2
+        images = [_noise_image(1), _noise_image(2)]
+
+        with (
+            patch.object(
+                bot_module.banana,
+                'generate',
+                new_callable=AsyncMock,
+                return_value=('two takes', images),
+            ) as mock_generate,
+            patch.object(
+                bot_module.utils,
+                'respond',
+                new_callable=AsyncMock,
+            ) as mock_respond,
+        ):
+            await bot_module._generate_response(mock_message, 'a cat', [])
+
+        stored = bot_module.store.query()
+        bot_module.store.close()
+        assert mock_generate.call_args.kwargs['candidates'] == 2
+        mock_respond.assert_awaited_once_with(
+            mock_message.reply,
+            'two takes',
+            images,
+        )
+        assert len({output.digest for output in stored}) == 2
+
     @pytest.mark.asyncio
     async def test_generate_response_with_images(
         self,
@@ -290,7 +375,7 @@ class TestGenerateResponse:
                 bot_module.banana,
                 'generate',
                 new_callable=AsyncMock,
-                return_value=('Transformed', sample_image),
+                return_value=('Transformed', [sample_image]),
             ) as mock_generate,
             patch.object(
                 bot_module.utils,
@@ -307,8 +392,57 @@ class TestGenerateResponse:
             mock_generate.assert_called_once_with(
                 prompt='transform',
                 images=pil_images,
+                session=bot_module._session_key(
+                    mock_message.channel,
+                    mock_message.author,
+                ),
+                candidates=1,
             )
 
+    @pytest.mark.asyncio
+    async def test_generate_response_with_preview(
+        self,
+        bot_module: ModuleType,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test slow models go through two-phase preview delivery."""
+        mock_message = MagicMock()
+        mock_message.reply = AsyncMock()
+        mock_delivery = MagicMock()
+        mock_delivery.wants_preview.return_value = True
+
+        async def deliver(
+            _reply: object,
+            final: Awaitable[tuple[str, list[Image.Image]]],
+            *_args: object,
+        ) -> tuple[None, list[Image.Image]]:
+            return None, (await final)[1]
+
+        mock_delivery.deliver = AsyncMock(side_effect=deliver)
+
+        with (
+            patch.object(bot_module, 'delivery', mock_delivery),
+            patch.object(
+                bot_module.banana,
+                'generate',
+                new_callable=AsyncMock,
+                return_value=('Generated text', [sample_image]),
+            ),
+            patch.object(
+                bot_module.utils,
+                'respond',
+                new_callable=AsyncMock,
+            ) as mock_respond,
+        ):
+            await bot_module._generate_response(mock_message, 'prompt', [])
+
+        mock_delivery.wants_preview.assert_called_once_with(
+            bot_module.banana.model_name,
+            0,
+        )
+        assert mock_delivery.deliver.call_args.args[0] is mock_message.reply
+        mock_respond.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_generate_response_http_exception(
         self,
@@ -417,7 +551,7 @@ class TestDrawCommand:
                 bot_module.banana,
                 'generate',
                 new_callable=AsyncMock,
-                return_value=('Generated!', sample_image),
+                return_value=('Generated!', [sample_image]),
             ),
             patch.object(
                 bot_module.utils,
@@ -431,7 +565,7 @@ class TestDrawCommand:
             mock_respond.assert_called_once_with(
                 mock_discord_context.respond,
                 'Generated!',
-                sample_image,
+                [sample_image],
             )
 
 
@@ -475,13 +609,46 @@ class TestOnMessage:
 
             mock_generate.assert_not_called()
 
+    @pytest.mark.asyncio
+    async def test_on_message_dropped_by_trigger(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test untriggered messages are dropped before any I/O."""
+        bot_module.triggers = bot_module.TriggerFilter(prefix='!draw')
+        bot_module.metrics.reset()
+        mock_discord_message.content = 'just chatting'
+
+        with (
+            patch.object(
+                bot_module,
+                '_fetch_reference_images',
+                new_callable=AsyncMock,
+            ) as mock_fetch,
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+            mock_fetch.assert_not_called()
+            mock_generate.assert_not_called()
+        assert (
+            bot_module.metrics.counter('trigger.dropped', reason='invocation')
+            == 1
+        )
+
     @pytest.mark.asyncio
     async def test_on_message_too_many_images(
         self,
         bot_module: ModuleType,
         mock_discord_message: MagicMock,
     ) -> None:
-        """Test rejection when too many images are sent."""
+        """Test too many images are refused before admission or download."""
+        bot_module.metrics.reset()
         mock_discord_message.author.bot = False
         mock_discord_message.guild.id = bot_module.settings.discord_guild_id
 
@@ -496,13 +663,144 @@ class TestOnMessage:
         mock_discord_message.reference = None
         mock_discord_message.channel.send = AsyncMock()
 
-        await bot_module.on_message(mock_discord_message)
+        with patch.object(
+            bot_module.utils,
+            'download_image',
+            new_callable=AsyncMock,
+        ) as mock_download:
+            await bot_module.on_message(mock_discord_message)
 
+        mock_download.assert_not_called()
         mock_discord_message.channel.send.assert_called_once()
         assert (
             '一次最多只能處理'
             in mock_discord_message.channel.send.call_args[0][0]
         )
+        assert not bot_module.metrics.counter(
+            'admission.admitted',
+            priority='passive',
+        )
+
+    @staticmethod
+    def _with_images(
+        bot_module: ModuleType,
+        message: MagicMock,
+        count: int,
+    ) -> MagicMock:
+        message.author.bot = False
+        message.guild.id = bot_module.settings.discord_guild_id
+        attachments = []
+        for i in range(count):
+            mock_att = MagicMock()
+            mock_att.url = f'https://example.com/image{i}.png'
+            mock_att.content_type = 'image/png'
+            attachments.append(mock_att)
+        message.attachments = attachments
+        message.reference = None
+        message.channel.send = AsyncMock()
+        message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+        return message
+
+    @pytest.mark.asyncio
+    async def test_on_message_duplicates_do_not_count(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test near-duplicates are dropped before the image limit applies."""
+        limit = bot_module.settings.MAX_IMAGE_PER_REQUEST
+        message = self._with_images(bot_module, mock_discord_message, limit + 1)
+        original = _noise_image(0)
+        distinct = [_noise_image(seed) for seed in range(1, limit)]
+
+        with (
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+                side_effect=[original, original.resize((128, 128)), *distinct],
+            ),
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.on_message(message)
+
+        message.channel.send.assert_not_called()
+        assert len(mock_generate.call_args.args[2]) == limit
+
+    @pytest.mark.asyncio
+    async def test_on_message_too_many_distinct_images(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test the limit applies to the images left after dedup."""
+        limit = bot_module.settings.MAX_IMAGE_PER_REQUEST
+        message = self._with_images(bot_module, mock_discord_message, limit + 1)
+
+        with (
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+                side_effect=[_noise_image(seed) for seed in range(limit + 1)],
+            ),
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.on_message(message)
+
+        mock_generate.assert_not_awaited()
+        assert '一次最多只能處理' in message.channel.send.call_args.args[0]
+
+    @pytest.mark.asyncio
+    async def test_on_message_repeated_url_downloaded_once(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test the same URL attached twice is only downloaded once."""
+        mock_discord_message.author.bot = False
+        mock_discord_message.guild.id = bot_module.settings.discord_guild_id
+        mock_att = MagicMock()
+        mock_att.url = 'https://example.com/image.png'
+        mock_att.content_type = 'image/png'
+        mock_discord_message.attachments = [mock_att, mock_att]
+        mock_discord_message.reference = None
+        mock_discord_message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+
+        with (
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+                return_value=_noise_image(0),
+            ) as mock_download,
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ),
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+        mock_download.assert_awaited_once_with('https://example.com/image.png')
 
     @pytest.mark.asyncio
     async def test_on_message_with_text_only(
@@ -532,6 +830,32 @@ class TestOnMessage:
 
             mock_generate.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_on_message_without_prompt_or_images(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test a message with nothing to draw is answered, not generated."""
+        mock_discord_message.author.bot = False
+        mock_discord_message.guild.id = bot_module.settings.discord_guild_id
+        mock_discord_message.content = '   '
+        mock_discord_message.attachments = []
+        mock_discord_message.reference = None
+        mock_discord_message.reply = AsyncMock()
+
+        with patch.object(
+            bot_module,
+            '_generate_response',
+            new_callable=AsyncMock,
+        ) as mock_generate:
+            await bot_module.on_message(mock_discord_message)
+
+        mock_generate.assert_not_awaited()
+        mock_discord_message.reply.assert_awaited_once_with(
+            bot_module.EMPTY_REQUEST_TEXT,
+        )
+
     @pytest.mark.asyncio
     async def test_on_message_with_images(
         self,
@@ -562,7 +886,7 @@ class TestOnMessage:
                 bot_module.utils,
                 'download_image',
                 new_callable=AsyncMock,
-                return_value=MagicMock(),
+                return_value=_noise_image(0),
             ),
             patch.object(
                 bot_module,
@@ -575,6 +899,92 @@ class TestOnMessage:
             mock_generate.assert_called_once()
 
 
+class TestOwnOutputReuse:
+    """Test replies to the bot's own generated images."""
+
+    @pytest.mark.asyncio
+    async def test_reply_to_own_output_skips_download(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test the cached image is used without fetch or download."""
+        sent = MagicMock(spec=discord.Message)
+        sent.id = 555
+        sent.attachments = [MagicMock(url='https://cdn/out.png')]
+        bot_module.outputs.remember(sent, [sample_image])
+
+        mock_discord_message.content = 'make it darker'
+        mock_discord_message.reference.message_id = 555
+        mock_discord_message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+
+        with (
+            patch.object(
+                bot_module,
+                '_fetch_reference_images',
+                new_callable=AsyncMock,
+            ) as mock_fetch,
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+            ) as mock_download,
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+            mock_fetch.assert_not_called()
+            mock_download.assert_not_called()
+            mock_generate.assert_called_once_with(
+                mock_discord_message,
+                'make it darker',
+                [sample_image],
+            )
+
+    @pytest.mark.asyncio
+    async def test_generate_response_remembers_output(
+        self,
+        bot_module: ModuleType,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test the generated image is cached under the reply's ID."""
+        sent = MagicMock(spec=discord.Message)
+        sent.id = 777
+        sent.attachments = [MagicMock(url='https://cdn/new.png')]
+        mock_message = MagicMock()
+        mock_message.reply = AsyncMock()
+
+        with (
+            patch.object(
+                bot_module.banana,
+                'generate',
+                new_callable=AsyncMock,
+                return_value=('', [sample_image]),
+            ),
+            patch.object(
+                bot_module.utils,
+                'respond',
+                new_callable=AsyncMock,
+                return_value=sent,
+            ),
+        ):
+            await bot_module._generate_response(mock_message, 'a cat', [])
+
+        assert bot_module.outputs.lookup(777) == {
+            'https://cdn/new.png': sample_image,
+        }
+
+
 class TestOnReady:
     """Test on_ready event handler."""
 
@@ -585,3 +995,871 @@ class TestOnReady:
             await bot_module.on_ready()
 
             mock_logger.assert_called_once_with('Client is ready!')
+
+
+class TestJournalReplay:
+    """Test replay of journaled jobs on startup."""
+
+    @pytest.mark.asyncio
+    async def test_on_message_finishes_job(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test a delivered message leaves nothing in the journal."""
+        mock_discord_message.reference = None
+        mock_discord_message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+
+        with patch.object(
+            bot_module,
+            '_generate_response',
+            new_callable=AsyncMock,
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+        assert bot_module.journal.unfinished() == []
+
+    @pytest.mark.asyncio
+    async def test_replay_delivers_unfinished_job(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test unfinished jobs are re-run against the source message."""
+        job_id = bot_module.journal.add(2002, 1001, 'a cat', [])
+        bot_module.journal.start(job_id)
+
+        mock_channel = MagicMock()
+        mock_channel.fetch_message = AsyncMock(
+            return_value=mock_discord_message,
+        )
+        mock_discord_message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+
+        with (
+            patch.object(
+                bot_module.bot,
+                'get_channel',
+                return_value=mock_channel,
+            ),
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.replay_journal()
+
+            mock_channel.fetch_message.assert_called_once_with(1001)
+            mock_generate.assert_called_once_with(
+                mock_discord_message,
+                'a cat',
+                [],
+            )
+        assert bot_module.journal.unfinished() == []
+
+    @pytest.mark.asyncio
+    async def test_replay_skips_deleted_message(
+        self,
+        bot_module: ModuleType,
+    ) -> None:
+        """Test jobs whose source message was deleted are dropped."""
+        bot_module.journal.add(2002, 1001, 'a cat', [])
+
+        mock_channel = MagicMock()
+        mock_channel.fetch_message = AsyncMock(
+            side_effect=discord.NotFound(MagicMock(), 'Unknown Message'),
+        )
+
+        with (
+            patch.object(
+                bot_module.bot,
+                'get_channel',
+                return_value=mock_channel,
+            ),
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.replay_journal()
+
+            mock_generate.assert_not_called()
+        assert bot_module.journal.unfinished() == []
+
+    @pytest.mark.asyncio
+    async def test_replay_drops_exhausted_job(
+        self,
+        bot_module: ModuleType,
+    ) -> None:
+        """Test jobs that keep failing are not replayed forever."""
+        job_id = bot_module.journal.add(2002, 1001, 'a cat', [])
+        for _ in range(bot_module.settings.JOURNAL_MAX_ATTEMPTS):
+            bot_module.journal.start(job_id)
+
+        with patch.object(bot_module.bot, 'get_channel') as mock_get_channel:
+            await bot_module.replay_journal()
+
+            mock_get_channel.assert_not_called()
+        assert bot_module.journal.unfinished() == []
+
+
+class TestSettingsReload:
+    """Test hot reload of settings into the running bot."""
+
+    def test_reload_applies_to_client_and_limits(
+        self,
+        bot_module: ModuleType,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test a reload reconfigures the client and swaps the settings."""
+        monkeypatch.setenv('SYSTEM_PROMPT', 'Reloaded prompt')
+        monkeypatch.setenv('TRIGGER_PREFIX', '!draw')
+
+        new = bot_module.settings_provider.reload()
+
+        assert bot_module.settings is new
+        assert bot_module.banana.system_prompt == 'Reloaded prompt'
+        assert bot_module.triggers.prefix == '!draw'
+
+    def test_failed_reload_leaves_bot_unchanged(
+        self,
+        bot_module: ModuleType,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test a reload that fails to apply puts the old values back."""
+        old = bot_module.settings
+        monkeypatch.setenv('MODEL_NAME', 'gemini-3-pro-image-preview')
+
+        with (
+            patch.object(
+                bot_module,
+                '_trigger_filter',
+                side_effect=RuntimeError('boom'),
+            ),
+            pytest.raises(RuntimeError, match='boom'),
+        ):
+            bot_module.settings_provider.reload()
+
+        assert bot_module.settings is old
+        assert bot_module.settings_provider.get() is old
+        assert bot_module.banana.model_name == old.MODEL_NAME
+
+
+class TestShutdown:
+    """Test graceful shutdown."""
+
+    @pytest.mark.asyncio
+    async def test_on_message_rejected_while_shutting_down(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test new messages are turned away once draining starts."""
+        mock_discord_message.reply = AsyncMock()
+        bot_module.inflight.stop_accepting()
+
+        with patch.object(
+            bot_module.journal,
+            'add',
+        ) as mock_add:
+            await bot_module.on_message(mock_discord_message)
+
+        mock_add.assert_not_called()
+        mock_discord_message.reply.assert_awaited_once_with(
+            bot_module.SHUTTING_DOWN_TEXT,
+        )
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_for_message_before_its_job(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test a message still resolving its inputs is drained too."""
+        mock_discord_message.author.bot = False
+        mock_discord_message.guild.id = bot_module.settings.discord_guild_id
+        resolving = asyncio.Event()
+
+        async def input_urls(*_args: object) -> None:
+            resolving.set()
+            await asyncio.sleep(0.01)
+
+        with (
+            patch.object(bot_module, '_input_urls', side_effect=input_urls),
+            patch.object(bot_module.journal, 'add') as mock_add,
+        ):
+            task = asyncio.create_task(
+                bot_module.on_message(mock_discord_message),
+            )
+            await resolving.wait()
+            report = await bot_module.inflight.drain(1.0)
+
+        await task
+        assert report.completed == 1
+        mock_add.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_shutdown_drains_and_closes(
+        self,
+        bot_module: ModuleType,
+    ) -> None:
+        """Test shutdown reports drained jobs and closes resources."""
+
+        async def job() -> None:
+            with bot_module.inflight.track():
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(job())
+        await asyncio.sleep(0)
+
+        with (
+            patch.object(
+                bot_module.bot,
+                'close',
+                new_callable=AsyncMock,
+            ) as mock_close,
+            patch.object(
+                bot_module.utils,
+                'close_http',
+                new_callable=AsyncMock,
+            ) as mock_close_http,
+        ):
+            report = await bot_module.shutdown()
+
+        assert task.done()
+        assert (report.completed, report.abandoned) == (1, 0)
+        mock_close.assert_awaited_once()
+        mock_close_http.assert_awaited_once()
+
+
+class TestAdmission:
+    """Test load shedding in the message handler."""
+
+    @pytest.mark.asyncio
+    async def test_on_message_busy_before_download(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test an overloaded bot replies at once without downloading."""
+        mock_discord_message.reply = AsyncMock()
+        mock_att = MagicMock()
+        mock_att.url = 'https://example.com/image.png'
+        mock_att.content_type = 'image/png'
+        mock_discord_message.attachments = [mock_att]
+        mock_discord_message.reference = None
+
+        with (
+            patch.object(
+                bot_module.admission,
+                'rejects',
+                return_value='queue',
+            ),
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+            ) as mock_download,
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+        mock_download.assert_not_called()
+        assert '目前請求太多' in mock_discord_message.reply.call_args.args[0]
+        assert bot_module.admission.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_on_message_releases_slot(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test the run slot is given back once the job is done."""
+        mock_discord_message.attachments = []
+        mock_discord_message.reference = None
+        mock_discord_message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+
+        with patch.object(
+            bot_module,
+            '_generate_response',
+            new_callable=AsyncMock,
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+        assert (bot_module.admission.running, bot_module.admission.queued) == (
+            0,
+            0,
+        )
+
+
+def _open_circuit(bot_module: ModuleType) -> None:
+    """Trip the breaker of the bot's default model."""
+    breaker = bot_module.banana.breaker_for(bot_module.banana.model_name)
+    for _ in range(breaker.policy.min_calls):
+        breaker.record_failure(RuntimeError('down'))
+
+
+class TestCircuitBreaker:
+    """Test failing fast while the Gemini backend is down."""
+
+    @pytest.mark.asyncio
+    async def test_on_message_fails_fast_before_download(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test an open circuit is reported before any download."""
+        mock_discord_message.reply = AsyncMock()
+        mock_att = MagicMock()
+        mock_att.url = 'https://example.com/image.png'
+        mock_att.content_type = 'image/png'
+        mock_discord_message.attachments = [mock_att]
+        mock_discord_message.reference = None
+
+        with (
+            patch.object(bot_module.banana, 'available', return_value=False),
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+            ) as mock_download,
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+        mock_download.assert_not_called()
+        mock_discord_message.reply.assert_awaited_once_with(
+            bot_module.UNAVAILABLE_TEXT,
+        )
+        assert bot_module.admission.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_queued_job_checks_breaker_again(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test a job that opened while queued skips its downloads."""
+        mock_discord_message.reply = AsyncMock()
+
+        _open_circuit(bot_module)
+
+        with (
+            patch.object(
+                bot_module,
+                '_load_images',
+                new_callable=AsyncMock,
+            ) as mock_load,
+        ):
+            await bot_module._run_job(
+                mock_discord_message,
+                'prompt',
+                ['https://example.com/image.png'],
+                job_id=1,
+            )
+
+        mock_load.assert_not_called()
+        mock_discord_message.reply.assert_awaited_once_with(
+            bot_module.UNAVAILABLE_TEXT,
+        )
+
+    @pytest.mark.asyncio
+    async def test_half_open_lets_one_job_download(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test only the job holding the probe downloads its images."""
+        mock_discord_message.reply = AsyncMock()
+        _open_circuit(bot_module)
+        breaker = bot_module.banana.breaker_for(bot_module.banana.model_name)
+        breaker._opened_at = float('-inf')
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def load(*_args: object) -> list:
+            started.set()
+            await release.wait()
+            return []
+
+        with (
+            patch.object(
+                bot_module, '_load_images', side_effect=load
+            ) as mock_load,
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ),
+        ):
+            first = asyncio.create_task(
+                bot_module._run_job(mock_discord_message, 'a', [], job_id=1),
+            )
+            await started.wait()
+            await bot_module._run_job(mock_discord_message, 'b', [], job_id=2)
+            release.set()
+            await first
+
+        assert mock_load.await_count == 1
+        mock_discord_message.reply.assert_awaited_once_with(
+            bot_module.UNAVAILABLE_TEXT,
+        )
+
+
+class TestDeadlines:
+    """Test per-stage deadlines in the message handler."""
+
+    @pytest.mark.asyncio
+    async def test_download_timeout_replies(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test a hung download is cancelled and the user is told."""
+        bot_module.metrics.reset()
+        mock_discord_message.reply = AsyncMock()
+        mock_att = MagicMock()
+        mock_att.url = 'https://example.com/image.png'
+        mock_att.content_type = 'image/png'
+        mock_discord_message.attachments = [mock_att]
+        mock_discord_message.reference = None
+
+        async def hang(_url: str) -> Image.Image:
+            await asyncio.sleep(10)
+            raise AssertionError
+
+        with (
+            patch.object(
+                bot_module,
+                '_stage_budgets',
+                return_value=bot_module.StageBudgets(download=0.01),
+            ),
+            patch.object(bot_module.utils, 'download_image', side_effect=hang),
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+        mock_generate.assert_not_called()
+        mock_discord_message.reply.assert_awaited_once_with(
+            bot_module.TIMEOUT_TEXT,
+        )
+        assert (
+            bot_module.metrics.counter('deadline.hits', stage='download') == 1
+        )
+        assert bot_module.journal.unfinished() == []
+
+    @pytest.mark.asyncio
+    async def test_generate_timeout_replies(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test a hung generation is cancelled and the user is told."""
+        mock_discord_message.reply = AsyncMock()
+        mock_discord_message.attachments = []
+        mock_discord_message.reference = None
+        mock_discord_message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+
+        async def hang(**_kwargs: object) -> tuple[str, list]:
+            await asyncio.sleep(10)
+            raise AssertionError
+
+        with (
+            patch.object(
+                bot_module,
+                '_stage_budgets',
+                return_value=bot_module.StageBudgets(generate=0.01),
+            ),
+            patch.object(bot_module.generator, 'generate', side_effect=hang),
+        ):
+            await bot_module.on_message(mock_discord_message)
+
+        mock_discord_message.reply.assert_awaited_once_with(
+            bot_module.TIMEOUT_TEXT,
+        )
+        assert (bot_module.admission.running, bot_module.admission.queued) == (
+            0,
+            0,
+        )
+
+
+class TestVariations:
+    """Test /draw fanning out into several variations."""
+
+    @pytest.mark.asyncio
+    async def test_draw_sends_one_contact_sheet(
+        self,
+        bot_module: ModuleType,
+        mock_discord_context: MagicMock,
+        tmp_path: Path,
+    ) -> None:
+        """Test variations are generated at once and sent as one image."""
+        mock_discord_context.defer = AsyncMock()
+        bot_module.store = bot_module.OutputStore(tmp_path)
+        images = iter([_noise_image(1), _noise_image(2), _noise_image(3)])
+
+        async def generate(**_kwargs: object) -> tuple[str, list]:
+            return 'take', [next(images)]
+
+        with (
+            patch.object(
+                bot_module.banana,
+                'generate',
+                side_effect=generate,
+            ) as mock_generate,
+            patch.object(
+                bot_module.utils,
+                'respond',
+                new_callable=AsyncMock,
+            ) as mock_respond,
+        ):
+            await bot_module.draw(mock_discord_context, 'a cat', 3)
+
+        stored = bot_module.store.query()
+        bot_module.store.close()
+        assert mock_generate.await_count == 3
+        mock_respond.assert_awaited_once()
+        _, text, (sheet,) = mock_respond.call_args.args
+        assert text == 'take'
+        assert sheet.size == (64 * 2 + 8, 64 * 2 + 8)
+        assert len(stored) == 3
+
+    @pytest.mark.asyncio
+    async def test_variations_limited_by_free_slots(
+        self,
+        bot_module: ModuleType,
+        mock_discord_context: MagicMock,
+    ) -> None:
+        """Test each variation takes a run slot, so busy bots draw fewer."""
+        mock_discord_context.defer = AsyncMock()
+        busy = bot_module.admission.reserve()
+        await busy.__aenter__()
+        running: list[int] = []
+
+        async def generate(**_kwargs: object) -> tuple[str, list]:
+            running.append(bot_module.admission.running)
+            return '', [_noise_image(len(running))]
+
+        with (
+            patch.object(bot_module.banana, 'generate', side_effect=generate),
+            patch.object(
+                bot_module.utils,
+                'respond',
+                new_callable=AsyncMock,
+            ) as mock_respond,
+        ):
+            await bot_module.draw(mock_discord_context, 'a cat', 4)
+
+        busy.release()
+        max_concurrent = bot_module.settings.ADMISSION_MAX_CONCURRENT
+        _, text, _ = mock_respond.call_args.args
+        assert text == bot_module.BUSY_VARIATIONS_TEXT.format(
+            done=max_concurrent - 1,
+            total=4,
+        )
+        assert len(running) == max_concurrent - 1
+        assert set(running) == {max_concurrent}
+        assert bot_module.admission.running == 0
+
+    @pytest.mark.asyncio
+    async def test_single_free_slot_says_busy(
+        self,
+        bot_module: ModuleType,
+        mock_discord_context: MagicMock,
+    ) -> None:
+        """Test a draw cut down to one variation still tells the user."""
+        mock_discord_context.defer = AsyncMock()
+        max_concurrent = bot_module.settings.ADMISSION_MAX_CONCURRENT
+        busy = [
+            bot_module.admission.reserve() for _ in range(max_concurrent - 1)
+        ]
+        for ticket in busy:
+            await ticket.__aenter__()
+
+        with (
+            patch.object(
+                bot_module.banana,
+                'generate',
+                new_callable=AsyncMock,
+                return_value=('', [_noise_image(0)]),
+            ) as mock_generate,
+            patch.object(
+                bot_module.utils,
+                'respond',
+                new_callable=AsyncMock,
+            ) as mock_respond,
+        ):
+            await bot_module.draw(mock_discord_context, 'a cat', 3)
+
+        for ticket in busy:
+            ticket.release()
+        mock_generate.assert_awaited_once()
+        _, text, _ = mock_respond.call_args.args
+        assert text == bot_module.BUSY_VARIATIONS_TEXT.format(done=1, total=3)
+
+    @pytest.mark.asyncio
+    async def test_partial_results_on_timeout(
+        self,
+        bot_module: ModuleType,
+        mock_discord_context: MagicMock,
+    ) -> None:
+        """Test finished variations go out when the others run late."""
+        bot_module.metrics.reset()
+        mock_discord_context.defer = AsyncMock()
+        calls = iter(range(3))
+
+        async def generate(**_kwargs: object) -> tuple[str, list]:
+            if (call := next(calls)) == 0:
+                await asyncio.sleep(10)
+            return '', [_noise_image(call)]
+
+        with (
+            patch.object(
+                bot_module,
+                '_stage_budgets',
+                return_value=bot_module.StageBudgets(generate=0.05),
+            ),
+            patch.object(bot_module.banana, 'generate', side_effect=generate),
+            patch.object(
+                bot_module.utils,
+                'respond',
+                new_callable=AsyncMock,
+            ) as mock_respond,
+        ):
+            await bot_module.draw(mock_discord_context, 'a cat', 3)
+
+        _, text, (sheet,) = mock_respond.call_args.args
+        assert text == bot_module.PARTIAL_VARIATIONS_TEXT.format(
+            done=2,
+            total=3,
+        )
+        assert sheet.size == (64 * 2 + 8, 64)
+        assert (
+            bot_module.metrics.counter('variations.results', outcome='timeout')
+            == 1
+        )
+        assert (
+            bot_module.metrics.counter('deadline.hits', stage='generate') == 1
+        )
+
+    @pytest.mark.asyncio
+    async def test_all_variations_late_times_out(
+        self,
+        bot_module: ModuleType,
+        mock_discord_context: MagicMock,
+    ) -> None:
+        """Test the user is told when no variation finished in time."""
+        mock_discord_context.defer = AsyncMock()
+        mock_discord_context.respond = AsyncMock()
+
+        async def hang(**_kwargs: object) -> tuple[str, list]:
+            await asyncio.sleep(10)
+            raise AssertionError
+
+        with (
+            patch.object(
+                bot_module,
+                '_stage_budgets',
+                return_value=bot_module.StageBudgets(generate=0.01),
+            ),
+            patch.object(bot_module.banana, 'generate', side_effect=hang),
+        ):
+            await bot_module.draw(mock_discord_context, 'a cat', 2)
+
+        mock_discord_context.respond.assert_awaited_once_with(
+            bot_module.TIMEOUT_TEXT,
+        )
+
+
+class TestLocalBackend:
+    """Test running the bot on the local procedural backend."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures('mock_env_vars')
+    async def test_draw_without_api_key(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test the bot generates images locally when BACKEND is local."""
+        monkeypatch.setenv('GOOGLE_API_KEY', '')
+        monkeypatch.setenv('BACKEND', 'local')
+        monkeypatch.setenv('LOCAL_BACKEND_LATENCY_SECONDS', '0')
+        monkeypatch.setenv('LOCAL_BACKEND_SIZE', '8')
+        bot_module = _load_bot_module()
+
+        text, images = await bot_module.banana.generate(prompt='a banana')
+
+        assert bot_module.banana.files is None
+        assert text.endswith('a banana')
+        assert [image.size for image in images] == [(8, 8)]
+
+
+class TestAttachmentScreening:
+    """Test attachments are checked before they are downloaded."""
+
+    @staticmethod
+    def _message(
+        bot_module: ModuleType,
+        message: MagicMock,
+        size: int,
+        side: int,
+    ) -> MagicMock:
+        message.author.bot = False
+        message.guild.id = bot_module.settings.discord_guild_id
+        message.content = 'transform this'
+        message.reference = None
+        attachment = MagicMock()
+        attachment.url = 'https://example.com/image.png'
+        attachment.content_type = 'image/png'
+        attachment.size = size
+        attachment.width = attachment.height = side
+        message.attachments = [attachment]
+        message.reply = AsyncMock()
+        message.channel.typing = MagicMock(
+            return_value=AsyncMock(
+                __aenter__=AsyncMock(),
+                __aexit__=AsyncMock(),
+            ),
+        )
+        return message
+
+    @pytest.mark.asyncio
+    async def test_oversized_attachment_is_not_downloaded(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test an image over the limits is refused with its reason."""
+        message = self._message(
+            bot_module,
+            mock_discord_message,
+            size=bot_module.settings.ATTACHMENT_MAX_BYTES + 1,
+            side=64,
+        )
+
+        with (
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+            ) as mock_download,
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.on_message(message)
+
+        mock_download.assert_not_awaited()
+        mock_generate.assert_not_awaited()
+        (text,) = message.reply.call_args.args
+        assert '1 張超過 20 MB' in text
+
+    @pytest.mark.asyncio
+    async def test_sub_megabyte_limit_is_reported_in_kb(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test a guild limit under 1 MB is not reported as 0 MB."""
+        guild_id = bot_module.settings.discord_guild_id
+        bot_module.settings.ATTACHMENT_GUILD_LIMITS = {
+            guild_id: {'max_bytes': 512 * 1024},
+        }
+        message = self._message(
+            bot_module,
+            mock_discord_message,
+            size=600 * 1024,
+            side=64,
+        )
+
+        with patch.object(
+            bot_module.utils,
+            'download_image',
+            new_callable=AsyncMock,
+        ) as mock_download:
+            await bot_module.on_message(message)
+
+        mock_download.assert_not_awaited()
+        (text,) = message.reply.call_args.args
+        assert '1 張超過 512 KB' in text
+
+    def test_byte_limits_keep_one_decimal(self, bot_module: ModuleType) -> None:
+        """Test fractional limits are not truncated."""
+        assert bot_module._format_bytes(3 * 512 * 1024) == '1.5 MB'
+        assert bot_module._format_bytes(20 * 1024 * 1024) == '20 MB'
+        assert bot_module._format_bytes(1536) == '1.5 KB'
+
+    def test_guild_limits_tighten_defaults(
+        self,
+        bot_module: ModuleType,
+    ) -> None:
+        """Test per-guild and per-model overrides only lower limits."""
+        guild = MagicMock()
+        guild.id = 42
+        settings = bot_module.settings
+        settings.ATTACHMENT_GUILD_LIMITS = {42: {'max_side': 1024}}
+        settings.ATTACHMENT_MODEL_LIMITS = {
+            settings.MODEL_NAME: {'max_side': 2048, 'downscale_side': 512},
+        }
+
+        limits = bot_module._attachment_limits(guild, settings.MODEL_NAME)
+        default = bot_module._attachment_limits(None, 'other-model')
+
+        assert limits.max_side == 1024
+        assert limits.downscale_side == 512
+        assert default.max_side == settings.ATTACHMENT_MAX_SIDE
+
+    @pytest.mark.asyncio
+    async def test_large_attachment_is_downscaled(
+        self,
+        bot_module: ModuleType,
+        mock_discord_message: MagicMock,
+    ) -> None:
+        """Test an accepted image over the downscale side is shrunk."""
+        bot_module.metrics.reset()
+        bot_module.settings.ATTACHMENT_DOWNSCALE_SIDE = 32
+        message = self._message(bot_module, mock_discord_message, 10, 64)
+
+        with (
+            patch.object(
+                bot_module.utils,
+                'download_image',
+                new_callable=AsyncMock,
+                return_value=_noise_image(0),
+            ),
+            patch.object(
+                bot_module,
+                '_generate_response',
+                new_callable=AsyncMock,
+            ) as mock_generate,
+        ):
+            await bot_module.on_message(message)
+
+        (image,) = mock_generate.call_args.args[2]
+        assert image.size == (32, 32)
+        assert bot_module.metrics.counter('attachments.downscaled') == 1
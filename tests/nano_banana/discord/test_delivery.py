@@ -0,0 +1,139 @@
+"""Tests for two-phase preview delivery."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from PIL import Image
+
+from nano_banana.core.metrics import metrics
+from nano_banana.discord.delivery import (
+    PREVIEW_FAILED_TEXT,
+    PREVIEW_TEXT,
+    PreviewDelivery,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics() -> None:
+    metrics.reset()
+
+
+def _client(
+    preview: Image.Image | None = None,
+    *,
+    fail: bool = False,
+) -> MagicMock:
+    client = MagicMock()
+    client.generate = AsyncMock(
+        side_effect=RuntimeError('boom') if fail else None,
+        return_value=('preview', [preview] if preview else []),
+    )
+    return client
+
+
+async def _final(
+    image: Image.Image,
+    delay: float = 0.0,
+) -> tuple[str, list[Image.Image]]:
+    await asyncio.sleep(delay)
+    return 'final', [image]
+
+
+class TestPreviewDelivery:
+    """Test PreviewDelivery ordering and edits."""
+
+    def test_wants_preview(self) -> None:
+        """Test previews are only used for other models within capacity."""
+        delivery = PreviewDelivery(_client(), 'gemini-2.5-flash-image')
+
+        assert delivery.wants_preview('gemini-3-pro-image-preview', 1)
+        assert not delivery.wants_preview('gemini-2.5-flash-image', 1)
+        assert not delivery.wants_preview('gemini-3-pro-image-preview', 5)
+
+    @pytest.mark.asyncio
+    async def test_preview_then_edit(self, sample_image: Image.Image) -> None:
+        """Test a late final result replaces the posted preview."""
+        large = Image.new('RGB', (2048, 1024), 'blue')
+        delivery = PreviewDelivery(_client(large), max_side=256)
+        preview_message = MagicMock()
+        preview_message.edit = AsyncMock(return_value='edited')
+        reply = AsyncMock(return_value=preview_message)
+
+        sent, images = await delivery.deliver(
+            reply,
+            _final(sample_image, delay=0.05),
+            'prompt',
+        )
+
+        assert reply.await_count == 1
+        assert reply.call_args.kwargs['content'] == PREVIEW_TEXT
+        assert preview_message.edit.call_args.kwargs['attachments'] == []
+        assert preview_message.edit.call_args.kwargs['content'] == 'final'
+        assert (sent, images) == ('edited', [sample_image])
+        assert metrics.counter('delivery.previews', outcome='shown') == 1
+        assert metrics.histogram('delivery.latency', phase='preview')
+        assert metrics.histogram('delivery.latency', phase='final')
+
+    @pytest.mark.asyncio
+    async def test_fast_final_skips_preview(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test no preview is posted when the final result comes first."""
+        client = _client(sample_image)
+
+        async def slow_preview(**_: object) -> tuple[str, list[Image.Image]]:
+            await asyncio.sleep(1)
+            return 'preview', [sample_image]
+
+        client.generate = AsyncMock(side_effect=slow_preview)
+        delivery = PreviewDelivery(client)
+        reply = AsyncMock(return_value='sent')
+
+        sent, _ = await delivery.deliver(reply, _final(sample_image), 'p')
+
+        reply.assert_awaited_once()
+        assert reply.call_args.kwargs['content'] == 'final'
+        assert sent == 'sent'
+        assert metrics.counter('delivery.previews', outcome='late') == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_preview_falls_back(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test a failing preview call still delivers the final image."""
+        delivery = PreviewDelivery(_client(fail=True))
+        reply = AsyncMock(return_value='sent')
+
+        sent, images = await delivery.deliver(
+            reply,
+            _final(sample_image, delay=0.01),
+            'p',
+        )
+
+        reply.assert_awaited_once()
+        assert (sent, images) == ('sent', [sample_image])
+        assert metrics.counter('delivery.previews', outcome='failed') == 1
+        assert metrics.histogram('delivery.perceived_latency')
+
+    @pytest.mark.asyncio
+    async def test_failed_final_relabels_preview(self) -> None:
+        """Test a posted preview says so when the final image fails."""
+        delivery = PreviewDelivery(_client(Image.new('RGB', (8, 8))))
+        preview_message = MagicMock()
+        preview_message.edit = AsyncMock()
+        reply = AsyncMock(return_value=preview_message)
+
+        async def failing_final() -> tuple[str, list[Image.Image]]:
+            await asyncio.sleep(0.05)
+            raise TimeoutError
+
+        with pytest.raises(TimeoutError):
+            await delivery.deliver(reply, failing_final(), 'p')
+
+        preview_message.edit.assert_awaited_once_with(
+            content=PREVIEW_FAILED_TEXT,
+        )
+        assert metrics.counter('delivery.previews', outcome='orphaned') == 1
@@ -0,0 +1,45 @@
+"""Tests for the bot's output cache."""
+
+from unittest.mock import MagicMock
+
+import discord
+from PIL import Image
+
+from nano_banana.discord.outputs import OutputCache
+
+
+def _sent(message_id: int, *urls: str) -> MagicMock:
+    sent = MagicMock(spec=discord.Message)
+    sent.id = message_id
+    sent.attachments = [MagicMock(url=url) for url in urls]
+    return sent
+
+
+class TestOutputCache:
+    """Test OutputCache bookkeeping."""
+
+    def test_remember_and_lookup(self, sample_image: Image.Image) -> None:
+        """Test sent images are found again by message ID."""
+        cache = OutputCache()
+        cache.remember(_sent(1, 'https://cdn/a.png'), [sample_image])
+
+        assert cache.lookup(1) == {'https://cdn/a.png': sample_image}
+        assert cache.lookup(2) == {}
+
+    def test_ignores_non_messages(self, sample_image: Image.Image) -> None:
+        """Test responses that are not messages are not cached."""
+        cache = OutputCache()
+        cache.remember(MagicMock(), [sample_image])
+
+        assert cache.nbytes == 0
+
+    def test_memory_budget(self) -> None:
+        """Test the oldest outputs are evicted past the byte budget."""
+        image = Image.new('RGB', (10, 10))
+        cache = OutputCache(max_bytes=500)
+        cache.remember(_sent(1, 'https://cdn/a.png'), [image])
+        cache.remember(_sent(2, 'https://cdn/b.png'), [image])
+
+        assert cache.lookup(1) == {}
+        assert cache.lookup(2) == {'https://cdn/b.png': image}
+        assert cache.nbytes == 300
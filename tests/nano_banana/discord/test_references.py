@@ -0,0 +1,106 @@
+"""Tests for reference message resolution."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import discord
+import pytest
+
+from nano_banana.core.metrics import metrics
+from nano_banana.discord.attachments import ImageAttachment
+from nano_banana.discord.references import ReferenceResolver
+
+
+def _urls(attachments: list[ImageAttachment]) -> list[str]:
+    return [attachment.url for attachment in attachments]
+
+
+def _attachment(url: str) -> MagicMock:
+    attachment = MagicMock()
+    attachment.url = url
+    attachment.content_type = 'image/png'
+    return attachment
+
+
+def _reply(resolved: object = None) -> MagicMock:
+    message = MagicMock()
+    message.reference.resolved = resolved
+    message.channel.fetch_message = AsyncMock()
+    return message
+
+
+@pytest.fixture
+def mock_bot() -> MagicMock:
+    """Mock bot with an empty message cache."""
+    bot = MagicMock()
+    bot.get_message.return_value = None
+    return bot
+
+
+class TestReferenceResolver:
+    """Test ReferenceResolver tiers."""
+
+    @pytest.mark.asyncio
+    async def test_resolved_tier(self, mock_bot: MagicMock) -> None:
+        """Test the gateway-resolved message is used first."""
+        metrics.reset()
+        resolved = MagicMock(spec=discord.Message)
+        resolved.attachments = [_attachment('https://example.com/a.png')]
+        message = _reply(resolved)
+
+        urls = await ReferenceResolver(mock_bot).attachments(message, 1)
+
+        assert _urls(urls) == ['https://example.com/a.png']
+        message.channel.fetch_message.assert_not_called()
+        assert metrics.counter('reference.lookups', tier='resolved') == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_tier(self, mock_bot: MagicMock) -> None:
+        """Test the bot's message cache is used before REST."""
+        metrics.reset()
+        cached = MagicMock()
+        cached.attachments = [_attachment('https://example.com/b.png')]
+        mock_bot.get_message.return_value = cached
+        message = _reply()
+
+        urls = await ReferenceResolver(mock_bot).attachments(message, 1)
+
+        assert _urls(urls) == ['https://example.com/b.png']
+        mock_bot.get_message.assert_called_once_with(1)
+        message.channel.fetch_message.assert_not_called()
+        assert metrics.counter('reference.lookups', tier='cache') == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_tier(self, mock_bot: MagicMock) -> None:
+        """Test remembered attachment metadata avoids REST."""
+        metrics.reset()
+        resolver = ReferenceResolver(mock_bot)
+        seen = MagicMock()
+        seen.id = 1
+        seen.attachments = [_attachment('https://example.com/c.png')]
+        resolver.remember(seen)
+        message = _reply()
+
+        urls = await resolver.attachments(message, 1)
+
+        assert _urls(urls) == ['https://example.com/c.png']
+        message.channel.fetch_message.assert_not_called()
+        assert metrics.counter('reference.lookups', tier='lru') == 1
+
+    @pytest.mark.asyncio
+    async def test_rest_tier(self, mock_bot: MagicMock) -> None:
+        """Test REST is the last resort and its result is remembered."""
+        metrics.reset()
+        resolver = ReferenceResolver(mock_bot)
+        fetched = MagicMock()
+        fetched.id = 1
+        fetched.attachments = [_attachment('https://example.com/d.png')]
+        message = _reply()
+        message.channel.fetch_message.return_value = fetched
+
+        first = await resolver.attachments(message, 1)
+        second = await resolver.attachments(message, 1)
+
+        assert _urls(first) == _urls(second) == ['https://example.com/d.png']
+        message.channel.fetch_message.assert_called_once_with(1)
+        assert metrics.counter('reference.lookups', tier='rest') == 1
+        assert metrics.counter('reference.lookups', tier='lru') == 1
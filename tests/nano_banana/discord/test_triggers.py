@@ -0,0 +1,84 @@
+"""Tests for the message trigger filter."""
+
+from unittest.mock import MagicMock
+
+from nano_banana.discord.triggers import TriggerFilter
+
+BOT_ID = 42
+
+
+def _message(
+    content: str = 'draw a cat',
+    channel_id: int = 1,
+    parent_id: int | None = None,
+    role_ids: tuple[int, ...] = (),
+    mention_ids: tuple[int, ...] = (),
+) -> MagicMock:
+    message = MagicMock()
+    message.content = content
+    message.channel.id = channel_id
+    message.channel.parent_id = parent_id
+    message.author.roles = [MagicMock(id=role_id) for role_id in role_ids]
+    message.mentions = [MagicMock(id=user_id) for user_id in mention_ids]
+    return message
+
+
+def _bot_user() -> MagicMock:
+    user = MagicMock()
+    user.id = BOT_ID
+    return user
+
+
+class TestTriggerFilter:
+    """Test TriggerFilter decisions."""
+
+    def test_default_accepts_everything(self) -> None:
+        """Test an unconfigured filter keeps the old behaviour."""
+        assert TriggerFilter().rejects(_message(), _bot_user()) is None
+
+    def test_channel_restriction(self) -> None:
+        """Test messages outside allowed channels are dropped."""
+        triggers = TriggerFilter(channel_ids=frozenset({1}))
+
+        assert triggers.rejects(_message(channel_id=1), None) is None
+        assert triggers.rejects(_message(channel_id=2), None) == 'channel'
+
+    def test_thread_in_allowed_channel(self) -> None:
+        """Test threads inherit their parent channel's permission."""
+        triggers = TriggerFilter(channel_ids=frozenset({1}))
+
+        assert (
+            triggers.rejects(_message(channel_id=9, parent_id=1), None) is None
+        )
+
+    def test_required_role(self) -> None:
+        """Test authors without a required role are dropped."""
+        triggers = TriggerFilter(role_ids=frozenset({7}))
+
+        assert triggers.rejects(_message(role_ids=(7, 8)), None) is None
+        assert triggers.rejects(_message(role_ids=(8,)), None) == 'role'
+
+    def test_mention_required(self) -> None:
+        """Test mention mode only accepts messages mentioning the bot."""
+        triggers = TriggerFilter(mention=True)
+
+        assert (
+            triggers.rejects(_message(mention_ids=(BOT_ID,)), _bot_user())
+            is None
+        )
+        assert triggers.rejects(_message(), _bot_user()) == 'invocation'
+
+    def test_prefix_or_mention(self) -> None:
+        """Test either configured invocation is enough."""
+        triggers = TriggerFilter(mention=True, prefix='!draw')
+
+        assert triggers.rejects(_message('!draw a cat'), _bot_user()) is None
+        assert triggers.rejects(_message('a cat'), _bot_user()) == 'invocation'
+
+    def test_strip_invocation(self) -> None:
+        """Test the prefix and bot mention are removed from the prompt."""
+        triggers = TriggerFilter(mention=True, prefix='!draw')
+
+        assert triggers.strip('!draw  a cat', _bot_user()) == 'a cat'
+        assert triggers.strip(f'<@{BOT_ID}> a cat', _bot_user()) == 'a cat'
+        assert triggers.strip(f'<@!{BOT_ID}> a cat', _bot_user()) == 'a cat'
@@ -1,15 +1,23 @@
 """Tests for Discord utility functions."""
 
 import io
+from collections.abc import AsyncIterator
 from unittest.mock import AsyncMock, patch
 
 import httpx
 import pytest
 from PIL import Image, UnidentifiedImageError
 
+from nano_banana.discord import utils
 from nano_banana.discord.utils import download_image
 
 
+@pytest.fixture(autouse=True)
+async def _fresh_http_client() -> AsyncIterator[None]:
+    yield
+    await utils.close_http()
+
+
 class TestUtils:
     """Test Discord utility functions."""
 
@@ -120,3 +128,56 @@ class TestUtils:
 
             image = await download_image('https://example.com/test.jpg')
             assert isinstance(image, Image.Image)
+
+    @pytest.mark.asyncio
+    async def test_http_client_shared_and_closed(self) -> None:
+        """Test downloads share one client until it is closed."""
+        with patch(
+            'nano_banana.discord.utils.httpx.AsyncClient',
+        ) as mock_client:
+            first = await utils.http_client()
+            second = await utils.http_client()
+            await utils.close_http()
+
+            assert first is second
+            mock_client.assert_called_once()
+            mock_client.return_value.__aexit__.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_respond_attaches_every_image(
+        self,
+        sample_image: Image.Image,
+    ) -> None:
+        """Test several images go out as attachments of one message."""
+        reply = AsyncMock(return_value='sent')
+
+        sent = await utils.respond(reply, 'two takes', [sample_image] * 2)
+
+        reply.assert_awaited_once()
+        files = reply.call_args.kwargs['files']
+        assert sent == 'sent'
+        assert reply.call_args.kwargs['content'] == 'two takes'
+        assert [f.filename for f in files] == ['image-1.png', 'image-2.png']
+
+    @pytest.mark.asyncio
+    async def test_respond_text_only(self) -> None:
+        """Test a reply without images carries no attachments."""
+        reply = AsyncMock()
+
+        await utils.respond(reply, 'just text', [])
+
+        reply.assert_awaited_once_with(content='just text')
+
+    def test_shrink_fits_longest_side(self) -> None:
+        """Test an image over the limit is scaled down to fit it."""
+        image = Image.new('RGB', (400, 200))
+
+        shrunk = utils.shrink(image, 100)
+
+        assert shrunk.size == (100, 50)
+
+    def test_shrink_leaves_small_images(
+        self, sample_image: Image.Image
+    ) -> None:
+        """Test an image within the limit is returned unchanged."""
+        assert utils.shrink(sample_image, 4096) is sample_image